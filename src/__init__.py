@@ -2,13 +2,19 @@
 PostQuantumCrypto Package Initialization
 This file initializes the package and provides access to key functions
 and modules for encryption, decryption, key generation, and testing.
+Public names are imported on first access, so importing the package does
+not load the cryptography backend or the test dependencies.
 """
 
-# Import essential modules
-from .utils.keygen import generate_key
-from .utils.encrypt import encrypt_data
-from .utils.decrypt import decrypt_data
-from .utils.test import run_tests
+import importlib
+
+# Public names and the modules they are loaded from on first access
+_LAZY_ATTRIBUTES = {
+    "generate_key": ".utils.keygen",
+    "encrypt_data": ".utils.encrypt",
+    "decrypt_data": ".utils.decrypt",
+    "run_tests": ".utils.test",
+}
 
 __all__ = ["generate_key", "encrypt_data", "decrypt_data", "run_tests"]
 
@@ -17,3 +23,16 @@ __version__ = "1.0.0"
 __author__ = "Your Name"
 __license__ = "MIT"
 __description__ = "A post-quantum cryptography package for secure and efficient data encryption."
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
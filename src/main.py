@@ -5,10 +5,24 @@ operations using the PostQuantumCrypto package.
 """
 
 import argparse
-from src.utils.keygen import generate_key
-from src.utils.encrypt import encrypt_data
-from src.utils.decrypt import decrypt_data
-from src.utils.test import run_tests
+import os
+import sys
+from src.utils.constants import (ALGORITHMS, DEFAULT_ALGORITHM, KEY_FORMATS, DEFAULT_KEY_FORMAT, CODEC_NAMES,
+                                 DEFAULT_CODEC, MANIFEST_NAME, ROTATE_MANIFEST_NAME)
+
+# Operation modules are imported inside their branches, so each invocation
+# only loads what it runs (pytest for test, the benchmark suite for bench).
+
+
+def _exit_on_failures(summary):
+    """
+    Prints the summary of a bulk run and exits with an error if any file failed.
+    """
+    print(f"[INFO] {summary['done']} files processed, {summary['skipped']} already done, "
+          f"{summary['failed']} failed in {summary['elapsed']:.1f} seconds.")
+    if summary["failed"]:
+        print("[ERROR] Some files failed; see the manifest for details.")
+        sys.exit(1)
 
 
 def main():
@@ -24,56 +38,330 @@ def main():
     parser.add_argument(
         "--operation",
         type=str,
-        choices=["keygen", "encrypt", "decrypt", "test"],
+        choices=["keygen", "encrypt", "decrypt", "update", "rotate", "test", "bench", "serve", "profile",
+                 "soak"],
         required=True,
-        help="The operation to perform: keygen (generate keys), encrypt, decrypt, or test."
+        help="The operation to perform: keygen (generate keys), encrypt, decrypt, update (apply a new "
+             "version of --input to the encrypted --output in place), rotate (re-wrap the data keys of "
+             "encrypted files from --key to --new-key in place), test, bench (benchmark suite), "
+             "serve (crypto daemon on a Unix socket), profile (profile one run of --target), "
+             "or soak (sustained load on --target)."
     )
     parser.add_argument(
         "--input",
         type=str,
-        help="Input file or data for encryption/decryption. Not required for keygen or test."
+        help="Input file, directory or glob pattern for encryption/decryption. Not required for keygen or test."
     )
     parser.add_argument(
         "--output",
         type=str,
-        help="Output file to save the results. Not required for keygen or test."
+        help="Output file to save the results (output directory for a directory or glob input, "
+             "JSON results for bench). Not required for keygen or test."
     )
     parser.add_argument(
         "--key",
         type=str,
         help="Path to the key file for encryption/decryption. Required for encrypt and decrypt."
     )
+    parser.add_argument(
+        "--algorithm",
+        type=str,
+        choices=ALGORITHMS,
+        default=DEFAULT_ALGORITHM,
+        help="Key algorithm for keygen (default: RSA-2048). Encryption and decryption follow the key file."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for file encryption/decryption, or executor threads "
+             "for serve (default: 1; CPU count for serve)."
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default="pqc.sock",
+        help="Unix socket path for serve (default: pqc.sock)."
+    )
+    parser.add_argument(
+        "--recipient",
+        type=str,
+        action="append",
+        default=[],
+        help="Additional recipient public key for encrypt; may be repeated. The payload is encrypted once "
+             "and any recipient's private key decrypts it."
+    )
+    parser.add_argument(
+        "--compress",
+        type=str,
+        nargs="?",
+        const=DEFAULT_CODEC,
+        choices=CODEC_NAMES,
+        help="Compress each chunk before encryption (codec: zlib). Incompressible data is detected and "
+             "stored as is; decryption detects compressed files automatically."
+    )
+    parser.add_argument(
+        "--new-key",
+        type=str,
+        help="New public key for rotate. Only the data key in each file header is re-wrapped; the payload "
+             "is not re-encrypted."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Keep per-chunk digests in the encrypted file so that later versions of the input can be "
+             "applied with --operation update, rewriting only the changed chunks."
+    )
+    parser.add_argument(
+        "--keystore",
+        type=str,
+        help="Keystore database. keygen adds the new pair to it; for encrypt and decrypt, --key and "
+             "--recipient are key IDs in it. Decrypt without --key finds the key by the file's recipients."
+    )
+    parser.add_argument(
+        "--label",
+        type=str,
+        help="Label (e.g. tenant name) stored with a key generated into the keystore."
+    )
+    parser.add_argument(
+        "--key-format",
+        type=str,
+        choices=KEY_FORMATS,
+        default=DEFAULT_KEY_FORMAT,
+        help="Key file format for keygen: pem (default), der (RSA only) or raw (binary, faster to load). "
+             "Encryption and decryption detect the format of the key file."
+    )
+    parser.add_argument(
+        "--expanded",
+        action="store_true",
+        help="With --key-format raw, store ML-KEM private keys with their pre-expanded matrix so loading "
+             "skips the key checks and matrix expansion (trusted key files only)."
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help=f"Manifest file for directory or glob input (default: {MANIFEST_NAME} in the output directory, "
+             f"or {ROTATE_MANIFEST_NAME} in the input directory for rotate)."
+    )
+
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="Baseline JSON results to compare the benchmark against (bench only)."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown that counts as a regression in bench compare mode (default: 0.10)."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Number of timed runs per benchmark case (default: 10)."
+    )
+    parser.add_argument(
+        "--target",
+        type=str,
+        choices=["keygen", "encrypt", "decrypt"],
+        help="Operation to run once under the profiler (profile), or repeatedly under load (soak: encrypt "
+             "or decrypt with --key). Takes the same options as the operation."
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=str,
+        help="Also collect cProfile statistics and save them to this file (profile only)."
+    )
+    parser.add_argument(
+        "--stacks",
+        type=str,
+        help="Sample call stacks and save them in collapsed format for flamegraph tools (profile only)."
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=60.0,
+        help="Length of the soak run in seconds (default: 60)."
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Target operations per second for soak (default: as fast as possible)."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of concurrent soak clients (default: 4)."
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=5.0,
+        help="Soak reporting window in seconds (default: 5)."
+    )
+    parser.add_argument(
+        "--payload-size",
+        type=int,
+        default=1024,
+        help="Plaintext size of each soak operation in bytes (default: 1024)."
+    )
 
     # Parse arguments
     args = parser.parse_args()
 
+    old_key_id = args.key
+    if args.keystore and args.operation in ("encrypt", "decrypt", "update", "rotate", "profile", "soak"):
+        from src.utils import keystore
+        if args.operation == "decrypt" and not args.key and args.input and not os.path.isdir(args.input):
+            args.key = keystore.open_keystore(args.keystore).key_for_file(args.input)
+        elif args.operation == "update" and not args.key and args.output:
+            args.key = keystore.open_keystore(args.keystore).key_for_file(args.output)
+        if args.key:
+            args.key = keystore.key_reference(args.keystore, args.key)
+        args.recipient = [keystore.key_reference(args.keystore, key_id) for key_id in args.recipient]
+        if args.new_key:
+            args.new_key = keystore.key_reference(args.keystore, args.new_key)
+
     # Handle operations
     if args.operation == "keygen":
-        print("[INFO] Generating a new key pair...")
-        generate_key()
-        print("[INFO] Key pair generated successfully!")
+        from src.utils.keygen import generate_key
+        if args.key_format == "der" and not args.algorithm.startswith("RSA-"):
+            print("[ERROR] --key-format der is only available for RSA keys; use pem or raw.")
+        elif args.keystore and (args.key_format != DEFAULT_KEY_FORMAT or args.expanded):
+            print("[ERROR] The keystore stores PEM keys; --key-format and --expanded apply to key files only.")
+        else:
+            print("[INFO] Generating a new key pair...")
+            key_id = generate_key(args.algorithm, args.keystore, args.label, args.key_format, args.expanded)
+            if key_id:
+                print(f"[INFO] Key pair stored in {args.keystore} with ID {key_id}.")
+            print("[INFO] Key pair generated successfully!")
 
     elif args.operation == "encrypt":
+        from src.utils import bulk
         if not args.input or not args.output or not args.key:
             print("[ERROR] --input, --output, and --key are required for encryption.")
+        elif bulk.is_bulk_input(args.input) and args.incremental:
+            print("[ERROR] --incremental is only available for single files.")
+        elif bulk.is_bulk_input(args.input):
+            print(f"[INFO] Encrypting files from {args.input}...")
+            summary = bulk.encrypt_tree(args.input, args.output, [args.key, *args.recipient], args.workers,
+                                        args.manifest, compression=args.compress)
+            _exit_on_failures(summary)
         else:
+            from src.utils.encrypt import encrypt_data
             print(f"[INFO] Encrypting data from {args.input}...")
-            encrypt_data(args.input, args.output, args.key)
+            encrypt_data(args.input, args.output, [args.key, *args.recipient], workers=args.workers,
+                         compression=args.compress, incremental=args.incremental)
             print(f"[INFO] Data encrypted successfully and saved to {args.output}.")
 
+    elif args.operation == "update":
+        from src.utils.encrypt import update_data
+        if not args.input or not args.output or not args.key:
+            print("[ERROR] --input (new plaintext), --output (encrypted file), and --key (private key) "
+                  "are required for update.")
+        else:
+            print(f"[INFO] Updating {args.output} from {args.input}...")
+            summary = update_data(args.input, args.output, args.key)
+            print(f"[INFO] {summary['changed']} of {summary['chunks']} chunks rewritten "
+                  f"({summary['bytes_written']} bytes).")
+
     elif args.operation == "decrypt":
+        from src.utils import bulk
         if not args.input or not args.output or not args.key:
             print("[ERROR] --input, --output, and --key are required for decryption.")
+        elif bulk.is_bulk_input(args.input):
+            print(f"[INFO] Decrypting files from {args.input}...")
+            summary = bulk.decrypt_tree(args.input, args.output, args.key, args.workers, args.manifest)
+            _exit_on_failures(summary)
         else:
+            from src.utils.decrypt import decrypt_data
             print(f"[INFO] Decrypting data from {args.input}...")
-            decrypt_data(args.input, args.output, args.key)
+            decrypt_data(args.input, args.output, args.key, workers=args.workers)
             print(f"[INFO] Data decrypted successfully and saved to {args.output}.")
 
+    elif args.operation == "rotate":
+        from src.utils.rotate import rotate_tree
+        if not args.input or not args.key or not args.new_key:
+            print("[ERROR] --input, --key (old private key), and --new-key (new public key) are required "
+                  "for rotate.")
+        else:
+            print(f"[INFO] Rotating files from {args.input} to the new key...")
+            summary = rotate_tree(args.input, args.key, args.new_key, args.workers, args.manifest)
+            _exit_on_failures(summary)
+            if args.keystore:
+                keystore.open_keystore(args.keystore).mark_rotated(old_key_id)
+                print(f"[INFO] Key {old_key_id} marked as rotated in {args.keystore}.")
+
     elif args.operation == "test":
+        from src.utils.test import run_tests
         print("[INFO] Running performance and security tests...")
-        run_tests()
+        if run_tests():
+            print("[ERROR] Some tests failed.")
+            sys.exit(1)
         print("[INFO] Tests completed successfully!")
 
+    elif args.operation == "bench":
+        from src.utils.benchmark import run_benchmarks
+        print("[INFO] Running benchmark suite...")
+        regressions = run_benchmarks(args.output, args.baseline, args.threshold, {"repeat": args.repeat})
+        if regressions:
+            print(f"[ERROR] {len(regressions)} benchmark regression(s) found.")
+            sys.exit(1)
+        print("[INFO] Benchmark suite completed.")
+
+    elif args.operation == "serve":
+        from src.utils.daemon import serve
+        print(f"[INFO] Serving on {args.socket} (Ctrl+C to stop)...")
+        serve(args.socket, max_workers=args.workers if args.workers > 1 else None)
+        print("[INFO] Daemon stopped.")
+
+    elif args.operation == "profile":
+        from src.utils import profiler
+        if args.target == "keygen":
+            from src.utils.keygen import generate_keypair_pem
+            target, target_args, target_kwargs = generate_keypair_pem, (args.algorithm,), {}
+        elif args.target in ("encrypt", "decrypt") and args.input and args.output and args.key:
+            if args.target == "encrypt":
+                from src.utils.encrypt import encrypt_data as target
+                key = [args.key, *args.recipient]
+            else:
+                from src.utils.decrypt import decrypt_data as target
+                key = args.key
+            target_args, target_kwargs = (args.input, args.output, key), {"workers": args.workers}
+        else:
+            print("[ERROR] --target is required for profile; encrypt and decrypt also need --input, --output "
+                  "and --key.")
+            sys.exit(1)
+        print(f"[INFO] Profiling {args.target}...")
+        report = profiler.profile_operation(target, *target_args, cprofile=bool(args.cprofile),
+                                            sample_stacks=bool(args.stacks), **target_kwargs)
+        profiler.print_profile_report(report)
+        if args.cprofile:
+            report["stats"].dump_stats(args.cprofile)
+            print(f"[INFO] cProfile statistics saved to {args.cprofile}.")
+        if args.stacks:
+            profiler.write_collapsed_stacks(report["stacks"], args.stacks)
+            print(f"[INFO] Collapsed stacks saved to {args.stacks}.")
+
+    elif args.operation == "soak":
+        from src.utils.soak import run_soak, save_soak
+        if args.target not in ("encrypt", "decrypt") or not args.key:
+            print("[ERROR] --target encrypt or decrypt and --key are required for soak.")
+            sys.exit(1)
+        print(f"[INFO] Soaking {args.target} for {args.duration:.0f} seconds with {args.concurrency} clients...")
+        result = run_soak(args.target, args.key, args.duration, args.rate, args.concurrency, args.window,
+                          args.payload_size)
+        if args.output:
+            save_soak(result, args.output)
+            print(f"[INFO] Soak results saved to {args.output}")
+        for failure in result["failures"]:
+            print(f"[ERROR] {failure}")
+        if result["failures"]:
+            sys.exit(1)
+        print("[INFO] Soak test passed.")
+
     else:
         print("[ERROR] Unknown operation.")
 
@@ -2,14 +2,20 @@
 Utils Module Initialization
 This module contains utility functions for key generation, encryption, decryption,
 performance profiling, and testing within the PostQuantumCrypto package.
+Public names are imported on first access, so the profiler and test
+dependencies (psutil, memory_profiler, pytest) are only loaded when used.
 """
 
-# Import core utility functions
-from .keygen import generate_key
-from .encrypt import encrypt_data
-from .decrypt import decrypt_data
-from .test import run_tests
-from .profiler import profile_performance
+import importlib
+
+# Public names and the modules they are loaded from on first access
+_LAZY_ATTRIBUTES = {
+    "generate_key": ".keygen",
+    "encrypt_data": ".encrypt",
+    "decrypt_data": ".decrypt",
+    "run_tests": ".test",
+    "profile_performance": ".profiler",
+}
 
 __all__ = [
     "generate_key",
@@ -23,3 +29,16 @@ __all__ = [
 __utils_version__ = "1.0.0"
 __utils_author__ = "Your Name"
 __utils_description__ = "Utility functions for cryptographic operations and testing."
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
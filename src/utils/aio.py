@@ -0,0 +1,207 @@
+"""
+Async Module - Asyncio API
+This module provides asyncio counterparts of the encryption, decryption
+and key generation functions. They call the synchronous functions, so
+both APIs share one implementation (formats, metrics and options); the
+blocking work runs on a bounded thread pool, and a semaphore caps how many
+operations are in flight, so one event loop can serve many concurrent
+requests without stalling. File operations stop at the next chunk when
+the awaiting task is cancelled and remove their partial output.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from .encrypt import encrypt_data, encrypt_string
+from .decrypt import decrypt_data, decrypt_string
+from .hybrid import DEFAULT_CHUNK_SIZE
+from . import keygen
+
+DEFAULT_MAX_CONCURRENCY = 1024
+
+
+class AsyncCrypto:
+    """
+    Runs cryptographic operations for asyncio code on a bounded executor.
+    """
+
+    def __init__(self, max_workers=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        :param max_workers: Number of executor threads (default: CPU count).
+        :param max_concurrency: Maximum number of operations in flight; further
+            callers wait without occupying executor threads.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="pqc-async")
+            return self._executor
+
+    def _get_semaphore(self):
+        # Semaphores belong to one event loop, so keep one per running loop
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def run(self, func, *args):
+        """
+        Runs a blocking callable on the executor under the concurrency limit.
+
+        :param func: Blocking callable.
+        :param args: Positional arguments for the callable.
+        :return: The callable's result.
+        """
+        executor = self._get_executor()
+        async with self._get_semaphore():
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def _run_file_operation(self, func, output_file, *args, **kwargs):
+        """
+        Runs a file operation; on cancellation it signals the worker to stop
+        at the next chunk, waits for it, and removes the partial output.
+        """
+        executor = self._get_executor()
+        cancelled = threading.Event()
+        call = functools.partial(func, *args, cancelled=cancelled, **kwargs)
+        async with self._get_semaphore():
+            future = asyncio.get_running_loop().run_in_executor(executor, call)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                cancelled.set()
+                try:
+                    await future
+                except BaseException:
+                    pass
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+                raise
+
+    async def encrypt_data(self, input_file, output_file, public_key_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                           **options):
+        """
+        Runs encrypt_data without blocking the event loop.
+
+        :param input_file: Path to the input file to be encrypted.
+        :param output_file: Path where the encrypted data will be saved.
+        :param public_key_path: Path to the public key, or a list of paths
+            (see encrypt_data).
+        :param chunk_size: Plaintext chunk size in bytes.
+        :param options: Further keyword arguments of encrypt_data (hybrid,
+            workers, compression, incremental).
+        """
+        await self._run_file_operation(encrypt_data, output_file, input_file, output_file, public_key_path,
+                                       chunk_size=chunk_size, **options)
+
+    async def decrypt_data(self, input_file, output_file, private_key_path, workers=1):
+        """
+        Runs decrypt_data without blocking the event loop.
+
+        :param input_file: Path to the encrypted input file.
+        :param output_file: Path where the decrypted data will be saved.
+        :param private_key_path: Path to the private key.
+        :param workers: Number of worker processes for hybrid files (default: 1).
+        """
+        await self._run_file_operation(decrypt_data, output_file, input_file, output_file, private_key_path,
+                                       workers=workers)
+
+    async def encrypt_string(self, data, public_key_path):
+        """
+        Runs encrypt_string without blocking the event loop.
+
+        :param data: The data (string) to be encrypted.
+        :param public_key_path: Path to the public key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+        :return: Encrypted data (bytes).
+        """
+        return await self.run(encrypt_string, data, public_key_path)
+
+    async def decrypt_string(self, encrypted_data, private_key_path):
+        """
+        Runs decrypt_string without blocking the event loop.
+
+        :param encrypted_data: The encrypted data (bytes) to be decrypted.
+        :param private_key_path: Path to the private key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+        :return: Decrypted data (string).
+        """
+        return await self.run(decrypt_string, encrypted_data, private_key_path)
+
+    async def generate_key(self, algorithm=keygen.DEFAULT_ALGORITHM):
+        """
+        Generates and saves a key pair without blocking the event loop.
+
+        :param algorithm: Key algorithm (see keygen.ALGORITHMS).
+        """
+        await self.run(keygen.generate_key, algorithm)
+
+    def shutdown(self, wait=True):
+        """
+        Shuts the executor down. A later call starts a new one.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_default = AsyncCrypto()
+
+
+def configure(max_workers=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Replaces the default executor settings used by the module-level functions.
+
+    :param max_workers: Number of executor threads (default: CPU count).
+    :param max_concurrency: Maximum number of operations in flight.
+    """
+    global _default
+    previous, _default = _default, AsyncCrypto(max_workers, max_concurrency)
+    previous.shutdown(wait=False)
+
+
+async def async_encrypt_data(input_file, output_file, public_key_path, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    """
+    Async counterpart of encrypt_data. See AsyncCrypto.encrypt_data.
+    """
+    await _default.encrypt_data(input_file, output_file, public_key_path, chunk_size, **options)
+
+
+async def async_decrypt_data(input_file, output_file, private_key_path, workers=1):
+    """
+    Async counterpart of decrypt_data. See AsyncCrypto.decrypt_data.
+    """
+    await _default.decrypt_data(input_file, output_file, private_key_path, workers)
+
+
+async def async_encrypt_string(data, public_key_path):
+    """
+    Async counterpart of encrypt_string. See AsyncCrypto.encrypt_string.
+    """
+    return await _default.encrypt_string(data, public_key_path)
+
+
+async def async_decrypt_string(encrypted_data, private_key_path):
+    """
+    Async counterpart of decrypt_string. See AsyncCrypto.decrypt_string.
+    """
+    return await _default.decrypt_string(encrypted_data, private_key_path)
+
+
+async def async_generate_key(algorithm=keygen.DEFAULT_ALGORITHM):
+    """
+    Async counterpart of generate_key. See AsyncCrypto.generate_key.
+    """
+    await _default.generate_key(algorithm)
@@ -0,0 +1,80 @@
+"""
+Batch Module - Batched Cryptographic Operations
+This module provides the thread-pool machinery behind the batch APIs
+(`encrypt_many`, `decrypt_many`). Items are split into slices and each
+slice is processed by one task, so Python-level scheduling overhead is
+paid per slice rather than per item. The RSA operations run inside the
+OpenSSL backend with the GIL released, which lets throughput scale with
+the number of worker threads.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SLICE_SIZE = 64
+
+
+class BatchResult(namedtuple("BatchResult", ["value", "error"])):
+    """
+    Result of one item in a batch operation.
+    `value` holds the output on success; `error` holds the raised
+    exception on failure.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def default_workers():
+    """
+    Returns the default number of worker threads (one per CPU).
+    """
+    return os.cpu_count() or 1
+
+
+def _run_slice(func, items):
+    results = []
+    for item in items:
+        try:
+            results.append(BatchResult(func(item), None))
+        except Exception as e:
+            results.append(BatchResult(None, e))
+    return results
+
+
+def run_batch(func, items, workers=None, executor=None, slice_size=DEFAULT_SLICE_SIZE):
+    """
+    Applies `func` to every item using a thread pool.
+
+    :param func: Callable applied to each item.
+    :param items: Iterable of input items.
+    :param workers: Number of worker threads (default: CPU count).
+    :param executor: Optional existing executor to submit work to.
+    :param slice_size: Maximum number of items processed per submitted task.
+    :return: List of BatchResult in input order.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if workers is None:
+        workers = default_workers()
+    if slice_size < 1:
+        raise ValueError("slice_size must be at least 1.")
+
+    if executor is None and workers <= 1:
+        return _run_slice(func, items)
+
+    # Keep several slices per worker so uneven slices still balance out
+    size = max(1, min(slice_size, -(-len(items) // (workers * 4))))
+    slices = [items[i:i + size] for i in range(0, len(items), size)]
+    if executor is not None:
+        futures = [executor.submit(_run_slice, func, part) for part in slices]
+        return [result for future in futures for result in future.result()]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_slice, func, part) for part in slices]
+        return [result for future in futures for result in future.result()]
@@ -0,0 +1,537 @@
+"""
+Benchmark Module - Repeatable Performance Measurements
+This module runs a benchmark matrix over payload size, algorithm, batch
+size and worker count. Every case is warmed up and then timed over
+repeated runs with `time.perf_counter_ns`, and reported as latency
+percentiles (p50/p95/p99) plus throughput (ops/s and MB/s). Results are
+written as JSON and can be compared against a stored baseline to flag
+regressions. Key generation, encapsulation and decapsulation are timed
+for every algorithm (RSA-OAEP transport of a 32-byte secret for RSA).
+Session message encryption is timed against per-message
+`encrypt_string`/`decrypt_string`. Private key loading is timed per key
+format (PEM, DER, raw and raw with pre-expanded arrays), alone and
+together with the first decapsulation. Compressed file encryption is
+timed on a log-like and an incompressible payload, with the output size
+ratio recorded next to the throughput. In-place updates of incrementally
+encrypted files are timed per fraction of changed chunks. Package import time is measured in
+fresh interpreters with `python -X importtime` and checked against a
+fixed budget.
+
+Cases are registered in two tables, SUITE_CASES (run once) and
+ALGORITHM_CASES (run per algorithm), with one function per case.
+"""
+
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from cryptography.hazmat.primitives.asymmetric import rsa
+from .keygen import _serialize_keypair
+from .encrypt import encrypt_data, encrypt_many, encrypt_string, update_data
+from .decrypt import decrypt_data, decrypt_many, decrypt_string
+from .hybrid import oaep_padding, DEFAULT_CHUNK_SIZE
+from .keycache import load_private_key, _parse_private_key
+from .keyformat import serialize_private_key
+from .session import initiate_session, accept_session
+
+SCHEMA_VERSION = 1
+DEFAULT_THRESHOLD = 0.10
+
+DEFAULT_MATRIX = {
+    "algorithms": ["RSA-2048", "ML-KEM-768", "X25519-ML-KEM-768"],
+    "payload_sizes": [1024, 1024 ** 2, 16 * 1024 ** 2],
+    "batch_sizes": [1, 100, 1000],
+    "workers": [1, os.cpu_count() or 1],
+    "session_messages": 1000,
+    "message_size": 64,
+    "key_formats": ["pem", "der", "raw", "raw-expanded"],
+    "compression_corpora": ["logs", "random"],
+    "update_fractions": [0.0, 0.01, 0.1, 1.0],
+    "import_modules": ["src", "src.main"],
+    "warmup": 2,
+    "repeat": 10,
+}
+
+# Import-time budgets (p50, milliseconds) for a fresh interpreter
+IMPORT_TIME_BUDGETS_MS = {
+    "src": 20.0,
+    "src.main": 40.0,
+}
+
+# Directory containing the `src` package, used as the import root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, fraction):
+    """
+    Returns a percentile of the samples using linear interpolation.
+
+    :param samples: Sequence of numbers.
+    :param fraction: Percentile as a fraction in [0, 1].
+    :return: The interpolated percentile.
+    """
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def time_case(func, warmup, repeat, items=1, payload_bytes=0):
+    """
+    Times one benchmark case.
+
+    :param func: Zero-argument callable performing one operation.
+    :param warmup: Number of untimed runs before measuring.
+    :param repeat: Number of timed runs.
+    :param items: Items processed per run (for ops/s).
+    :param payload_bytes: Bytes processed per run (for MB/s).
+    :return: Dictionary of latency percentiles (ms) and throughput.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+
+    mean_seconds = sum(samples) / len(samples) / 1e9
+    return {
+        "repeat": repeat,
+        "p50_ms": percentile(samples, 0.50) / 1e6,
+        "p95_ms": percentile(samples, 0.95) / 1e6,
+        "p99_ms": percentile(samples, 0.99) / 1e6,
+        "mean_ms": mean_seconds * 1e3,
+        "ops_per_s": items / mean_seconds if mean_seconds else 0.0,
+        "mb_per_s": payload_bytes / mean_seconds / 1024 ** 2 if mean_seconds and payload_bytes else 0.0,
+    }
+
+
+def parse_importtime(output):
+    """
+    Parses the report written to stderr by `python -X importtime`.
+
+    :param output: The stderr text of the interpreter.
+    :return: Dictionary mapping module name to (self_us, cumulative_us).
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # column header
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_import_time(module, repeat=5):
+    """
+    Measures the cumulative import time of a module in fresh interpreters.
+
+    :param module: Dotted module name, importable from PROJECT_ROOT.
+    :param repeat: Number of interpreters to start.
+    :return: Dictionary of import-time percentiles (ms) and the slowest imports.
+    """
+    samples = []
+    modules = {}
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        )
+        modules = parse_importtime(completed.stderr)
+        samples.append(modules[module][1] / 1e3)
+
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:5]
+    return {
+        "repeat": repeat,
+        "p50_ms": percentile(samples, 0.50),
+        "p95_ms": percentile(samples, 0.95),
+        "p99_ms": percentile(samples, 0.99),
+        "mean_ms": sum(samples) / len(samples),
+        "ops_per_s": 0.0,
+        "mb_per_s": 0.0,
+        "budget_ms": IMPORT_TIME_BUDGETS_MS.get(module),
+        "slowest_self_ms": {name: self_us / 1e3 for name, (self_us, _) in slowest},
+    }
+
+
+def check_import_budgets(document):
+    """
+    Lists the import-time cases of a results document that exceed their budget.
+
+    :param document: Results document.
+    :return: List of regression dictionaries (empty if all are within budget).
+    """
+    regressions = []
+    for row in document["results"]:
+        budget = row.get("budget_ms")
+        if row["name"] == "import_time" and budget and row["p50_ms"] > budget:
+            regressions.append({
+                "case": case_id(row),
+                "metric": "import_budget_ms",
+                "baseline": budget,
+                "current": row["p50_ms"],
+                "change": (row["p50_ms"] - budget) / budget,
+            })
+    return regressions
+
+
+def case_id(result):
+    """
+    Returns the identifier of a result row: its name plus its parameters.
+    """
+    params = ",".join(f"{key}={result['params'][key]}" for key in sorted(result["params"]))
+    return f"{result['name']}[{params}]"
+
+
+def log_corpus(size, seed=0):
+    """
+    Generates a deterministic, log-like payload (timestamps, levels,
+    request ids and key=value fields) for compression benchmarks.
+
+    :param size: Payload size in bytes.
+    :param seed: Random seed.
+    :return: Payload (bytes).
+    """
+    rng = random.Random(seed)
+    levels = ["INFO", "INFO", "INFO", "WARN", "ERROR", "DEBUG"]
+    lines = []
+    length = 0
+    timestamp = 1_700_000_000.0
+    while length < size:
+        timestamp += rng.random()
+        line = (f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp))}.{int(timestamp * 1000) % 1000:03d}Z "
+                f"{rng.choice(levels)} service-{rng.randint(1, 12)} request={rng.getrandbits(64):016x} "
+                f"user={rng.randint(1, 99999)} path=/api/v1/items/{rng.randint(1, 10 ** 6)} "
+                f"status={rng.choice((200, 200, 200, 201, 404, 500))} latency_ms={rng.random() * 200:.2f}\n")
+        lines.append(line)
+        length += len(line)
+    return "".join(lines).encode()[:size]
+
+
+def _write_keypair(directory, algorithm):
+    private_pem, public_pem = _serialize_keypair(algorithm)
+    private_path = os.path.join(directory, f"{algorithm}_private.pem")
+    public_path = os.path.join(directory, f"{algorithm}_public.pem")
+    with open(private_path, "wb") as file:
+        file.write(private_pem)
+    with open(public_path, "wb") as file:
+        file.write(public_pem)
+    return private_path, public_path
+
+
+# Shared state of a suite run, passed to every case
+_Bench = namedtuple("_Bench", ["config", "record", "directory", "warmup", "repeat", "workers"])
+# The key pair of one algorithm, written to `directory` as PEM files
+_Keys = namedtuple("_Keys", ["algorithm", "private_path", "public_path", "private_key", "is_rsa"])
+
+
+def _payload_paths(bench):
+    return tuple(os.path.join(bench.directory, name) for name in ("payload.bin", "payload.enc", "payload.out"))
+
+
+def _transport(keys):
+    # Returns (encapsulate, ciphertext, decrypt(private_key, ciphertext)); for RSA,
+    # OAEP transport of a 32-byte secret, the RSA counterpart of a KEM
+    public_key = keys.private_key.public_key()
+    if keys.is_rsa:
+        secret = os.urandom(32)
+        oaep = oaep_padding()
+        encapsulate = lambda: public_key.encrypt(secret, oaep)
+        return encapsulate, encapsulate(), lambda private_key, ciphertext: private_key.decrypt(ciphertext, oaep)
+    return (public_key.encapsulate, public_key.encapsulate()[1],
+            lambda private_key, ciphertext: private_key.decapsulate(ciphertext))
+
+
+def _case_import_time(bench):
+    for module in bench.config["import_modules"]:
+        bench.record("import_time", {"module": module}, measure_import_time(module, bench.repeat))
+
+
+def _case_keygen(bench, keys):
+    bench.record("keygen", {"algorithm": keys.algorithm},
+                 time_case(lambda: _serialize_keypair(keys.algorithm), bench.warmup, bench.repeat))
+
+
+def _case_kem(bench, keys):
+    encapsulate, ciphertext, decrypt = _transport(keys)
+    params = {"algorithm": keys.algorithm}
+    bench.record("kem_encaps", params, time_case(encapsulate, bench.warmup, bench.repeat))
+    bench.record("kem_decaps", params, time_case(lambda: decrypt(keys.private_key, ciphertext),
+                                                 bench.warmup, bench.repeat))
+
+
+def _case_key_load(bench, keys):
+    _, ciphertext, decrypt = _transport(keys)
+    for key_format in bench.config["key_formats"]:
+        expanded = key_format.endswith("-expanded")
+        base_format = key_format.replace("-expanded", "")
+        if (keys.is_rsa and expanded) or (base_format == "der" and not keys.is_rsa):
+            # Expansion only applies to KEM keys, DER only to RSA keys
+            continue
+        data = serialize_private_key(keys.private_key, base_format, expanded)
+        params = {"algorithm": keys.algorithm, "format": key_format}
+        bench.record("key_load", params, time_case(lambda: _parse_private_key(data), bench.warmup, bench.repeat,
+                                                   payload_bytes=len(data)))
+        # Parse plus the first use of the key (ML-KEM expands its matrix lazily)
+        bench.record("key_load_first_use", params, time_case(
+            lambda: decrypt(_parse_private_key(data), ciphertext), bench.warmup, bench.repeat))
+
+
+def _case_batch(bench, keys):
+    if not keys.is_rsa:
+        return
+    for batch_size in bench.config["batch_sizes"]:
+        messages = [os.urandom(32) for _ in range(batch_size)]
+        ciphertexts = [r.value for r in encrypt_many(messages, keys.public_path)]
+        for workers in bench.workers:
+            params = {"algorithm": keys.algorithm, "batch_size": batch_size, "workers": workers}
+            bench.record("encrypt_many", params, time_case(
+                lambda: encrypt_many(messages, keys.public_path, workers=workers),
+                bench.warmup, bench.repeat, items=batch_size, payload_bytes=32 * batch_size))
+            bench.record("decrypt_many", params, time_case(
+                lambda: decrypt_many(ciphertexts, keys.private_path, workers=workers, decode=False),
+                bench.warmup, bench.repeat, items=batch_size, payload_bytes=32 * batch_size))
+
+
+def _case_session(bench, keys):
+    # One session (setup plus N messages) against N public-key operations
+    count = bench.config["session_messages"]
+    text = "x" * bench.config["message_size"]
+    params = {"algorithm": keys.algorithm, "messages": count}
+    if keys.is_rsa:
+        ciphertext = encrypt_string(text, keys.public_path)
+        bench.record("encrypt_string", params, time_case(
+            lambda: [encrypt_string(text, keys.public_path) for _ in range(count)],
+            bench.warmup, bench.repeat, items=count, payload_bytes=len(text) * count))
+        bench.record("decrypt_string", params, time_case(
+            lambda: [decrypt_string(ciphertext, keys.private_path) for _ in range(count)],
+            bench.warmup, bench.repeat, items=count, payload_bytes=len(text) * count))
+    session, setup = initiate_session(keys.public_path)
+    session_messages = [session.encrypt(text) for _ in range(count)]
+
+    def session_encrypt():
+        sender = initiate_session(keys.public_path)[0]
+        for _ in range(count):
+            sender.encrypt(text)
+
+    def session_decrypt():
+        receiver = accept_session(setup, keys.private_path)
+        for message in session_messages:
+            receiver.decrypt(message)
+
+    bench.record("session_encrypt", params, time_case(
+        session_encrypt, bench.warmup, bench.repeat, items=count, payload_bytes=len(text) * count))
+    bench.record("session_decrypt", params, time_case(
+        session_decrypt, bench.warmup, bench.repeat, items=count, payload_bytes=len(text) * count))
+
+
+def _case_files(bench, keys):
+    input_file, encrypted_file, decrypted_file = _payload_paths(bench)
+    for payload_size in bench.config["payload_sizes"]:
+        with open(input_file, "wb") as file:
+            file.write(os.urandom(payload_size))
+        for workers in bench.workers:
+            params = {"algorithm": keys.algorithm, "payload_size": payload_size, "workers": workers}
+            bench.record("encrypt_data", params, time_case(
+                lambda: encrypt_data(input_file, encrypted_file, keys.public_path, workers=workers),
+                bench.warmup, bench.repeat, payload_bytes=payload_size))
+            bench.record("decrypt_data", params, time_case(
+                lambda: decrypt_data(encrypted_file, decrypted_file, keys.private_path, workers=workers),
+                bench.warmup, bench.repeat, payload_bytes=payload_size))
+
+
+def _case_compression(bench, keys):
+    # Compressed encryption of a compressible (log) and an incompressible payload
+    input_file, encrypted_file, decrypted_file = _payload_paths(bench)
+    for payload_size in bench.config["payload_sizes"]:
+        for corpus in bench.config["compression_corpora"]:
+            with open(input_file, "wb") as file:
+                file.write(log_corpus(payload_size) if corpus == "logs" else os.urandom(payload_size))
+            params = {"algorithm": keys.algorithm, "payload_size": payload_size, "workers": 1,
+                      "corpus": corpus, "compression": "zlib"}
+            measurement = time_case(
+                lambda: encrypt_data(input_file, encrypted_file, keys.public_path, compression="zlib"),
+                bench.warmup, bench.repeat, payload_bytes=payload_size)
+            measurement["output_ratio"] = os.path.getsize(encrypted_file) / max(payload_size, 1)
+            bench.record("encrypt_data", params, measurement)
+            bench.record("decrypt_data", params, time_case(
+                lambda: decrypt_data(encrypted_file, decrypted_file, keys.private_path),
+                bench.warmup, bench.repeat, payload_bytes=payload_size))
+
+
+def _case_update(bench, keys):
+    # In-place updates alternating between two versions that differ in a fraction of the chunks
+    encrypted_file = _payload_paths(bench)[1]
+    versions = [os.path.join(bench.directory, f"version{i}.bin") for i in range(2)]
+    for payload_size in bench.config["payload_sizes"]:
+        chunk_offsets = range(0, payload_size, DEFAULT_CHUNK_SIZE)
+        for fraction in bench.config["update_fractions"]:
+            payload = bytearray(os.urandom(payload_size))
+            with open(versions[0], "wb") as file:
+                file.write(payload)
+            for offset in random.Random(0).sample(chunk_offsets, int(len(chunk_offsets) * fraction)):
+                payload[offset] ^= 0xff
+            with open(versions[1], "wb") as file:
+                file.write(payload)
+            encrypt_data(versions[0], encrypted_file, keys.public_path, incremental=True)
+            updates = itertools.cycle([versions[1], versions[0]])
+            params = {"algorithm": keys.algorithm, "payload_size": payload_size, "changed_fraction": fraction}
+            bench.record("update_data", params, time_case(
+                lambda: update_data(next(updates), encrypted_file, keys.private_path),
+                bench.warmup, bench.repeat, payload_bytes=payload_size))
+
+
+# Cases run once per suite, in order; each takes the _Bench
+SUITE_CASES = {
+    "import_time": _case_import_time,
+}
+
+# Cases run once per algorithm of the matrix, in order; each takes the _Bench and the _Keys
+ALGORITHM_CASES = {
+    "keygen": _case_keygen,
+    "kem": _case_kem,
+    "key_load": _case_key_load,
+    "batch": _case_batch,
+    "session": _case_session,
+    "files": _case_files,
+    "compression": _case_compression,
+    "update": _case_update,
+}
+
+
+def run_suite(matrix=None, log=print):
+    """
+    Runs the benchmark matrix: every case of SUITE_CASES once, then every
+    case of ALGORITHM_CASES for each algorithm.
+
+    :param matrix: Dictionary overriding entries of DEFAULT_MATRIX.
+    :param log: Callable receiving one progress line per case (None to disable).
+    :return: Results document (dictionary) ready to be saved as JSON.
+    """
+    config = dict(DEFAULT_MATRIX, **(matrix or {}))
+    results = []
+
+    def record(name, params, measurement):
+        row = {"name": name, "params": params, **measurement}
+        results.append(row)
+        if log:
+            log(f"[INFO] {case_id(row)}: p50 {row['p50_ms']:.3f} ms, "
+                f"{row['ops_per_s']:.1f} ops/s, {row['mb_per_s']:.1f} MB/s")
+
+    directory = tempfile.mkdtemp(prefix="pqc-bench-")
+    try:
+        bench = _Bench(config, record, directory, config["warmup"], config["repeat"],
+                       sorted(set(config["workers"])))
+        for case in SUITE_CASES.values():
+            case(bench)
+        for algorithm in config["algorithms"]:
+            private_path, public_path = _write_keypair(directory, algorithm)
+            private_key = load_private_key(private_path)
+            keys = _Keys(algorithm, private_path, public_path, private_key,
+                         isinstance(private_key, rsa.RSAPrivateKey))
+            for case in ALGORITHM_CASES.values():
+                case(bench, keys)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "matrix": config,
+        },
+        "results": results,
+    }
+
+
+def save_results(document, path):
+    """
+    Writes a results document as JSON.
+    """
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """
+    Reads a results document from JSON.
+    """
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares results against a baseline. A case regresses when its p50
+    latency grows, or its throughput drops, by more than `threshold`.
+
+    :param current: Results document of the current run.
+    :param baseline: Results document to compare against.
+    :param threshold: Allowed relative slowdown (0.10 = 10%).
+    :return: List of regression dictionaries (empty if none).
+    """
+    baseline_rows = {case_id(row): row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        reference = baseline_rows.get(case_id(row))
+        if reference is None:
+            continue
+        checks = [
+            ("p50_ms", row["p50_ms"], reference["p50_ms"], row["p50_ms"] > reference["p50_ms"] * (1 + threshold)),
+            ("ops_per_s", row["ops_per_s"], reference["ops_per_s"],
+             row["ops_per_s"] < reference["ops_per_s"] * (1 - threshold)),
+        ]
+        for metric, value, reference_value, regressed in checks:
+            if regressed:
+                regressions.append({
+                    "case": case_id(row),
+                    "metric": metric,
+                    "baseline": reference_value,
+                    "current": value,
+                    "change": (value - reference_value) / reference_value if reference_value else 0.0,
+                })
+    return regressions
+
+
+def run_benchmarks(output_file=None, baseline_file=None, threshold=DEFAULT_THRESHOLD, matrix=None):
+    """
+    Runs the suite, optionally saves the results and compares them with a baseline.
+
+    Import times over their budget are always reported as regressions.
+
+    :param output_file: Optional path for the JSON results.
+    :param baseline_file: Optional path of a baseline JSON to compare against.
+    :param threshold: Allowed relative slowdown before a case is flagged.
+    :param matrix: Dictionary overriding entries of DEFAULT_MATRIX.
+    :return: List of regressions (empty when none are found).
+    """
+    document = run_suite(matrix)
+    if output_file:
+        save_results(document, output_file)
+        print(f"[INFO] Benchmark results saved to {output_file}")
+
+    regressions = check_import_budgets(document)
+    if baseline_file:
+        regressions += compare_results(document, load_results(baseline_file), threshold)
+    for regression in regressions:
+        print(f"[WARNING] Regression in {regression['case']}: {regression['metric']} "
+              f"{regression['baseline']:.3f} -> {regression['current']:.3f} "
+              f"({regression['change']:+.1%})")
+    if not regressions:
+        print("[INFO] No regressions found.")
+    return regressions
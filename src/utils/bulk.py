@@ -0,0 +1,305 @@
+"""
+Bulk Module - Directory and Glob Encryption
+This module encrypts or decrypts whole directory trees (or the files
+matched by a glob pattern) in one process pool. Each worker parses the
+key once and then processes groups of files, so a large tree costs one
+interpreter start and one key parse per worker instead of per file.
+Every finished file is appended to a manifest (path, size, mtime,
+status); an interrupted run started again with the same manifest skips
+the files that were already completed. Manifests, partial outputs and
+journals found in the input are never processed, so the output
+of one run can be the input of the next.
+
+The pool and manifest driver, process_files, takes any per-file
+callable; key rotation (see rotate) runs on it as well.
+"""
+
+import functools
+import glob
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .encrypt import encrypt_data
+from .decrypt import decrypt_data
+from .constants import BOOKKEEPING_SUFFIXES, MANIFEST_NAME, PARTIAL_SUFFIX
+from .keycache import load_public_keys, load_private_key
+
+ENCRYPTED_SUFFIX = ".enc"
+DECRYPTED_SUFFIX = ".dec"
+FILES_PER_TASK = 32
+PROGRESS_INTERVAL = 1.0
+
+_MAGIC = re.compile(r"[*?[]")
+
+
+def is_bulk_input(path):
+    """
+    Checks whether an --input value names a directory or a glob pattern.
+
+    :param path: Input path or pattern.
+    :return: True if the input selects several files.
+    """
+    return os.path.isdir(path) or bool(_MAGIC.search(path))
+
+
+def _pattern_root(pattern):
+    # Leading path components without glob characters
+    parts = []
+    for part in pattern.split(os.sep):
+        if _MAGIC.search(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or "."
+
+
+def collect_inputs(path, exclude=BOOKKEEPING_SUFFIXES):
+    """
+    Lists the files selected by a directory (recursively) or a glob pattern
+    ("**" matches any number of directories).
+
+    :param path: Directory or glob pattern.
+    :param exclude: File name suffixes to leave out (default: the manifests,
+        partial outputs and journals of bulk runs, updates and rotations).
+    :return: Tuple of (root directory, sorted list of paths relative to the root).
+    """
+    if os.path.isdir(path):
+        root = path
+        files = [os.path.join(directory, name)
+                 for directory, _, names in os.walk(root) for name in names]
+    else:
+        root = _pattern_root(path)
+        files = [match for match in glob.glob(path, recursive=True) if os.path.isfile(match)]
+    return root, sorted(os.path.relpath(file, root) for file in files if not file.endswith(exclude))
+
+
+def output_name(relative_path, operation):
+    """
+    Returns the output path of a file relative to the output directory:
+    ".enc" is appended on encryption and stripped (or ".dec" appended) on
+    decryption.
+    """
+    if operation == "encrypt":
+        return relative_path + ENCRYPTED_SUFFIX
+    if relative_path.endswith(ENCRYPTED_SUFFIX):
+        return relative_path[:-len(ENCRYPTED_SUFFIX)]
+    return relative_path + DECRYPTED_SUFFIX
+
+
+def load_manifest(path):
+    """
+    Reads a manifest, keeping the last entry recorded for each file.
+    A truncated last line (from an interrupted run) is ignored.
+
+    :param path: Path to the manifest file.
+    :return: Dictionary mapping relative path to its manifest entry.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def _terminate_last_line(path):
+    # End a truncated last line, so the first entry appended next is not merged into it
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "r+b") as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                file.write(b"\n")
+
+
+def _init_worker(operation, key_path):
+    # Parse the keys once; every file in this worker then hits the key cache
+    if operation == "encrypt":
+        load_public_keys(key_path)
+    else:
+        load_private_key(key_path)
+
+
+def _process_file(root, relative_path, output_dir, operation, key_path, compression=None):
+    source = os.path.join(root, relative_path)
+    target = os.path.join(output_dir, output_name(relative_path, operation))
+    # Write under a temporary name so an interrupted file is never mistaken for a finished one
+    partial = target + PARTIAL_SUFFIX
+    entry = {"path": relative_path, "size": 0, "mtime_ns": None}
+    try:
+        stat = os.stat(source)
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        if operation == "encrypt":
+            encrypt_data(source, partial, key_path, compression=compression)
+        else:
+            decrypt_data(source, partial, key_path)
+        os.replace(partial, target)
+        entry.update(status="done")
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+    return entry
+
+
+def _process_group(process_file, root, relative_paths):
+    return [process_file(root, relative_path) for relative_path in relative_paths]
+
+
+def report_progress(summary, elapsed):
+    """
+    Default progress callback: prints the file counts, the file rate and
+    the throughput so far.
+
+    :param summary: Summary dictionary of the running operation.
+    :param elapsed: Seconds since the operation started.
+    """
+    processed = summary["done"] + summary["failed"]
+    rate = processed / elapsed if elapsed else 0.0
+    throughput = summary["bytes"] / elapsed / 1024 ** 2 if elapsed else 0.0
+    print(f"[INFO] {summary['skipped'] + processed}/{summary['total']} files "
+          f"({summary['failed']} failed), {rate:.1f} files/s, {throughput:.1f} MB/s")
+
+
+def process_files(root, relative_paths, process_file, manifest_path, workers=None, initializer=None,
+                  initargs=(), progress=report_progress, completed=("done",)):
+    """
+    Runs a per-file operation over many files in a process pool and appends
+    every result to a manifest. Files are handed out in groups of
+    FILES_PER_TASK with a bounded number of groups in flight. A file whose
+    manifest entry has a status in `completed` and whose size and mtime
+    are unchanged is skipped, so a run started again after an interruption
+    only redoes the missing files.
+
+    :param root: Directory the relative paths are resolved against.
+    :param relative_paths: Files to process, relative to `root`.
+    :param process_file: Picklable callable(root, relative_path) returning the
+        file's manifest entry: a dictionary with "path", "size", "mtime_ns"
+        and "status" ("done", "skipped" or "failed").
+    :param manifest_path: Manifest file; it is never processed itself.
+    :param workers: Number of worker processes (default: CPU count); with one,
+        the files are processed in this process.
+    :param initializer: Callable run once per worker before its first file
+        (e.g. to parse the keys), or None.
+    :param initargs: Arguments for `initializer`.
+    :param progress: Callable(summary, elapsed_seconds), called at most once
+        per PROGRESS_INTERVAL and once at the end (None to disable).
+    :param completed: Manifest statuses that mark a file as finished.
+    :return: Summary dictionary with the file counts, the bytes of the files
+        processed successfully and the elapsed time.
+    """
+    workers = workers or os.cpu_count() or 1
+    manifest_real_path = os.path.realpath(manifest_path)
+    relative_paths = [relative_path for relative_path in relative_paths
+                      if os.path.realpath(os.path.join(root, relative_path)) != manifest_real_path]
+    manifest = load_manifest(manifest_path)
+    pending = []
+    skipped = 0
+    for relative_path in relative_paths:
+        entry = manifest.get(relative_path)
+        stat = os.stat(os.path.join(root, relative_path))
+        if (entry is not None and entry["status"] in completed and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns):
+            skipped += 1
+        else:
+            pending.append(relative_path)
+
+    summary = {"total": len(relative_paths), "skipped": skipped, "done": 0, "failed": 0, "bytes": 0}
+    groups = [pending[i:i + FILES_PER_TASK] for i in range(0, len(pending), FILES_PER_TASK)]
+    start = last_report = time.perf_counter()
+
+    _terminate_last_line(manifest_path)
+    with open(manifest_path, "a") as manifest_file:
+        def record(entries):
+            nonlocal last_report
+            for entry in entries:
+                manifest_file.write(json.dumps(entry) + "\n")
+                summary[entry["status"]] += 1
+                if entry["status"] == "done":
+                    summary["bytes"] += entry["size"]
+            manifest_file.flush()
+            now = time.perf_counter()
+            if progress and now - last_report >= PROGRESS_INTERVAL:
+                progress(summary, now - start)
+                last_report = now
+
+        if workers <= 1:
+            if initializer:
+                initializer(*initargs)
+            for group in groups:
+                record(_process_group(process_file, root, group))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+                # Bound the number of queued groups so huge trees do not build a huge backlog
+                in_flight = set()
+                for group in groups:
+                    in_flight.add(pool.submit(_process_group, process_file, root, group))
+                    if len(in_flight) >= workers * 4:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            record(future.result())
+                for future in in_flight:
+                    record(future.result())
+
+    summary["elapsed"] = time.perf_counter() - start
+    if progress:
+        progress(summary, summary["elapsed"])
+    return summary
+
+
+def process_tree(operation, input_path, output_dir, key_path, workers=None,
+                 manifest_path=None, progress=report_progress, compression=None):
+    """
+    Encrypts or decrypts every file selected by a directory or glob pattern
+    into `output_dir`, mirroring the relative layout (see process_files).
+
+    :param operation: "encrypt" or "decrypt".
+    :param input_path: Directory (traversed recursively) or glob pattern.
+    :param output_dir: Directory the results are written to.
+    :param key_path: Path to the public (encrypt) or private (decrypt) key; a
+        list of public key paths encrypts every file for all of them.
+    :param workers: Number of worker processes (default: CPU count).
+    :param manifest_path: Manifest file (default: MANIFEST_NAME in output_dir).
+    :param progress: Callable(summary, elapsed_seconds), called at most once
+        per PROGRESS_INTERVAL and once at the end (None to disable).
+    :param compression: Codec name to compress the chunks with when encrypting (default: None).
+    :return: Summary dictionary with the file counts, bytes and elapsed time.
+    """
+    if operation not in ("encrypt", "decrypt"):
+        raise ValueError(f"Unknown operation: {operation}.")
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+
+    root, relative_paths = collect_inputs(input_path)
+    # Never pick up our own outputs when the output directory is inside the input tree
+    output_prefix = os.path.realpath(output_dir) + os.sep
+    relative_paths = [relative_path for relative_path in relative_paths
+                      if not os.path.realpath(os.path.join(root, relative_path)).startswith(output_prefix)]
+    process_file = functools.partial(_process_file, output_dir=output_dir, operation=operation,
+                                     key_path=key_path, compression=compression)
+    return process_files(root, relative_paths, process_file, manifest_path, workers,
+                         _init_worker, (operation, key_path), progress)
+
+
+def encrypt_tree(input_path, output_dir, public_key_path, workers=None, manifest_path=None,
+                 progress=report_progress, compression=None):
+    """
+    Encrypts every file of a directory or glob pattern; see process_tree.
+    """
+    return process_tree("encrypt", input_path, output_dir, public_key_path, workers,
+                        manifest_path, progress, compression)
+
+
+def decrypt_tree(input_path, output_dir, private_key_path, workers=None, manifest_path=None,
+                 progress=report_progress):
+    """
+    Decrypts every file of a directory or glob pattern; see process_tree.
+    """
+    return process_tree("decrypt", input_path, output_dir, private_key_path, workers,
+                        manifest_path, progress)
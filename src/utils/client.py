@@ -0,0 +1,183 @@
+"""
+Client Module - Crypto Daemon Client
+This module talks to the crypto daemon (`daemon.py`) over its Unix socket.
+Single calls wait for their response; the batch methods pipeline up to
+`window` requests on the connection before waiting, which hides the
+round-trip latency when many small messages are processed.
+"""
+
+import itertools
+import socket
+import threading
+from .batch import BatchResult
+from . import protocol
+from .protocol import DEFAULT_SOCKET_PATH
+
+# Requests in flight per batch; keep below the daemon's DEFAULT_MAX_PIPELINE
+DEFAULT_WINDOW = 32
+
+
+class CryptoClient:
+    """
+    A connection to the crypto daemon. Methods are thread-safe; concurrent
+    callers are serialized on the connection.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        """
+        :param socket_path: Filesystem path of the daemon's Unix socket.
+        :param timeout: Socket timeout in seconds (default: none).
+        """
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._reader = self._socket.makefile("rb")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _send(self, opcode, fields):
+        request_id = next(self._ids) & 0xFFFFFFFF
+        self._socket.sendall(protocol.encode_frame(request_id, opcode, fields))
+        return request_id
+
+    def _receive(self):
+        prefix = self._reader.read(4)
+        if len(prefix) < 4:
+            raise ConnectionError("The daemon closed the connection.")
+        size = protocol.decode_length(prefix)
+        body = self._reader.read(size)
+        if len(body) < size:
+            raise ConnectionError("The daemon closed the connection.")
+        request_id, status, fields = protocol.decode_body(body)
+        if status != protocol.STATUS_OK:
+            return request_id, None, protocol.DaemonError(fields[0].decode() if fields else "Unknown error.")
+        return request_id, fields, None
+
+    def call(self, opcode, *fields):
+        """
+        Sends one request and waits for its response.
+
+        :param opcode: One of the protocol.OP_* opcodes.
+        :param fields: Request fields (bytes).
+        :return: List of response fields (bytes).
+        """
+        with self._lock:
+            request_id = self._send(opcode, fields)
+            response_id, value, error = self._receive()
+        if response_id != request_id:
+            raise protocol.ProtocolError(f"Response for request {response_id}, expected {request_id}.")
+        if error is not None:
+            raise error
+        return value
+
+    def pipeline(self, requests, window=DEFAULT_WINDOW):
+        """
+        Sends many requests on the connection, keeping up to `window` in flight.
+
+        :param requests: Iterable of (opcode, fields) tuples.
+        :param window: Maximum number of unanswered requests.
+        :return: List of BatchResult in request order; `value` is the list of
+            response fields, `error` a DaemonError if the request failed.
+        """
+        requests = list(requests)
+        positions = {}
+        results = [None] * len(requests)
+        with self._lock:
+            sent = 0
+            for _ in range(len(requests)):
+                while sent < len(requests) and len(positions) < window:
+                    opcode, fields = requests[sent]
+                    positions[self._send(opcode, fields)] = sent
+                    sent += 1
+                response_id, value, error = self._receive()
+                results[positions.pop(response_id)] = BatchResult(value, error)
+        return results
+
+    def ping(self):
+        """
+        Checks that the daemon is responsive.
+        """
+        self.call(protocol.OP_PING)
+
+    def encrypt(self, data, public_key_path):
+        """
+        Encrypts data in the hybrid format.
+
+        :param data: Plaintext (string or bytes).
+        :param public_key_path: Path to the public key, as seen by the daemon.
+        :return: Ciphertext (bytes).
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        return self.call(protocol.OP_ENCRYPT, public_key_path.encode(), data)[0]
+
+    def decrypt(self, encrypted_data, private_key_path):
+        """
+        Decrypts hybrid-format or single RSA-OAEP ciphertext.
+
+        :param encrypted_data: Ciphertext (bytes).
+        :param private_key_path: Path to the private key, as seen by the daemon.
+        :return: Plaintext (bytes).
+        """
+        return self.call(protocol.OP_DECRYPT, private_key_path.encode(), encrypted_data)[0]
+
+    def encrypt_many(self, messages, public_key_path, window=DEFAULT_WINDOW):
+        """
+        Encrypts a batch of messages over one pipelined connection.
+
+        :return: List of BatchResult in input order; `value` is the ciphertext.
+        """
+        key = public_key_path.encode()
+        requests = [(protocol.OP_ENCRYPT, (key, message.encode() if isinstance(message, str) else message))
+                    for message in messages]
+        return [BatchResult(result.value[0] if result.ok else None, result.error)
+                for result in self.pipeline(requests, window)]
+
+    def decrypt_many(self, encrypted_messages, private_key_path, window=DEFAULT_WINDOW):
+        """
+        Decrypts a batch of messages over one pipelined connection.
+
+        :return: List of BatchResult in input order; `value` is the plaintext (bytes).
+        """
+        key = private_key_path.encode()
+        requests = [(protocol.OP_DECRYPT, (key, message)) for message in encrypted_messages]
+        return [BatchResult(result.value[0] if result.ok else None, result.error)
+                for result in self.pipeline(requests, window)]
+
+    def generate_keypair(self, algorithm="RSA-2048"):
+        """
+        Generates a key pair in the daemon (from its key pool if one is running).
+
+        :param algorithm: Key algorithm (see keygen.ALGORITHMS).
+        :return: Tuple of (private_pem, public_pem) bytes.
+        """
+        private_pem, public_pem = self.call(protocol.OP_KEYGEN, algorithm.encode())
+        return private_pem, public_pem
+
+    def encrypt_file(self, input_file, output_file, public_key_path):
+        """
+        Has the daemon encrypt a file it can access.
+        """
+        self.call(protocol.OP_ENCRYPT_FILE, input_file.encode(), output_file.encode(),
+                  public_key_path.encode())
+
+    def decrypt_file(self, input_file, output_file, private_key_path):
+        """
+        Has the daemon decrypt a file it can access.
+        """
+        self.call(protocol.OP_DECRYPT_FILE, input_file.encode(), output_file.encode(),
+                  private_key_path.encode())
@@ -0,0 +1,155 @@
+"""
+Compression Module - Per-Chunk Compression
+This module compresses the plaintext of the hybrid format chunk by chunk
+before it is encrypted. Every chunk is compressed on its own, so chunks
+can still be decrypted in parallel or by byte range, and each chunk
+records its codec (CODEC_NONE when it is stored as is). The compressor
+samples the first chunks of a file and stops compressing when they do
+not shrink enough (already compressed or random data); while stopped it
+re-probes one chunk every PROBE_INTERVAL chunks, and it stops again
+after SAMPLE_CHUNKS chunks in a row fail to shrink. Sampled and probed
+chunks are first tested on a PROBE_SIZE prefix, so incompressible input
+costs a few small compressions per file rather than full chunks.
+
+Compressed lengths depend on the plaintext, so a file whose content is
+partly controlled by an attacker can leak information through its chunk
+sizes; compression is therefore opt-in.
+"""
+
+import zlib
+from .constants import DEFAULT_CODEC
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+# Codec name -> codec id recorded per chunk (names listed in constants.CODEC_NAMES)
+CODECS = {"zlib": CODEC_ZLIB}
+DEFAULT_LEVEL = 1
+SAMPLE_CHUNKS = 4
+# A chunk counts as compressible when it shrinks by at least this fraction
+MIN_SAVING = 0.10
+PROBE_INTERVAL = 256
+PROBE_SIZE = 4096
+
+
+def _shrinks(packed, data):
+    return len(packed) <= len(data) * (1 - MIN_SAVING)
+
+
+def codec_id(codec):
+    """
+    Returns the codec id for a codec name.
+
+    :param codec: One of CODECS' names, e.g. "zlib".
+    :return: Codec id (int).
+    """
+    try:
+        return CODECS[codec]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec: {codec}. Choose from {', '.join(CODECS)}.")
+
+
+class ChunkCompressor:
+    """
+    Compresses chunks with incompressibility detection.
+    """
+
+    def __init__(self, codec=DEFAULT_CODEC, level=DEFAULT_LEVEL, sample_chunks=SAMPLE_CHUNKS,
+                 enabled=True):
+        """
+        :param codec: Codec name, e.g. "zlib".
+        :param level: Compression level of the codec.
+        :param sample_chunks: Number of leading chunks whose overall saving
+            decides whether compression stays enabled.
+        :param enabled: Initial state, e.g. a decision taken on a sample
+            elsewhere (used with sample_chunks=0).
+        """
+        self.codec_id = codec_id(codec)
+        self.level = level
+        self.sample_chunks = sample_chunks
+        self.enabled = enabled
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._count = 0
+        self._misses = 0
+        self._sample_in = 0
+        self._sample_out = 0
+
+    def compress(self, chunk):
+        """
+        Compresses one chunk, or passes it through when compression is
+        disabled or does not make it smaller.
+
+        :param chunk: Plaintext chunk (bytes-like).
+        :return: Tuple of (codec id, data); data is `chunk` itself when stored.
+        """
+        self._count += 1
+        sampling = self._count <= self.sample_chunks
+        if self.enabled and not sampling:
+            packed = zlib.compress(chunk, self.level)
+        elif sampling or self._count % PROBE_INTERVAL == 0:
+            # A small prefix tells cheaply whether the whole chunk is worth compressing
+            probe = chunk[:PROBE_SIZE]
+            packed = zlib.compress(chunk, self.level) if _shrinks(zlib.compress(probe, self.level), probe) else None
+        else:
+            packed = None
+
+        saved = packed is not None and _shrinks(packed, chunk)
+        if sampling:
+            self._sample_in += len(chunk)
+            self._sample_out += len(packed) if saved else len(chunk)
+            self.enabled = self._sample_out <= self._sample_in * (1 - MIN_SAVING)
+        elif packed is not None:
+            self._misses = 0 if saved else self._misses + 1
+            if saved:
+                self.enabled = True
+            elif self._misses >= SAMPLE_CHUNKS:
+                self.enabled = False
+        if packed is None or len(packed) >= len(chunk):
+            return self._stored(chunk)
+        self.bytes_in += len(chunk)
+        self.bytes_out += len(packed)
+        return self.codec_id, packed
+
+    def _stored(self, chunk):
+        self.bytes_in += len(chunk)
+        self.bytes_out += len(chunk)
+        return CODEC_NONE, chunk
+
+
+def sample_compressible(chunks, codec=DEFAULT_CODEC, level=DEFAULT_LEVEL):
+    """
+    Decides on a sample of chunks whether compression is worthwhile.
+
+    :param chunks: Iterable of leading plaintext chunks (bytes-like).
+    :param codec: Codec name.
+    :param level: Compression level of the codec.
+    :return: True if the sample shrinks by at least MIN_SAVING overall.
+    """
+    compressor = ChunkCompressor(codec, level, sample_chunks=SAMPLE_CHUNKS)
+    for chunk in chunks:
+        compressor.compress(chunk)
+    return compressor.enabled
+
+
+def decompress_chunk(codec, data, size):
+    """
+    Restores one chunk.
+
+    :param codec: Codec id recorded for the chunk.
+    :param data: Decrypted chunk data (bytes-like).
+    :param size: Expected plaintext size of the chunk.
+    :return: Plaintext chunk (bytes-like).
+    """
+    if codec == CODEC_NONE:
+        result = data
+    elif codec == CODEC_ZLIB:
+        decompressor = zlib.decompressobj()
+        # Never inflate past the expected size, whatever the data claims
+        result = decompressor.decompress(data, size or 1)
+        if not decompressor.eof or decompressor.unconsumed_tail or decompressor.unused_data:
+            raise ValueError("Corrupted compressed chunk.")
+    else:
+        raise ValueError(f"Unknown compression codec id: {codec}.")
+    if len(result) != size:
+        raise ValueError("Corrupted compressed chunk.")
+    return result
@@ -0,0 +1,32 @@
+"""
+Constants Module - Dependency-Free Names
+This module holds the names the command line needs before it knows which
+operation runs: key algorithms, key file formats, compression codecs and
+the names of the bookkeeping files the tools write. It imports nothing,
+so parsing arguments does not load `cryptography` or the crypto modules;
+those modules take their names from here.
+"""
+
+# Key algorithms for key generation
+ALGORITHMS = ["RSA-2048", "ML-KEM-512", "ML-KEM-768", "ML-KEM-1024",
+              "X25519-ML-KEM-512", "X25519-ML-KEM-768", "X25519-ML-KEM-1024"]
+DEFAULT_ALGORITHM = "RSA-2048"
+
+# Key file formats (see keyformat)
+KEY_FORMATS = ("pem", "der", "raw")
+DEFAULT_KEY_FORMAT = "pem"
+
+# Chunk compression codecs (see compression)
+CODEC_NAMES = ("zlib",)
+DEFAULT_CODEC = "zlib"
+
+# Bookkeeping files written next to the data (see bulk, rotate and incremental)
+MANIFEST_NAME = ".pqc-manifest.jsonl"
+PARTIAL_SUFFIX = ".part"
+UPDATE_JOURNAL_SUFFIX = ".pqc-journal"
+ROTATE_MANIFEST_NAME = ".pqc-rotate-manifest.jsonl"
+ROTATE_JOURNAL_SUFFIX = ".pqc-rotate"
+ROTATE_PARTIAL_SUFFIX = ".pqc-rotate" + PARTIAL_SUFFIX
+# Never taken as input by directory and glob operations
+BOOKKEEPING_SUFFIXES = (MANIFEST_NAME, PARTIAL_SUFFIX, UPDATE_JOURNAL_SUFFIX, ROTATE_MANIFEST_NAME,
+                        ROTATE_JOURNAL_SUFFIX)
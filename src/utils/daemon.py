@@ -0,0 +1,210 @@
+"""
+Daemon Module - Resident Crypto Service
+This module runs a long-lived encryption service on a Unix domain socket.
+Parsed keys stay in the process-wide key cache between requests, so
+clients pay neither interpreter start-up nor key parsing per call.
+Requests use the length-prefixed protocol of `protocol.py`; each
+connection is read continuously and its requests run concurrently on the
+asyncio executor, so clients may pipeline requests and receive the
+responses in completion order.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import stat
+from .aio import AsyncCrypto
+from .encrypt import encrypt_data
+from .decrypt import decrypt_data
+from .hybrid import MAGIC, encrypt_bytes, decrypt_bytes, oaep_padding
+from .keycache import load_public_key, load_private_key
+from .keygen import generate_keypair_pem
+from . import protocol
+from .protocol import DEFAULT_SOCKET_PATH
+
+# Requests in flight per connection before the daemon stops reading from it
+DEFAULT_MAX_PIPELINE = 128
+
+logger = logging.getLogger(__name__)
+
+
+# Request handlers run on the executor; they take the request fields (bytes)
+# and return the response fields.
+def _ping():
+    return []
+
+
+def _encrypt(key_path, data):
+    return [encrypt_bytes(data, load_public_key(key_path.decode()))]
+
+
+def _decrypt(key_path, data):
+    private_key = load_private_key(key_path.decode())
+    if data[:len(MAGIC)] == MAGIC:
+        return [decrypt_bytes(data, private_key)]
+    # Anything else is a single RSA-OAEP ciphertext (encrypt_string output)
+    return [private_key.decrypt(data, oaep_padding())]
+
+
+def _keygen(algorithm):
+    return list(generate_keypair_pem(algorithm.decode()))
+
+
+def _encrypt_file(input_file, output_file, key_path):
+    encrypt_data(input_file.decode(), output_file.decode(), key_path.decode())
+    return []
+
+
+def _decrypt_file(input_file, output_file, key_path):
+    decrypt_data(input_file.decode(), output_file.decode(), key_path.decode())
+    return []
+
+
+# Opcode -> (number of request fields, handler)
+_HANDLERS = {
+    protocol.OP_PING: (0, _ping),
+    protocol.OP_ENCRYPT: (2, _encrypt),
+    protocol.OP_DECRYPT: (2, _decrypt),
+    protocol.OP_KEYGEN: (1, _keygen),
+    protocol.OP_ENCRYPT_FILE: (3, _encrypt_file),
+    protocol.OP_DECRYPT_FILE: (3, _decrypt_file),
+}
+
+
+class CryptoDaemon:
+    """
+    Serves encryption, decryption and key generation on a Unix socket.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, max_workers=None,
+                 max_pipeline=DEFAULT_MAX_PIPELINE):
+        """
+        :param socket_path: Filesystem path of the Unix socket.
+        :param max_workers: Number of executor threads (default: CPU count).
+        :param max_pipeline: Requests in flight per connection.
+        """
+        self.socket_path = socket_path
+        self.max_pipeline = max_pipeline
+        self._crypto = AsyncCrypto(max_workers)
+        self._server = None
+
+    async def start(self):
+        """
+        Binds the socket (replacing a stale one) and starts accepting clients.
+        """
+        if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+            os.remove(self.socket_path)
+        # Only the owner may talk to the daemon: bind under a umask that already
+        # gives the socket mode 0600, so it is never reachable by anyone else
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            umask = os.umask(0o177)
+            try:
+                sock.bind(self.socket_path)
+            finally:
+                os.umask(umask)
+            self._server = await asyncio.start_unix_server(self._handle_client, sock=sock)
+        except BaseException:
+            sock.close()
+            raise
+        logger.info("Crypto daemon listening on %s", self.socket_path)
+
+    async def serve_forever(self):
+        """
+        Starts the daemon if needed and serves until cancelled or closed.
+        """
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops accepting clients, removes the socket and shuts the executor down.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        self._crypto.shutdown(wait=False)
+
+    async def _handle_client(self, reader, writer):
+        pipeline = asyncio.Semaphore(self.max_pipeline)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    prefix = await reader.readexactly(4)
+                except asyncio.IncompleteReadError:
+                    break
+                body = await reader.readexactly(protocol.decode_length(prefix))
+                request_id, opcode, fields = protocol.decode_body(body)
+                await pipeline.acquire()
+                task = asyncio.create_task(
+                    self._respond(request_id, opcode, fields, writer, write_lock, pipeline))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (protocol.ProtocolError, asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.warning("Dropping client connection: %s", e)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, request_id, opcode, fields, writer, write_lock, pipeline):
+        try:
+            try:
+                handler = _HANDLERS.get(opcode)
+                if handler is None:
+                    raise ValueError(f"Unknown opcode: {opcode}.")
+                if len(fields) != handler[0]:
+                    raise ValueError(f"Opcode {opcode} takes {handler[0]} fields, got {len(fields)}.")
+                result = await self._crypto.run(handler[1], *fields)
+                frame = protocol.encode_frame(request_id, protocol.STATUS_OK, result)
+            except Exception as e:
+                message = f"{type(e).__name__}: {e}".encode()
+                frame = protocol.encode_frame(request_id, protocol.STATUS_ERROR, [message])
+
+            async with write_lock:
+                writer.write(frame)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Released only once the response is written, so a client that
+            # stops reading also stops the daemon from reading its requests
+            pipeline.release()
+
+
+def serve(socket_path=DEFAULT_SOCKET_PATH, max_workers=None, max_pipeline=DEFAULT_MAX_PIPELINE):
+    """
+    Runs the daemon in the current thread until SIGINT or SIGTERM.
+
+    :param socket_path: Filesystem path of the Unix socket.
+    :param max_workers: Number of executor threads (default: CPU count).
+    :param max_pipeline: Requests in flight per connection.
+    """
+
+    async def main():
+        daemon = CryptoDaemon(socket_path, max_workers, max_pipeline)
+        await daemon.start()
+        task = asyncio.ensure_future(daemon.serve_forever())
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, task.cancel)
+        await task
+
+    asyncio.run(main())
@@ -10,70 +10,152 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
+import logging
+import os
+from .hybrid import (decrypt_file, decrypt_file_parallel, decrypt_file_range, decrypt_message, is_hybrid_file,
+                     oaep_padding)
+from .keycache import load_private_key, key_algorithm
+from .batch import run_batch
+from . import metrics
 
-def decrypt_data(input_file, output_file, private_key_path):
+logger = logging.getLogger(__name__)
+
+
+def decrypt_data(input_file, output_file, private_key_path, workers=1, cancelled=None):
     """
-    Decrypts the content of an encrypted file using RSA private key decryption.
+    Decrypts the content of an encrypted file using private key decryption.
     The decrypted data is saved to the specified output file.
+
+    Files written in the hybrid format are detected by their header and
+    decrypted chunk by chunk from a memory map; anything else is treated
+    as a single RSA-OAEP ciphertext. With `workers` greater than one,
+    hybrid files are decrypted in parallel by a pool of worker processes.
     
     :param input_file: Path to the encrypted input file.
     :param output_file: Path where the decrypted data will be saved.
-    :param private_key_path: Path to the private key (PEM format).
+    :param private_key_path: Path to the private key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+    :param workers: Number of worker processes for hybrid files (default: 1).
+    :param cancelled: Optional threading.Event; once it is set, hybrid
+        decryption stops between chunks with concurrent.futures.CancelledError
+        (the partial output is left to the caller).
     """
 
-    # Load the private key
-    with open(private_key_path, "rb") as key_file:
-        private_key = serialization.load_pem_private_key(
-            key_file.read(), password=None, backend=default_backend()
-        )
+    with metrics.track("decrypt_data") as operation:
+        # Load the private key (parsed keys are cached per path)
+        private_key = load_private_key(private_key_path)
+        operation.algorithm = key_algorithm(private_key)
+        operation.bytes = os.path.getsize(input_file)
+        hybrid = is_hybrid_file(input_file)
+
+        if hybrid and workers > 1:
+            # Decrypt the chunks in a process pool, writing each at its offset
+            decrypt_file_parallel(input_file, output_file, private_key, workers, cancelled=cancelled)
+
+        elif hybrid:
+            # Map the file and decrypt it chunk by chunk without copies
+            decrypt_file(input_file, output_file, private_key, cancelled=cancelled)
+
+        else:
+            if not isinstance(private_key, rsa.RSAPrivateKey):
+                raise ValueError("KEM keys can only decrypt hybrid files.")
+
+            # Read the encrypted input file
+            with open(input_file, "rb") as enc_file:
+                encrypted_data = enc_file.read()
+
+            # Decrypt the data using the private key
+            decrypted_data = private_key.decrypt(
+                encrypted_data,
+                padding.OAEP(
+                    algorithm=hashes.SHA256(),
+                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                    label=None
+                )
+            )
+
+            # Save the decrypted data to the output file
+            with open(output_file, "wb") as dec_file:
+                dec_file.write(decrypted_data)
+
+    logger.debug("Data successfully decrypted and saved to %s", output_file)
+
+
+def decrypt_range(input_file, offset, length, private_key_path):
+    """
+    Decrypts a byte range of a hybrid-encrypted file. Only the chunks
+    covering the range are read and decrypted, located through the chunk
+    index at the end of the file.
 
-    # Read the encrypted input file
-    with open(input_file, "rb") as enc_file:
-        encrypted_data = enc_file.read()
+    :param input_file: Path to the encrypted input file.
+    :param offset: Plaintext offset of the first byte to return.
+    :param length: Number of bytes to return (fewer near the end of the data).
+    :param private_key_path: Path to the private key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+    :return: Decrypted data (bytes).
+    """
 
-    # Decrypt the data using the private key
-    decrypted_data = private_key.decrypt(
-        encrypted_data,
-        padding.OAEP(
-            algorithm=hashes.SHA256(),
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            label=None
-        )
-    )
+    with metrics.track("decrypt_range") as operation:
+        # Load the private key (parsed keys are cached per path)
+        private_key = load_private_key(private_key_path)
+        operation.algorithm = key_algorithm(private_key)
 
-    # Save the decrypted data to the output file
-    with open(output_file, "wb") as dec_file:
-        dec_file.write(decrypted_data)
+        decrypted_data = decrypt_file_range(input_file, offset, length, private_key)
+        operation.bytes = len(decrypted_data)
 
-    print(f"[INFO] Data successfully decrypted and saved to {output_file}")
+    return decrypted_data
 
 
 def decrypt_string(encrypted_data, private_key_path):
     """
-    Decrypts a string of encrypted data using RSA private key decryption.
+    Decrypts a string encrypted by encrypt_string with the matching
+    private key (RSA, ML-KEM or X25519 + ML-KEM).
     
     :param encrypted_data: The encrypted data (bytes) to be decrypted.
-    :param private_key_path: Path to the private key (PEM format).
+    :param private_key_path: Path to the private key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
     :return: Decrypted data (string).
     """
     
-    # Load the private key
-    with open(private_key_path, "rb") as key_file:
-        private_key = serialization.load_pem_private_key(
-            key_file.read(), password=None, backend=default_backend()
-        )
-
-    # Decrypt the data (bytes to string)
-    decrypted_data = private_key.decrypt(
-        encrypted_data,
-        padding.OAEP(
-            algorithm=hashes.SHA256(),
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            label=None
-        )
-    )
-
-    decrypted_string = decrypted_data.decode()
-
-    print("[INFO] Data successfully decrypted.")
+    with metrics.track("decrypt_string") as operation:
+        # Load the private key (parsed keys are cached per path)
+        private_key = load_private_key(private_key_path)
+        operation.algorithm = key_algorithm(private_key)
+        operation.bytes = len(encrypted_data)
+
+        # Decrypt the data (bytes to string)
+        decrypted_data = decrypt_message(private_key, encrypted_data)
+
+        decrypted_string = decrypted_data.decode()
+
+    logger.debug("Data successfully decrypted.")
     return decrypted_string
+
+
+def decrypt_many(encrypted_messages, private_key_path, workers=None, executor=None, decode=True):
+    """
+    Decrypts a batch of messages with one private key (see decrypt_string
+    for the KEM case). The key is loaded once and the operations are
+    spread over a thread pool. Nothing is logged per message.
+
+    :param encrypted_messages: Iterable of encrypted messages (bytes).
+    :param private_key_path: Path to the private key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+    :param workers: Number of worker threads (default: CPU count).
+    :param executor: Optional existing executor to run the batch on.
+    :param decode: Decode the plaintexts to strings (default: True).
+    :return: List of BatchResult in input order; `value` is the decrypted data.
+    """
+
+    with metrics.track("decrypt_many") as operation:
+        private_key = load_private_key(private_key_path)
+        operation.algorithm = key_algorithm(private_key)
+        oaep = oaep_padding()
+        encrypted_messages = list(encrypted_messages)
+        operation.bytes = sum(len(encrypted_data) for encrypted_data in encrypted_messages)
+
+        def decrypt_one(encrypted_data):
+            decrypted_data = decrypt_message(private_key, encrypted_data, oaep)
+            return decrypted_data.decode() if decode else decrypted_data
+
+        return run_batch(decrypt_one, encrypted_messages, workers=workers, executor=executor)
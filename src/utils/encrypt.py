@@ -11,72 +11,185 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
+import logging
 import os
+from .hybrid import encrypt_file, encrypt_file_parallel, encrypt_message, oaep_padding, DEFAULT_CHUNK_SIZE
+from .incremental import update_file
+from .keycache import load_private_key, load_public_key, load_public_keys, key_algorithm
+from .batch import run_batch
+from . import metrics
 
+logger = logging.getLogger(__name__)
 
-def encrypt_data(input_file, output_file, public_key_path):
+
+def encrypt_data(input_file, output_file, public_key_path, hybrid=True,
+                 chunk_size=DEFAULT_CHUNK_SIZE, workers=1, compression=None, incremental=False,
+                 cancelled=None):
     """
-    Encrypts the content of an input file using RSA public key encryption.
+    Encrypts the content of an input file using public key encryption.
     The encrypted data is saved to the specified output file.
+
+    In hybrid mode (the default) a random AES-256-GCM data key encrypts the
+    file chunk by chunk, and only the data key is encrypted with the public
+    key: RSA-OAEP for RSA keys, or KEM encapsulation for ML-KEM and
+    X25519 + ML-KEM keys, so the algorithm follows the key file. Given
+    several public keys, the file is encrypted once and the data key is
+    wrapped for each of them, so any one of the matching private keys
+    decrypts it. The input is memory-mapped and passed to the cipher
+    without intermediate copies, so inputs of any size are handled with
+    flat memory use. With `workers` greater than
+    one, the chunks are encrypted in parallel by a pool of worker
+    processes; the chunk layout does not depend on the number of workers.
+    With `compression` set, each chunk is compressed before it is
+    encrypted unless the data turns out to be incompressible (see the
+    compression module); decryption detects this from the file.
+    With `incremental` set, a digest of every chunk is kept in the file's
+    index so that later versions of the input can be applied with
+    update_data, which rewrites only the changed chunks; such files are
+    encrypted sequentially and cannot be compressed.
+    With `hybrid=False` the whole file is encrypted with a single RSA-OAEP
+    operation, which only works for very small inputs.
     
     :param input_file: Path to the input file to be encrypted.
     :param output_file: Path where the encrypted data will be saved.
-    :param public_key_path: Path to the public key (PEM format).
+    :param public_key_path: Path to the public key (RSA, ML-KEM or X25519 + ML-KEM),
+        or a list of paths to encrypt for several recipients (hybrid mode only).
+    :param hybrid: Use the streaming hybrid format (default: True).
+    :param chunk_size: Plaintext chunk size in bytes for hybrid mode.
+    :param workers: Number of worker processes for hybrid mode (default: 1).
+    :param compression: Codec name (e.g. "zlib") to compress the chunks with
+        in hybrid mode, or None (default) for no compression.
+    :param incremental: Make the file updatable with update_data (hybrid mode only).
+    :param cancelled: Optional threading.Event; once it is set, hybrid
+        encryption stops between chunks with concurrent.futures.CancelledError
+        (the partial output is left to the caller).
     """
 
-    # Load the public key
-    with open(public_key_path, "rb") as key_file:
-        public_key = serialization.load_pem_public_key(
-            key_file.read(), backend=default_backend()
-        )
+    with metrics.track("encrypt_data") as operation:
+        # Load the recipients' public keys (parsed keys are cached per path)
+        public_keys = load_public_keys(public_key_path)
+        public_key = public_keys[0]
+        operation.algorithm = key_algorithm(public_key)
+        operation.bytes = os.path.getsize(input_file)
+
+        if hybrid and incremental:
+            # Record the chunk digests that update_data compares against
+            encrypt_file(input_file, output_file, public_keys, chunk_size, compression=compression,
+                         incremental=True, cancelled=cancelled)
+
+        elif hybrid and workers > 1:
+            # Encrypt the chunks in a process pool, writing each at its offset
+            encrypt_file_parallel(input_file, output_file, public_keys, chunk_size, workers,
+                                  compression=compression, cancelled=cancelled)
+
+        elif hybrid:
+            # Map the file and encrypt it chunk by chunk without copies
+            encrypt_file(input_file, output_file, public_keys, chunk_size, compression=compression,
+                         cancelled=cancelled)
+
+        else:
+            if len(public_keys) > 1:
+                raise ValueError("Several recipients require hybrid mode.")
+            if compression:
+                raise ValueError("Compression requires hybrid mode.")
+            if incremental:
+                raise ValueError("Incremental updates require hybrid mode.")
+            if not isinstance(public_key, rsa.RSAPublicKey):
+                raise ValueError("KEM keys can only be used in hybrid mode.")
+
+            # Read the input file data
+            with open(input_file, "rb") as file:
+                data = file.read()
+
+            # Encrypt the data using the public key
+            encrypted_data = public_key.encrypt(
+                data,
+                padding.OAEP(
+                    algorithm=hashes.SHA256(),
+                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                    label=None
+                )
+            )
+
+            # Save the encrypted data to the output file
+            with open(output_file, "wb") as enc_file:
+                enc_file.write(encrypted_data)
+
+    logger.debug("Data successfully encrypted and saved to %s", output_file)
 
-    # Read the input file data
-    with open(input_file, "rb") as file:
-        data = file.read()
 
-    # Encrypt the data using the public key
-    encrypted_data = public_key.encrypt(
-        data,
-        padding.OAEP(
-            algorithm=hashes.SHA256(),
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            label=None
-        )
-    )
+def update_data(input_file, output_file, private_key_path):
+    """
+    Brings a file encrypted with `incremental=True` up to date with a new
+    version of its plaintext. Only the chunks whose content changed are
+    re-encrypted (under fresh nonces) and rewritten in place, so the cost
+    of an update follows the amount of changed data rather than the file
+    size. An interrupted update is rolled back by the next one.
+
+    :param input_file: Path to the new plaintext.
+    :param output_file: Path to the encrypted file to update.
+    :param private_key_path: Path to the private key the file was encrypted for
+        (needed to recover the data key).
+    :return: Dictionary with the chunk count, the number of rewritten chunks
+        and the number of bytes written.
+    """
 
-    # Save the encrypted data to the output file
-    with open(output_file, "wb") as enc_file:
-        enc_file.write(encrypted_data)
+    with metrics.track("update_data") as operation:
+        private_key = load_private_key(private_key_path)
+        operation.algorithm = key_algorithm(private_key)
+        operation.bytes = os.path.getsize(input_file)
+        summary = update_file(input_file, output_file, private_key)
 
-    print(f"[INFO] Data successfully encrypted and saved to {output_file}")
+    logger.debug("%d of %d chunks of %s updated", summary["changed"], summary["chunks"], output_file)
+    return summary
 
 
 def encrypt_string(data, public_key_path):
     """
-    Encrypts a string of data using RSA public key encryption.
+    Encrypts a string of data with a public key: RSA-OAEP for RSA keys,
+    or a hybrid container for ML-KEM and X25519 + ML-KEM keys.
     
     :param data: The data (string) to be encrypted.
-    :param public_key_path: Path to the public key (PEM format).
+    :param public_key_path: Path to the public key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
     :return: Encrypted data (bytes).
     """
     
-    # Load the public key
-    with open(public_key_path, "rb") as key_file:
-        public_key = serialization.load_pem_public_key(
-            key_file.read(), backend=default_backend()
-        )
-
-    # Encrypt the data (string to bytes)
-    encrypted_data = public_key.encrypt(
-        data.encode(),
-        padding.OAEP(
-            algorithm=hashes.SHA256(),
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            label=None
-        )
-    )
-
-    print("[INFO] Data successfully encrypted.")
+    with metrics.track("encrypt_string") as operation:
+        # Load the public key (parsed keys are cached per path)
+        public_key = load_public_key(public_key_path)
+        operation.algorithm = key_algorithm(public_key)
+
+        # Encrypt the data (string to bytes)
+        plaintext = data.encode()
+        operation.bytes = len(plaintext)
+        encrypted_data = encrypt_message(public_key, plaintext)
+
+    logger.debug("Data successfully encrypted.")
     return encrypted_data
 
 
+def encrypt_many(messages, public_key_path, workers=None, executor=None):
+    """
+    Encrypts a batch of messages with one public key (see encrypt_string
+    for the KEM case). The key is loaded once and the operations are
+    spread over a thread pool. Nothing is logged per message.
+
+    :param messages: Iterable of messages (strings or bytes) to be encrypted.
+    :param public_key_path: Path to the public key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+    :param workers: Number of worker threads (default: CPU count).
+    :param executor: Optional existing executor to run the batch on.
+    :return: List of BatchResult in input order; `value` is the encrypted data (bytes).
+    """
+
+    with metrics.track("encrypt_many") as operation:
+        public_key = load_public_key(public_key_path)
+        operation.algorithm = key_algorithm(public_key)
+        oaep = oaep_padding()
+        messages = [message.encode() if isinstance(message, str) else message
+                    for message in messages]
+        operation.bytes = sum(len(message) for message in messages)
+
+        return run_batch(lambda message: encrypt_message(public_key, message, oaep), messages,
+                         workers=workers, executor=executor)
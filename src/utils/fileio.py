@@ -0,0 +1,148 @@
+"""
+File I/O Module - Zero-Copy Input
+This module maps input files into memory so that the encryption and
+decryption loops can hand `memoryview` slices straight to the cipher
+instead of reading each chunk into a new bytes object. Pages that have
+been processed are released back to the OS as the loop advances, so the
+resident set stays bounded no matter how large the file is.
+
+It also holds the journal used to make in-place rewrites of encrypted
+files crash-safe: a list of (offset, bytes) entries plus a value and a
+file size chosen by the caller, fsynced and checksummed before the file
+is touched. A journal with a bad checksum was never completed, which
+means the file was not modified yet.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+
+# Pages behind the current position are released in steps of this size
+RELEASE_INTERVAL = 8 * 1024 * 1024
+
+_CAN_RELEASE = hasattr(mmap.mmap, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+
+_JOURNAL_MAGIC = b"PQCJ"
+# magic, caller value, file size, entry count
+_JOURNAL_HEADER_FORMAT = ">4sIQI"
+_JOURNAL_HEADER_SIZE = struct.calcsize(_JOURNAL_HEADER_FORMAT)
+# offset, length, followed by the bytes
+_JOURNAL_ENTRY_FORMAT = ">QI"
+_JOURNAL_ENTRY_SIZE = struct.calcsize(_JOURNAL_ENTRY_FORMAT)
+_CHECKSUM_SIZE = 32
+
+
+class MappedInput:
+    """
+    A read-only memory map of an input file exposed as a memoryview.
+    Use as a context manager; an empty file yields an empty view.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the file to map.
+        """
+        self.path = path
+        self.size = 0
+        self.view = None
+        self._file = None
+        self._map = None
+        self._released = 0
+
+    def __enter__(self):
+        self._file = open(self.path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self._map)
+        else:
+            self.view = memoryview(b"")
+        return self
+
+    def release_consumed(self, position):
+        """
+        Drops mapped pages before `position` from the resident set once at
+        least RELEASE_INTERVAL bytes have been consumed since the last call.
+
+        :param position: Offset up to which the input has been processed.
+        """
+        if not _CAN_RELEASE or self._map is None:
+            return
+        end = position - position % mmap.PAGESIZE
+        if end - self._released >= RELEASE_INTERVAL:
+            self._map.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+            self._released = end
+
+    def __exit__(self, exc_type, exc, tb):
+        self.view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        return False
+
+
+def fsync_directory(path):
+    """
+    Makes the creation, removal or renaming of a file durable by syncing
+    its directory (a no-op where directories cannot be opened).
+
+    :param path: Path of the file.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def write_journal(path, value, file_size, entries):
+    """
+    Writes a journal and makes it durable.
+
+    :param path: Path of the journal.
+    :param value: Caller-defined 32-bit value.
+    :param file_size: Size of the journaled file.
+    :param entries: List of (offset, bytes) pairs.
+    """
+    body = bytearray(struct.pack(_JOURNAL_HEADER_FORMAT, _JOURNAL_MAGIC, value, file_size, len(entries)))
+    for offset, data in entries:
+        body += struct.pack(_JOURNAL_ENTRY_FORMAT, offset, len(data))
+        body += data
+    body += hashlib.sha256(body).digest()
+    with open(path, "wb") as file:
+        file.write(body)
+        file.flush()
+        os.fsync(file.fileno())
+    fsync_directory(path)
+
+
+def read_journal(path):
+    """
+    Reads a journal written by write_journal.
+
+    :param path: Path of the journal.
+    :return: Tuple of (value, file size, list of (offset, bytes) entries), or
+        None if the journal was not completely written.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    body = memoryview(data)[:-_CHECKSUM_SIZE]
+    if (len(data) < _JOURNAL_HEADER_SIZE + _CHECKSUM_SIZE
+            or hashlib.sha256(body).digest() != data[-_CHECKSUM_SIZE:]):
+        return None
+    magic, value, file_size, count = struct.unpack_from(_JOURNAL_HEADER_FORMAT, data)
+    if magic != _JOURNAL_MAGIC:
+        raise ValueError(f"Not a journal: {path}.")
+    entries = []
+    position = _JOURNAL_HEADER_SIZE
+    for _ in range(count):
+        offset, length = struct.unpack_from(_JOURNAL_ENTRY_FORMAT, data, position)
+        position += _JOURNAL_ENTRY_SIZE
+        entries.append((offset, body[position:position + length]))
+        position += length
+    if position != len(body):
+        raise ValueError(f"Corrupted journal: {path}.")
+    return value, file_size, entries
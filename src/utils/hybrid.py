@@ -0,0 +1,1013 @@
+"""
+Hybrid Module - Streaming Hybrid Encryption
+This module implements the hybrid model described in the architecture
+documentation: a random AES-256-GCM data key encrypts the payload in
+fixed-size chunks, and the data key itself is wrapped with each
+recipient's public key: RSA-OAEP/SHA-256 for RSA keys, or a KEM
+encapsulation plus AES key wrap for ML-KEM and X25519 + ML-KEM keys. Files are processed through a fixed-size
+buffer so memory use stays flat regardless of the input size. A file
+may have many recipients: the payload is encrypted once and only the
+data key is wrapped once per recipient.
+
+File layout (version 1):
+    magic (4) | version (1) | chunk size (4) | recipient count (2)
+    | recipients... | nonce prefix (8) | chunk frames... | index frame
+    | generation (4) | index frame length (4) | index magic (4)
+
+where each recipient entry is:
+    algorithm id (1) | key fingerprint (32) | wrapped key length (2) | wrapped key
+
+Each chunk frame is the AES-GCM ciphertext of one chunk followed by its
+16-byte tag. The nonce is the nonce prefix followed by the 32-bit chunk
+counter, and the associated data marks the final chunk so that a
+truncated file fails to authenticate. The index frame is an AES-GCM
+encrypted table of the plaintext size, the chunk count, a flags byte and
+the length of every chunk frame; it lets a reader locate and decrypt any
+chunk without touching the ones before it. When chunks are compressed
+(see the compression module), the index also holds one codec id per
+chunk. Files encrypted for incremental updates (see the incremental
+module) hold a generation and a keyed digest per chunk: a chunk
+rewritten in update generation G gets the nonce prefix XOR G. The
+trailer records the file generation (0 until the first update), and the
+index is encrypted under the nonce prefix XOR-ed the same way.
+
+Files that do not start with the magic are single RSA-OAEP ciphertexts,
+the format used before hybrid mode; decrypt_data still reads them.
+"""
+
+import hashlib
+import io
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from itertools import accumulate
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import keywrap
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from .compression import ChunkCompressor, decompress_chunk, sample_compressible, SAMPLE_CHUNKS
+from .fileio import MappedInput
+from .keycache import key_fingerprint
+
+MAGIC = b"PQCH"
+INDEX_MAGIC = b"PQCX"
+VERSION = 1
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DATA_KEY_SIZE = 32
+NONCE_PREFIX_SIZE = 8
+TAG_SIZE = 16
+FINGERPRINT_SIZE = 32
+
+# Algorithm ids recorded in the header
+ALGORITHM_IDS = {"RSA-OAEP": 1, "ML-KEM-512": 2, "ML-KEM-768": 3, "ML-KEM-1024": 4,
+                 "X25519-ML-KEM-512": 5, "X25519-ML-KEM-768": 6, "X25519-ML-KEM-1024": 7}
+ALGORITHM_NAMES = {algorithm_id: name for name, algorithm_id in ALGORITHM_IDS.items()}
+
+_HEADER_FORMAT = ">4sBIH"
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+_RECIPIENT_FORMAT = ">B32sH"
+_RECIPIENT_SIZE = struct.calcsize(_RECIPIENT_FORMAT)
+_MAX_RECIPIENTS = 2 ** 16 - 1
+_INDEX_FORMAT = ">QIB"
+# Index flags: a codec id per chunk follows the frame lengths; then a
+# generation and a digest per chunk (files that can be updated incrementally)
+_INDEX_CODECS = 0x01
+_INDEX_DIGESTS = 0x02
+DIGEST_SIZE = 16
+_DIGEST_NONCE = bytes(12)
+_TRAILER_FORMAT = ">II4s"
+_TRAILER_SIZE = struct.calcsize(_TRAILER_FORMAT)
+# The all-ones counter is reserved for the index frame
+_INDEX_NONCE_SUFFIX = b"\xff\xff\xff\xff"
+_MAX_CHUNKS = 2 ** 32 - 1
+CHUNKS_PER_TASK = 16
+
+# Older cryptography releases lack the *_into AEAD methods
+_HAS_INTO = hasattr(AESGCM, "encrypt_into")
+
+Recipient = namedtuple("Recipient", ["algorithm_id", "fingerprint", "wrapped_key"])
+HybridHeader = namedtuple("HybridHeader", ["version", "chunk_size", "recipients", "nonce_prefix", "size"])
+ChunkIndex = namedtuple("ChunkIndex", ["plaintext_size", "offsets", "lengths", "codecs", "generations",
+                                       "digests", "generation"], defaults=(None, None, None, 0))
+
+
+def oaep_padding():
+    """
+    Returns the RSA-OAEP padding used throughout the package.
+
+    :return: OAEP padding with SHA-256 and MGF1/SHA-256.
+    """
+    return padding.OAEP(
+        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+        algorithm=hashes.SHA256(),
+        label=None
+    )
+
+
+def wrap_data_key(public_key, data_key):
+    """
+    Wraps a symmetric data key with the recipient's public key.
+    RSA keys encrypt the data key with OAEP. KEM keys (ML-KEM or
+    X25519 + ML-KEM) encapsulate a fresh shared secret and wrap the data key under it with AES key wrap
+    (RFC 3394); the result is the KEM ciphertext followed by the wrapped key.
+
+    :param public_key: RSA or KEM public key object.
+    :param data_key: The raw data key (bytes).
+    :return: Wrapped data key (bytes).
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return public_key.encrypt(data_key, oaep_padding())
+    shared_secret, kem_ciphertext = public_key.encapsulate()
+    return kem_ciphertext + keywrap.aes_key_wrap(shared_secret, data_key)
+
+
+def unwrap_data_key(private_key, wrapped_key):
+    """
+    Recovers a symmetric data key with the recipient's private key.
+
+    :param private_key: RSA or KEM private key object.
+    :param wrapped_key: The wrapped data key (bytes).
+    :return: Raw data key (bytes).
+    """
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return private_key.decrypt(wrapped_key, oaep_padding())
+    ciphertext_size = private_key.ciphertext_size
+    shared_secret = private_key.decapsulate(wrapped_key[:ciphertext_size])
+    return keywrap.aes_key_unwrap(shared_secret, wrapped_key[ciphertext_size:])
+
+
+def encrypt_message(public_key, message, oaep=None):
+    """
+    Encrypts a short message for one key: with RSA-OAEP for RSA keys, or
+    as a hybrid container (see encrypt_bytes) for KEM keys, which cannot
+    encrypt data directly.
+
+    :param public_key: RSA or KEM public key object.
+    :param message: The message (bytes).
+    :param oaep: OAEP padding to reuse across calls (default: a new one).
+    :return: Encrypted message (bytes).
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return public_key.encrypt(message, oaep or oaep_padding())
+    return encrypt_bytes(message, public_key)
+
+
+def decrypt_message(private_key, encrypted_message, oaep=None):
+    """
+    Decrypts a message written by encrypt_message.
+
+    :param private_key: RSA or KEM private key object.
+    :param encrypted_message: The encrypted message (bytes).
+    :param oaep: OAEP padding to reuse across calls (default: a new one).
+    :return: Decrypted message (bytes).
+    """
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return private_key.decrypt(encrypted_message, oaep or oaep_padding())
+    return decrypt_bytes(encrypted_message, private_key)
+
+
+def is_hybrid_file(path):
+    """
+    Checks whether a file starts with the hybrid format magic bytes.
+
+    :param path: Path to the file to inspect.
+    :return: True if the file uses the hybrid format.
+    """
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _generation_prefix(nonce_prefix, generation):
+    # A chunk rewritten by an incremental update gets a fresh nonce: its
+    # generation is folded into the low half of the nonce prefix
+    if not generation:
+        return nonce_prefix
+    return nonce_prefix[:4] + struct.pack(">I", struct.unpack(">I", nonce_prefix[4:])[0] ^ generation)
+
+
+def chunk_nonce(nonce_prefix, index, generation=0):
+    """
+    Builds the AES-GCM nonce for a chunk.
+
+    :param nonce_prefix: The per-file nonce prefix (8 bytes).
+    :param index: Zero-based chunk index.
+    :param generation: Update generation the chunk was written in (default: 0).
+    :return: 12-byte nonce.
+    """
+    if index >= _MAX_CHUNKS:
+        raise ValueError("Input exceeds the maximum number of chunks per file.")
+    return _generation_prefix(nonce_prefix, generation) + struct.pack(">I", index)
+
+
+def chunk_nonce_at(nonce_prefix, chunks, index):
+    """
+    Builds the AES-GCM nonce for a chunk of an existing file, taking the
+    chunk's generation from the index.
+
+    :param nonce_prefix: The per-file nonce prefix (8 bytes).
+    :param chunks: ChunkIndex of the file.
+    :param index: Zero-based chunk index.
+    :return: 12-byte nonce.
+    """
+    return chunk_nonce(nonce_prefix, index, chunks.generations[index] if chunks.generations is not None else 0)
+
+
+def digest_cipher(data_key):
+    """
+    Returns the cipher of the per-chunk digests, under a key derived from
+    a file's data key.
+
+    :param data_key: The file's data key (bytes).
+    :return: AESGCM instance.
+    """
+    key = hashlib.blake2b(b"", key=data_key, person=b"pqc-digest-key", digest_size=DATA_KEY_SIZE).digest()
+    return AESGCM(key)
+
+
+def chunk_digest(cipher, chunk):
+    """
+    Computes the index digest of a plaintext chunk: its GMAC (an AES-GCM
+    tag over the chunk as associated data), which is much faster than a
+    hash. The digests are only stored inside the encrypted index, so the
+    GHASH key stays secret and collisions cannot be forced.
+
+    :param cipher: Cipher from digest_cipher.
+    :param chunk: Plaintext chunk (bytes-like).
+    :return: DIGEST_SIZE-byte digest.
+    """
+    return cipher.encrypt(_DIGEST_NONCE, b"", chunk)
+
+
+def chunk_aad(final):
+    """
+    Returns the associated data for a chunk.
+
+    :param final: Whether the chunk is the last one in the file.
+    :return: Associated data (bytes).
+    """
+    return b"\x01" if final else b"\x00"
+
+
+def algorithm_id(key):
+    """
+    Returns the header algorithm id for a public or private key.
+
+    :param key: RSA or ML-KEM key object.
+    :return: One of ALGORITHM_IDS' values.
+    """
+    if isinstance(key, (rsa.RSAPublicKey, rsa.RSAPrivateKey)):
+        return ALGORITHM_IDS["RSA-OAEP"]
+    return ALGORITHM_IDS[key.parameter_set]
+
+
+def public_key_list(public_keys):
+    """
+    Normalizes a public key argument: a single key or a sequence of keys.
+
+    :return: List of public key objects (at least one).
+    """
+    keys = list(public_keys) if isinstance(public_keys, (list, tuple)) else [public_keys]
+    if not keys:
+        raise ValueError("At least one recipient public key is required.")
+    if len(keys) > _MAX_RECIPIENTS:
+        raise ValueError(f"At most {_MAX_RECIPIENTS} recipients are supported.")
+    return keys
+
+
+def wrap_for_recipients(public_keys, data_key):
+    """
+    Wraps a data key for every recipient. This is the only per-recipient
+    cost of multi-recipient encryption: one RSA-OAEP encryption or ML-KEM
+    encapsulation each.
+
+    :param public_keys: A public key object or a sequence of them.
+    :param data_key: The raw data key (bytes).
+    :return: List of Recipient entries.
+    """
+    return [Recipient(algorithm_id(public_key), key_fingerprint(public_key),
+                      wrap_data_key(public_key, data_key))
+            for public_key in public_key_list(public_keys)]
+
+
+def header_size(recipients):
+    """
+    Returns the size of the hybrid header for the given recipients.
+
+    :param recipients: List of Recipient entries.
+    :return: Header size in bytes.
+    """
+    return (_HEADER_SIZE + sum(_RECIPIENT_SIZE + len(recipient.wrapped_key) for recipient in recipients)
+            + NONCE_PREFIX_SIZE)
+
+
+def pack_header(chunk_size, recipients, nonce_prefix):
+    """
+    Builds a hybrid file header.
+
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param recipients: List of Recipient entries (see wrap_for_recipients).
+    :param nonce_prefix: The per-file nonce prefix (bytes).
+    :return: Header (bytes).
+    """
+    header = bytearray(struct.pack(_HEADER_FORMAT, MAGIC, VERSION, chunk_size, len(recipients)))
+    for recipient in recipients:
+        header += struct.pack(_RECIPIENT_FORMAT, recipient.algorithm_id, recipient.fingerprint,
+                              len(recipient.wrapped_key))
+        header += recipient.wrapped_key
+    return bytes(header + nonce_prefix)
+
+
+def write_header(file, chunk_size, recipients, nonce_prefix):
+    """
+    Writes the hybrid file header.
+
+    :param file: Binary file object opened for writing.
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param recipients: List of Recipient entries (see wrap_for_recipients).
+    :param nonce_prefix: The per-file nonce prefix (bytes).
+    """
+    file.write(pack_header(chunk_size, recipients, nonce_prefix))
+
+
+def read_header(file):
+    """
+    Reads and validates the hybrid file header.
+
+    :param file: Binary file object opened for reading.
+    :return: HybridHeader.
+    """
+    fixed = file.read(_HEADER_SIZE)
+    if len(fixed) != _HEADER_SIZE:
+        raise ValueError("Truncated hybrid header.")
+    magic, version, chunk_size, count = struct.unpack(_HEADER_FORMAT, fixed)
+    if magic != MAGIC:
+        raise ValueError("Not a hybrid encrypted file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported hybrid format version: {version}")
+
+    size = _HEADER_SIZE + NONCE_PREFIX_SIZE
+    recipients = []
+    for _ in range(count):
+        entry = file.read(_RECIPIENT_SIZE)
+        if len(entry) != _RECIPIENT_SIZE:
+            raise ValueError("Truncated hybrid header.")
+        algorithm, fingerprint, wrapped_len = struct.unpack(_RECIPIENT_FORMAT, entry)
+        wrapped_key = file.read(wrapped_len)
+        if len(wrapped_key) != wrapped_len:
+            raise ValueError("Truncated hybrid header.")
+        recipients.append(Recipient(algorithm, fingerprint, wrapped_key))
+        size += _RECIPIENT_SIZE + wrapped_len
+    if not recipients:
+        raise ValueError("Hybrid header lists no recipients.")
+    if chunk_size == 0:
+        raise ValueError("Invalid chunk size in hybrid header.")
+    nonce_prefix = file.read(NONCE_PREFIX_SIZE)
+    if len(nonce_prefix) != NONCE_PREFIX_SIZE:
+        raise ValueError("Truncated hybrid header.")
+    return HybridHeader(version, chunk_size, recipients, nonce_prefix, size)
+
+
+def find_recipient(header, key):
+    """
+    Looks up the header entry for a key by its fingerprint.
+
+    :param header: HybridHeader of the file.
+    :param key: Public or private key object.
+    :return: The matching Recipient, or None.
+    """
+    fingerprint = key_fingerprint(key)
+    for recipient in header.recipients:
+        if recipient.fingerprint == fingerprint:
+            return recipient
+    return None
+
+
+def unwrap_header_key(header, private_key):
+    """
+    Recovers the data key of a file with one recipient's private key. The
+    recipient entry is found by key fingerprint, so a key the file was not
+    encrypted for fails clearly without trying every entry.
+
+    :param header: HybridHeader of the file.
+    :param private_key: RSA or ML-KEM private key object.
+    :return: Raw data key (bytes).
+    """
+    recipient = find_recipient(header, private_key)
+    if recipient is None:
+        raise ValueError("The file was not encrypted for this key.")
+    return unwrap_data_key(private_key, recipient.wrapped_key)
+
+
+def _index_aad(chunk_size):
+    return b"\x02" + struct.pack(">I", chunk_size)
+
+
+def fixed_frame_lengths(plaintext_size, chunk_size):
+    """
+    Returns the frame lengths of a payload split into fixed-size chunks
+    (at least one chunk, which may be empty).
+
+    :param plaintext_size: Total plaintext size in bytes.
+    :param chunk_size: Plaintext chunk size in bytes.
+    :return: array of frame lengths.
+    """
+    total = max(1, -(-plaintext_size // chunk_size))
+    if total > _MAX_CHUNKS:
+        raise ValueError("Input exceeds the maximum number of chunks per file.")
+    lengths = array("I", [chunk_size + TAG_SIZE]) * (total - 1)
+    lengths.append(plaintext_size - (total - 1) * chunk_size + TAG_SIZE)
+    return lengths
+
+
+def _big_endian(values):
+    values = array("I", values)
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def index_frame(aead, nonce_prefix, chunk_size, plaintext_size, frame_lengths, codecs=None,
+                generations=None, digests=None, generation=0):
+    """
+    Builds the encrypted chunk index and trailer that end a file.
+
+    :param aead: AESGCM instance for the file's data key.
+    :param nonce_prefix: The per-file nonce prefix (bytes).
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param plaintext_size: Total plaintext size in bytes.
+    :param frame_lengths: Length of every chunk frame, in order.
+    :param codecs: Codec id of every chunk, for compressed files (default: None).
+    :param generations: Generation of every chunk, for incrementally
+        updatable files (default: None); requires `digests`.
+    :param digests: Concatenated DIGEST_SIZE-byte digests of every chunk's plaintext.
+    :param generation: Update generation of the file; the index nonce
+        depends on it and it is recorded in the trailer.
+    :return: Index frame followed by the trailer (bytes).
+    """
+    flags = (_INDEX_CODECS if codecs is not None else 0) | (_INDEX_DIGESTS if digests is not None else 0)
+    body = struct.pack(_INDEX_FORMAT, plaintext_size, len(frame_lengths), flags) + _big_endian(frame_lengths)
+    if codecs is not None:
+        body += bytes(codecs)
+    if digests is not None:
+        body += _big_endian(generations) + bytes(digests)
+    nonce = _generation_prefix(nonce_prefix, generation) + _INDEX_NONCE_SUFFIX
+    frame = aead.encrypt(nonce, body, _index_aad(chunk_size))
+    return frame + struct.pack(_TRAILER_FORMAT, generation, len(frame), INDEX_MAGIC)
+
+
+def read_index(file, header, aead, file_size=None):
+    """
+    Reads the chunk layout of a hybrid file: the encrypted index at the
+    end of the file is authenticated and decoded. The file position is
+    left undefined.
+
+    :param file: Seekable binary file object.
+    :param header: HybridHeader of the file.
+    :param aead: AESGCM instance for the file's data key.
+    :param file_size: Size of the file (default: determined by seeking).
+    :return: ChunkIndex with the plaintext size, each frame's offset and
+        length, the chunk codec ids (None for uncompressed files), and the
+        chunk generations and digests plus the file generation (None and 0
+        unless the file can be updated incrementally).
+    """
+    if file_size is None:
+        file_size = file.seek(0, os.SEEK_END)
+    if file_size < header.size + _TRAILER_SIZE:
+        raise ValueError("Truncated hybrid ciphertext.")
+    file.seek(file_size - _TRAILER_SIZE)
+    generation, index_size, magic = struct.unpack(_TRAILER_FORMAT, _read_exact(file, _TRAILER_SIZE))
+    if magic != INDEX_MAGIC:
+        raise ValueError("Truncated hybrid ciphertext.")
+    index_start = file_size - _TRAILER_SIZE - index_size
+    if index_start < header.size:
+        raise ValueError("Truncated hybrid ciphertext.")
+    file.seek(index_start)
+    body = aead.decrypt(_generation_prefix(header.nonce_prefix, generation) + _INDEX_NONCE_SUFFIX,
+                        _read_exact(file, index_size), _index_aad(header.chunk_size))
+
+    if len(body) < struct.calcsize(_INDEX_FORMAT):
+        raise ValueError("Corrupted hybrid chunk index.")
+    plaintext_size, total, flags = struct.unpack_from(_INDEX_FORMAT, body)
+    position = struct.calcsize(_INDEX_FORMAT)
+    if flags & ~(_INDEX_CODECS | _INDEX_DIGESTS):
+        raise ValueError(f"Unsupported hybrid index flags: {flags:#x}.")
+    lengths, position = _read_index_array(body, position, total)
+    codecs = generations = digests = None
+    if flags & _INDEX_CODECS:
+        codecs, position = body[position:position + total], position + total
+    if flags & _INDEX_DIGESTS:
+        generations, position = _read_index_array(body, position, total)
+        digests, position = body[position:position + DIGEST_SIZE * total], position + DIGEST_SIZE * total
+    if position != len(body) or header.size + sum(lengths) != index_start:
+        raise ValueError("Corrupted hybrid chunk index.")
+    return ChunkIndex(plaintext_size, _frame_offsets(header, lengths), lengths, codecs, generations,
+                      digests, generation)
+
+
+def _read_index_array(body, position, total):
+    end = position + 4 * total
+    if end > len(body):
+        raise ValueError("Corrupted hybrid chunk index.")
+    values = array("I", body[position:end])
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values, end
+
+
+def _frame_offsets(header, lengths):
+    offsets = array("Q", accumulate(lengths, initial=header.size))
+    offsets.pop()
+    return offsets
+
+
+def chunk_plaintext_size(chunks, chunk_size, index):
+    """
+    Returns the plaintext size of one chunk: the chunk size for all but
+    the last chunk, which holds the remainder.
+
+    :param chunks: ChunkIndex of the file.
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param index: Zero-based chunk index.
+    :return: Size in bytes.
+    """
+    return min(chunk_size, chunks.plaintext_size - index * chunk_size)
+
+
+def _check_cancelled(cancelled):
+    # Stops a long-running operation between chunks once `cancelled` is set
+    if cancelled is not None and cancelled.is_set():
+        raise CancelledError()
+
+
+def _read_exact(file, size):
+    """
+    Reads up to `size` bytes, retrying short reads until EOF.
+    """
+    data = file.read(size)
+    if len(data) == size or not data:
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        more = file.read(remaining)
+        if not more:
+            break
+        parts.append(more)
+        remaining -= len(more)
+    return b"".join(parts)
+
+
+def encrypt_stream(in_file, out_file, public_key, chunk_size=DEFAULT_CHUNK_SIZE,
+                   data_key=None, nonce_prefix=None, compression=None):
+    """
+    Encrypts a binary stream with a fresh data key in hybrid mode.
+    Only two chunks are held in memory at any time: the one being
+    encrypted and a one-chunk lookahead used to detect the final chunk.
+
+    :param in_file: Binary file object to read plaintext from.
+    :param out_file: Binary file object to write the encrypted output to.
+    :param public_key: RSA or ML-KEM public key object used to wrap the data key,
+        or a sequence of them to encrypt for several recipients.
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param data_key: Data key to use (default: a fresh random key).
+    :param nonce_prefix: Nonce prefix to use (default: a fresh random prefix).
+    :param compression: Codec name (e.g. "zlib") to compress the chunks with,
+        or None (default) to store them as is.
+    """
+    if data_key is None:
+        data_key = AESGCM.generate_key(bit_length=DATA_KEY_SIZE * 8)
+    if nonce_prefix is None:
+        nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+    aead = AESGCM(data_key)
+
+    write_header(out_file, chunk_size, wrap_for_recipients(public_key, data_key), nonce_prefix)
+
+    compressor = ChunkCompressor(compression) if compression else None
+    codecs = bytearray() if compressor else None
+    index = 0
+    plaintext_size = 0
+    frame_lengths = array("I")
+    current = _read_exact(in_file, chunk_size)
+    while True:
+        following = _read_exact(in_file, chunk_size) if len(current) == chunk_size else b""
+        final = not following
+        data = current
+        if compressor:
+            codec, data = compressor.compress(current)
+            codecs.append(codec)
+        frame = aead.encrypt(chunk_nonce(nonce_prefix, index), data, chunk_aad(final))
+        out_file.write(frame)
+        frame_lengths.append(len(frame))
+        plaintext_size += len(current)
+        if final:
+            break
+        current = following
+        index += 1
+
+    out_file.write(index_frame(aead, nonce_prefix, chunk_size, plaintext_size, frame_lengths, codecs))
+
+
+def decrypt_stream(in_file, out_file, private_key):
+    """
+    Decrypts a hybrid-encrypted binary stream. Each chunk is authenticated
+    before it is written, and a missing final chunk is reported as an error.
+    The stream must be seekable, as the chunk index is read first.
+
+    :param in_file: Binary file object to read the encrypted data from.
+    :param out_file: Binary file object to write plaintext to.
+    :param private_key: RSA or ML-KEM private key object used to unwrap the data key.
+    """
+    header = read_header(in_file)
+    aead = AESGCM(unwrap_header_key(header, private_key))
+
+    data_start = in_file.tell()
+    chunks = read_index(in_file, header, aead)
+    in_file.seek(data_start)
+    total = len(chunks.lengths)
+    for index, frame_length in enumerate(chunks.lengths):
+        frame = _read_exact(in_file, frame_length)
+        if len(frame) != frame_length:
+            raise ValueError("Truncated hybrid ciphertext.")
+        chunk = aead.decrypt(chunk_nonce_at(header.nonce_prefix, chunks, index), frame,
+                             chunk_aad(index == total - 1))
+        if chunks.codecs is not None:
+            chunk = decompress_chunk(chunks.codecs[index], chunk,
+                                     chunk_plaintext_size(chunks, header.chunk_size, index))
+        out_file.write(chunk)
+
+
+def encrypt_bytes(data, public_key, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """
+    Encrypts an in-memory buffer into the hybrid format.
+
+    :param data: Plaintext (bytes-like).
+    :param public_key: RSA or ML-KEM public key object, or a sequence of them.
+    :param chunk_size: Plaintext bytes per chunk.
+    :param compression: Codec name to compress the chunks with (default: None).
+    :return: Hybrid-format ciphertext (bytes).
+    """
+    out = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), out, public_key, chunk_size, compression=compression)
+    return out.getvalue()
+
+
+def decrypt_bytes(data, private_key):
+    """
+    Decrypts an in-memory hybrid-format buffer.
+
+    :param data: Hybrid-format ciphertext (bytes-like).
+    :param private_key: RSA or ML-KEM private key object.
+    :return: Plaintext (bytes).
+    """
+    out = io.BytesIO()
+    decrypt_stream(io.BytesIO(data), out, private_key)
+    return out.getvalue()
+
+
+def encrypt_file(input_file, output_file, public_key, chunk_size=DEFAULT_CHUNK_SIZE,
+                 data_key=None, nonce_prefix=None, compression=None, incremental=False, cancelled=None):
+    """
+    Encrypts a file in hybrid mode without intermediate copies. The input
+    is memory-mapped and each chunk is passed to the cipher as a memoryview
+    slice; ciphertext frames are written from one preallocated buffer that
+    is reused for every chunk. The output is identical to encrypt_stream's.
+
+    :param input_file: Path to the input file to be encrypted.
+    :param output_file: Path where the encrypted data will be saved.
+    :param public_key: RSA or ML-KEM public key object used to wrap the data key,
+        or a sequence of them to encrypt for several recipients.
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param data_key: Data key to use (default: a fresh random key).
+    :param nonce_prefix: Nonce prefix to use (default: a fresh random prefix).
+    :param compression: Codec name (e.g. "zlib") to compress the chunks with,
+        or None (default) to store them as is.
+    :param incremental: Record a digest of every chunk in the index so the
+        file can later be updated in place (see incremental.update_file).
+    :param cancelled: Optional threading.Event; once it is set, the operation
+        stops before the next chunk with concurrent.futures.CancelledError.
+    """
+    if compression and incremental:
+        raise ValueError("Compressed files cannot be updated incrementally.")
+    if data_key is None:
+        data_key = AESGCM.generate_key(bit_length=DATA_KEY_SIZE * 8)
+    if nonce_prefix is None:
+        nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+    aead = AESGCM(data_key)
+
+    with MappedInput(input_file) as source, open(output_file, "wb") as out_file:
+        write_header(out_file, chunk_size, wrap_for_recipients(public_key, data_key), nonce_prefix)
+        frame_lengths = fixed_frame_lengths(source.size, chunk_size)
+        total = len(frame_lengths)
+        compressor = ChunkCompressor(compression) if compression else None
+        codecs = bytearray() if compressor else None
+        digester = digest_cipher(data_key) if incremental else None
+        digests = bytearray() if incremental else None
+        buffer = memoryview(bytearray(chunk_size + TAG_SIZE))
+        for index in range(total):
+            _check_cancelled(cancelled)
+            start = index * chunk_size
+            nonce = chunk_nonce(nonce_prefix, index)
+            aad = chunk_aad(index == total - 1)
+            with source.view[start:start + chunk_size] as chunk:
+                data = chunk
+                if incremental:
+                    digests += chunk_digest(digester, chunk)
+                if compressor:
+                    codec, data = compressor.compress(chunk)
+                    codecs.append(codec)
+                    frame_lengths[index] = len(data) + TAG_SIZE
+                if _HAS_INTO:
+                    frame = buffer[:len(data) + TAG_SIZE]
+                    aead.encrypt_into(nonce, data, aad, frame)
+                    out_file.write(frame)
+                else:
+                    out_file.write(aead.encrypt(nonce, bytes(data), aad))
+                del data
+            source.release_consumed(start + chunk_size)
+        buffer.release()
+        out_file.write(index_frame(aead, nonce_prefix, chunk_size, source.size, frame_lengths, codecs,
+                                   [0] * total if incremental else None, digests))
+
+
+def decrypt_file(input_file, output_file, private_key, cancelled=None):
+    """
+    Decrypts a hybrid-encrypted file without intermediate copies. The
+    input is memory-mapped, frames are passed to the cipher as memoryview
+    slices, and each chunk is authenticated into a reused buffer before it
+    is written.
+
+    :param input_file: Path to the encrypted input file.
+    :param output_file: Path where the decrypted data will be saved.
+    :param private_key: RSA or ML-KEM private key object used to unwrap the data key.
+    :param cancelled: Optional threading.Event; once it is set, the operation
+        stops before the next chunk with concurrent.futures.CancelledError.
+    """
+    with open(input_file, "rb") as in_file:
+        header = read_header(in_file)
+        aead = AESGCM(unwrap_header_key(header, private_key))
+        chunks = read_index(in_file, header, aead)
+
+    with MappedInput(input_file) as source, open(output_file, "wb") as out_file:
+        total = len(chunks.lengths)
+        buffer = memoryview(bytearray(max(chunks.lengths) - TAG_SIZE))
+        for index in range(total):
+            _check_cancelled(cancelled)
+            start, frame_length = chunks.offsets[index], chunks.lengths[index]
+            nonce = chunk_nonce_at(header.nonce_prefix, chunks, index)
+            aad = chunk_aad(index == total - 1)
+            with source.view[start:start + frame_length] as frame:
+                if _HAS_INTO:
+                    chunk = buffer[:frame_length - TAG_SIZE]
+                    aead.decrypt_into(nonce, frame, aad, chunk)
+                else:
+                    chunk = aead.decrypt(nonce, bytes(frame), aad)
+                if chunks.codecs is not None:
+                    chunk = decompress_chunk(chunks.codecs[index], chunk,
+                                             chunk_plaintext_size(chunks, header.chunk_size, index))
+                out_file.write(chunk)
+                del chunk
+            source.release_consumed(start + frame_length)
+        buffer.release()
+
+
+def decrypt_file_range(input_file, offset, length, private_key):
+    """
+    Decrypts `length` plaintext bytes starting at `offset` from a hybrid
+    file. Only the chunks covering the range are read and authenticated,
+    so the cost does not depend on where in the file the range lies.
+
+    :param input_file: Path to the encrypted input file.
+    :param offset: Plaintext offset of the first byte to return.
+    :param length: Number of bytes to return (fewer near the end of the data).
+    :param private_key: RSA or ML-KEM private key object used to unwrap the data key.
+    :return: Decrypted bytes.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must not be negative.")
+    with open(input_file, "rb") as in_file:
+        header = read_header(in_file)
+        aead = AESGCM(unwrap_header_key(header, private_key))
+        chunks = read_index(in_file, header, aead)
+        end = min(offset + length, chunks.plaintext_size)
+        if offset >= end:
+            return b""
+
+        total = len(chunks.lengths)
+        first, last = offset // header.chunk_size, (end - 1) // header.chunk_size
+        parts = []
+        for index in range(first, last + 1):
+            in_file.seek(chunks.offsets[index])
+            frame = _read_exact(in_file, chunks.lengths[index])
+            chunk = aead.decrypt(chunk_nonce_at(header.nonce_prefix, chunks, index), frame,
+                                 chunk_aad(index == total - 1))
+            if chunks.codecs is not None:
+                chunk = decompress_chunk(chunks.codecs[index], chunk,
+                                         chunk_plaintext_size(chunks, header.chunk_size, index))
+            parts.append(chunk)
+    data = b"".join(parts)
+    start = offset - first * header.chunk_size
+    return data[start:start + end - offset]
+
+
+def _encrypt_chunk_range(input_file, output_file, data_key, nonce_prefix, chunk_size,
+                         data_offset, first, last, total):
+    """
+    Worker task: encrypts chunks [first, last) and writes each frame at
+    its computed offset in the output file.
+    """
+    aead = AESGCM(data_key)
+    frame_size = chunk_size + TAG_SIZE
+    with open(input_file, "rb") as in_file, open(output_file, "r+b") as out_file:
+        in_file.seek(first * chunk_size)
+        out_file.seek(data_offset + first * frame_size)
+        for index in range(first, last):
+            chunk = _read_exact(in_file, chunk_size)
+            final = index == total - 1
+            out_file.write(aead.encrypt(chunk_nonce(nonce_prefix, index), chunk, chunk_aad(final)))
+
+
+def _compress_chunk_range(input_file, data_key, nonce_prefix, chunk_size, compression, enabled,
+                          first, last, total):
+    """
+    Worker task: compresses and encrypts chunks [first, last). Compressed
+    frames have no precomputed offset, so the frames are returned together
+    with their codec ids for the parent to write in order.
+    """
+    aead = AESGCM(data_key)
+    compressor = ChunkCompressor(compression, sample_chunks=0, enabled=enabled)
+    frames, codecs = [], bytearray()
+    with open(input_file, "rb") as in_file:
+        in_file.seek(first * chunk_size)
+        for index in range(first, last):
+            codec, data = compressor.compress(_read_exact(in_file, chunk_size))
+            final = index == total - 1
+            frames.append(aead.encrypt(chunk_nonce(nonce_prefix, index), data, chunk_aad(final)))
+            codecs.append(codec)
+    return frames, codecs
+
+
+def _decrypt_chunk_range(input_file, output_file, data_key, nonce_prefix, chunk_size,
+                         frames, first, total, codecs=None, plaintext_size=0, generations=None):
+    """
+    Worker task: decrypts the frames starting at chunk `first`, given as
+    (offset, length) pairs, and writes each chunk at its computed offset
+    in the output file. `codecs` holds the codec ids of these chunks for
+    compressed files and `generations` their generations for incrementally
+    updated files.
+    """
+    aead = AESGCM(data_key)
+    with open(input_file, "rb") as in_file, open(output_file, "r+b") as out_file:
+        out_file.seek(first * chunk_size)
+        for index, (offset, frame_length) in enumerate(frames, first):
+            in_file.seek(offset)
+            frame = _read_exact(in_file, frame_length)
+            final = index == total - 1
+            generation = generations[index - first] if generations is not None else 0
+            chunk = aead.decrypt(chunk_nonce(nonce_prefix, index, generation), frame, chunk_aad(final))
+            if codecs is not None:
+                chunk = decompress_chunk(codecs[index - first], chunk,
+                                         min(chunk_size, plaintext_size - index * chunk_size))
+            out_file.write(chunk)
+
+
+def _run_chunk_tasks(task, workers, total, task_args, on_result=None, cancelled=None):
+    """
+    Runs `task` over all chunk ranges in a process pool, keeping a bounded
+    number of ranges in flight, and re-raises the first worker error.
+    `task_args(first, last)` returns the task arguments for a range, and
+    `on_result`, if given, receives each task's result in range order.
+    Once `cancelled` is set, no further range is started.
+    """
+    ranges = [(first, min(first + CHUNKS_PER_TASK, total))
+              for first in range(0, total, CHUNKS_PER_TASK)]
+    max_pending = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        try:
+            for first, last in ranges:
+                _check_cancelled(cancelled)
+                pending.append(pool.submit(task, *task_args(first, last)))
+                if len(pending) >= max_pending:
+                    result = pending.pop(0).result()
+                    if on_result:
+                        on_result(result)
+            while pending:
+                _check_cancelled(cancelled)
+                result = pending.pop(0).result()
+                if on_result:
+                    on_result(result)
+        except CancelledError:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+
+def encrypt_file_parallel(input_file, output_file, public_key, chunk_size=DEFAULT_CHUNK_SIZE,
+                          workers=None, data_key=None, nonce_prefix=None, compression=None, cancelled=None):
+    """
+    Encrypts a file in hybrid mode using a pool of worker processes.
+    Every chunk is independently authenticated and lands at an offset
+    computed from its index, so the chunk frames are byte-identical to
+    the streaming encryptor's output for the same data key and nonce
+    prefix, whatever the number of workers. With compression, the workers
+    return their frames and the parent writes them in order; whether to
+    compress at all is decided once on a sample of the leading chunks.
+
+    :param input_file: Path to the input file to be encrypted.
+    :param output_file: Path where the encrypted data will be saved.
+    :param public_key: RSA or ML-KEM public key object used to wrap the data key,
+        or a sequence of them to encrypt for several recipients.
+    :param chunk_size: Plaintext chunk size in bytes.
+    :param workers: Number of worker processes (default: CPU count).
+    :param data_key: Data key to use (default: a fresh random key).
+    :param nonce_prefix: Nonce prefix to use (default: a fresh random prefix).
+    :param compression: Codec name (e.g. "zlib") to compress the chunks with,
+        or None (default) to store them as is.
+    :param cancelled: Optional threading.Event; once it is set, no further
+        chunk range is started and concurrent.futures.CancelledError is raised.
+    """
+    if data_key is None:
+        data_key = AESGCM.generate_key(bit_length=DATA_KEY_SIZE * 8)
+    if nonce_prefix is None:
+        nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+    recipients = wrap_for_recipients(public_key, data_key)
+
+    size = os.path.getsize(input_file)
+    frame_lengths = fixed_frame_lengths(size, chunk_size)
+    total = len(frame_lengths)
+    if compression:
+        _encrypt_compressed_parallel(input_file, output_file, recipients, data_key, nonce_prefix,
+                                     chunk_size, workers, compression, size, frame_lengths, cancelled)
+        return
+    data_offset = header_size(recipients)
+    data_end = data_offset + size + total * TAG_SIZE
+
+    # Lay out the full output file up front so workers can write in place
+    with open(output_file, "wb") as out_file:
+        write_header(out_file, chunk_size, recipients, nonce_prefix)
+        out_file.seek(data_end)
+        out_file.write(index_frame(AESGCM(data_key), nonce_prefix, chunk_size, size, frame_lengths))
+
+    _run_chunk_tasks(_encrypt_chunk_range, workers or os.cpu_count() or 1, total,
+                     lambda first, last: (input_file, output_file, data_key, nonce_prefix,
+                                          chunk_size, data_offset, first, last, total),
+                     cancelled=cancelled)
+
+
+def _encrypt_compressed_parallel(input_file, output_file, recipients, data_key, nonce_prefix, chunk_size,
+                                 workers, compression, size, frame_lengths, cancelled=None):
+    total = len(frame_lengths)
+    with open(input_file, "rb") as in_file:
+        sample = [_read_exact(in_file, chunk_size) for _ in range(min(SAMPLE_CHUNKS, total))]
+    enabled = sample_compressible(sample, compression)
+    codecs = bytearray()
+
+    with open(output_file, "wb") as out_file:
+        write_header(out_file, chunk_size, recipients, nonce_prefix)
+
+        def write_frames(result):
+            for frame, codec in zip(*result):
+                frame_lengths[len(codecs)] = len(frame)
+                codecs.append(codec)
+                out_file.write(frame)
+
+        _run_chunk_tasks(_compress_chunk_range, workers or os.cpu_count() or 1, total,
+                         lambda first, last: (input_file, data_key, nonce_prefix, chunk_size, compression,
+                                              enabled, first, last, total),
+                         write_frames, cancelled)
+        out_file.write(index_frame(AESGCM(data_key), nonce_prefix, chunk_size, size, frame_lengths, codecs))
+
+
+def decrypt_file_parallel(input_file, output_file, private_key, workers=None, cancelled=None):
+    """
+    Decrypts a hybrid-encrypted file using a pool of worker processes.
+
+    :param input_file: Path to the encrypted input file.
+    :param output_file: Path where the decrypted data will be saved.
+    :param private_key: RSA or ML-KEM private key object used to unwrap the data key.
+    :param workers: Number of worker processes (default: CPU count).
+    :param cancelled: Optional threading.Event; once it is set, no further
+        chunk range is started and concurrent.futures.CancelledError is raised.
+    """
+    with open(input_file, "rb") as in_file:
+        header = read_header(in_file)
+        data_key = unwrap_header_key(header, private_key)
+        chunks = read_index(in_file, header, AESGCM(data_key))
+
+    with open(output_file, "wb") as out_file:
+        out_file.truncate(chunks.plaintext_size)
+
+    total = len(chunks.lengths)
+    _run_chunk_tasks(_decrypt_chunk_range, workers or os.cpu_count() or 1, total,
+                     lambda first, last: (input_file, output_file, data_key, header.nonce_prefix,
+                                          header.chunk_size,
+                                          list(zip(chunks.offsets[first:last], chunks.lengths[first:last])),
+                                          first, total,
+                                          chunks.codecs[first:last] if chunks.codecs is not None else None,
+                                          chunks.plaintext_size,
+                                          chunks.generations[first:last] if chunks.generations is not None
+                                          else None),
+                     cancelled=cancelled)
@@ -0,0 +1,158 @@
+"""
+Incremental Module - In-Place Updates of Encrypted Files
+This module brings a hybrid-encrypted file up to date with a new version
+of its plaintext by re-encrypting only the chunks that changed. Files
+encrypted with `incremental=True` keep a keyed digest (GMAC) and a generation
+per chunk in their (encrypted) index. An update hashes the new plaintext
+chunk by chunk, compares the digests with the index, and rewrites only
+the frames of changed, added or re-finalized chunks together with a new
+index; frames of unchanged chunks are not touched. Each update bumps the
+file generation and encrypts its chunks under nonces derived from it, so
+a rewritten chunk never reuses the nonce of the data it replaces.
+
+The new plaintext is still read and hashed in full, but the encryption
+and the writes are proportional to the amount of changed data.
+
+Updates are crash-safe: before the file is modified, the frames about to
+be overwritten and the old index are saved to an undo journal next to it
+(JOURNAL_SUFFIX). An interrupted update leaves the journal behind, and
+the next update of the file (or recover_file) rolls the file back to its
+previous state first. Updating needs the private key, since the data key
+has to be unwrapped; compressed files cannot be updated.
+"""
+
+import os
+from array import array
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from .constants import UPDATE_JOURNAL_SUFFIX as JOURNAL_SUFFIX
+from .fileio import MappedInput, fsync_directory, read_journal, write_journal
+from .hybrid import (DIGEST_SIZE, TAG_SIZE, chunk_aad, chunk_digest, chunk_nonce, digest_cipher,
+                     fixed_frame_lengths, index_frame, read_header, read_index, unwrap_header_key)
+
+_MAX_GENERATION = 2 ** 32 - 2
+
+
+def recover_file(path, private_key):
+    """
+    Rolls back an interrupted update of an encrypted file, if any.
+
+    The restored file gets a new index under a generation past the one
+    of the interrupted update, so that the nonces that update may have
+    used are never used again.
+
+    :param path: Path to the encrypted file.
+    :param private_key: Private key the file was encrypted for.
+    :return: True if an interrupted update was rolled back.
+    """
+    journal_path = path + JOURNAL_SUFFIX
+    if not os.path.exists(journal_path):
+        return False
+    journal = read_journal(journal_path)
+    if journal is None:
+        os.remove(journal_path)
+        return False
+
+    generation, file_size, entries = journal
+    with open(path, "r+b") as file:
+        file.truncate(file_size)
+        for offset, data in entries:
+            file.seek(offset)
+            file.write(data)
+        file.seek(0)
+        header = read_header(file)
+        aead = AESGCM(unwrap_header_key(header, private_key))
+        chunks = read_index(file, header, aead, file_size)
+        file.seek(header.size + sum(chunks.lengths))
+        file.write(index_frame(aead, header.nonce_prefix, header.chunk_size, chunks.plaintext_size,
+                               chunks.lengths, None, chunks.generations, chunks.digests, generation + 1))
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+    os.remove(journal_path)
+    fsync_directory(journal_path)
+    return True
+
+
+def update_file(input_file, output_file, private_key):
+    """
+    Updates an encrypted file in place to the content of `input_file`,
+    re-encrypting only the chunks that changed.
+
+    :param input_file: Path to the new plaintext.
+    :param output_file: Path to the file encrypted with `incremental=True`.
+    :param private_key: Private key the file was encrypted for.
+    :return: Dictionary with the chunk count, the number of rewritten
+        chunks and the number of bytes written to the encrypted file.
+    """
+    recover_file(output_file, private_key)
+    journal_path = output_file + JOURNAL_SUFFIX
+
+    with open(output_file, "r+b") as file, MappedInput(input_file) as source:
+        header = read_header(file)
+        data_key = unwrap_header_key(header, private_key)
+        aead = AESGCM(data_key)
+        file_size = os.fstat(file.fileno()).st_size
+        chunks = read_index(file, header, aead, file_size)
+        if chunks.digests is None or chunks.codecs is not None:
+            raise ValueError("The file was not encrypted for incremental updates.")
+        generation = chunks.generation + 1
+        if generation > _MAX_GENERATION:
+            raise ValueError("The file has reached the maximum number of updates.")
+
+        # Pass 1: find the chunks whose plaintext or finality changed
+        chunk_size = header.chunk_size
+        digester = digest_cipher(data_key)
+        old_total = len(chunks.lengths)
+        frame_lengths = fixed_frame_lengths(source.size, chunk_size)
+        total = len(frame_lengths)
+        digests = bytearray()
+        changed = []
+        for index in range(total):
+            start = index * chunk_size
+            with source.view[start:start + chunk_size] as chunk:
+                digest = chunk_digest(digester, chunk)
+            digests += digest
+            if (index >= old_total or (index == total - 1) != (index == old_total - 1)
+                    or digest != chunks.digests[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE]):
+                changed.append(index)
+            source.release_consumed(start + chunk_size)
+
+        if not changed:
+            return {"chunks": total, "changed": 0, "bytes_written": 0}
+
+        # Save what is about to be overwritten: the changed frames, and everything from
+        # the new index on (the old index, and the frames dropped when the file shrinks)
+        tail_start = min(header.size + sum(chunks.lengths), header.size + sum(frame_lengths))
+        entries = []
+        for index in changed:
+            if index < old_total and chunks.offsets[index] < tail_start:
+                file.seek(chunks.offsets[index])
+                entries.append((chunks.offsets[index], file.read(chunks.lengths[index])))
+        file.seek(tail_start)
+        entries.append((tail_start, file.read()))
+        write_journal(journal_path, generation, file_size, entries)
+
+        # Pass 2: rewrite the changed frames and the index
+        generations = array("I", chunks.generations[:total])
+        generations.extend([0] * (total - len(generations)))
+        written = 0
+        for index in changed:
+            generations[index] = generation
+            start = index * chunk_size
+            with source.view[start:start + chunk_size] as chunk:
+                frame = aead.encrypt(chunk_nonce(header.nonce_prefix, index, generation), bytes(chunk),
+                                     chunk_aad(index == total - 1))
+            file.seek(header.size + index * (chunk_size + TAG_SIZE))
+            file.write(frame)
+            written += len(frame)
+        trailer = index_frame(aead, header.nonce_prefix, chunk_size, source.size, frame_lengths, None,
+                              generations, digests, generation)
+        file.seek(header.size + sum(frame_lengths))
+        file.write(trailer)
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.remove(journal_path)
+    fsync_directory(journal_path)
+    return {"chunks": total, "changed": len(changed), "bytes_written": written + len(trailer)}
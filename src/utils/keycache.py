@@ -0,0 +1,254 @@
+"""
+Key Cache Module - Parsed Key Caching
+This module keeps a process-wide cache of parsed key objects keyed by
+file path, so repeated operations with the same key skip reading the
+key file and re-running the key parser and its consistency checks.
+Key files may be PEM, DER or raw (see keyformat); the format is detected
+from the content.
+Entries are evicted in least-recently-used order and invalidated when
+the file's modification time, inode or size changes. Only cache misses
+(actual parses) are reported to the metrics hooks as "key_load".
+
+Instead of a file path, every loader also accepts a keystore reference
+("keystore:<database path>#<key id>", see keystore.key_reference). Such
+keys are cached under the full key ID the reference resolves to, and
+invalidated when the database files change, so a key deleted from the
+store or an ID prefix that now matches another key is never served stale.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+from . import metrics
+
+DEFAULT_MAX_ENTRIES = 128
+
+
+# The ML-KEM engine (and NumPy) is only imported once an ML-KEM key is seen
+_MLKEM_PEM_PREFIX = b"-----BEGIN ML-KEM-"
+_XKEM_PEM_PREFIX = b"-----BEGIN X25519-ML-KEM-"
+# Binary keys: the raw container (see keyformat) or, for RSA, plain DER
+_RAW_MAGIC = b"PQCK"
+# Key paths starting with this prefix are resolved by the keystore module
+KEYSTORE_PREFIX = "keystore:"
+
+
+def _parse_private_key(data):
+    if data[:4] == _RAW_MAGIC:
+        from . import keyformat
+        return keyformat.load_raw_private_key(data)
+    if not data.lstrip().startswith(b"-----"):
+        return serialization.load_der_private_key(data, password=None, backend=default_backend())
+    if data.lstrip().startswith(_MLKEM_PEM_PREFIX):
+        from . import mlkem
+        return mlkem.load_pem_private_key(data)
+    if data.lstrip().startswith(_XKEM_PEM_PREFIX):
+        from . import xkem
+        return xkem.load_pem_private_key(data)
+    return serialization.load_pem_private_key(data, password=None, backend=default_backend())
+
+
+def _parse_public_key(data):
+    if data[:4] == _RAW_MAGIC:
+        from . import keyformat
+        return keyformat.load_raw_public_key(data)
+    if not data.lstrip().startswith(b"-----"):
+        return serialization.load_der_public_key(data, backend=default_backend())
+    if data.lstrip().startswith(_MLKEM_PEM_PREFIX):
+        from . import mlkem
+        return mlkem.load_pem_public_key(data)
+    if data.lstrip().startswith(_XKEM_PEM_PREFIX):
+        from . import xkem
+        return xkem.load_pem_public_key(data)
+    return serialization.load_pem_public_key(data, backend=default_backend())
+
+
+def key_algorithm(key):
+    """
+    Returns the algorithm label of a parsed key, e.g. "RSA-2048", "ML-KEM-768"
+    or "X25519-ML-KEM-768".
+
+    :param key: Parsed public or private key object.
+    :return: Algorithm label (string).
+    """
+    if isinstance(key, (rsa.RSAPublicKey, rsa.RSAPrivateKey)):
+        return f"RSA-{key.key_size}"
+    return getattr(key, "parameter_set", type(key).__name__)
+
+
+def key_fingerprint(key):
+    """
+    Returns the SHA-256 fingerprint of a key pair's public half: the hash of
+    the DER SubjectPublicKeyInfo for RSA keys, or of the raw public key
+    bytes for KEM keys. Public and private keys of one pair share a fingerprint.
+
+    :param key: Parsed public or private key object.
+    :return: 32-byte fingerprint (bytes).
+    """
+    if hasattr(key, "public_key"):
+        key = key.public_key()
+    if isinstance(key, rsa.RSAPublicKey):
+        data = key.public_bytes(serialization.Encoding.DER,
+                                serialization.PublicFormat.SubjectPublicKeyInfo)
+    else:
+        data = key.public_bytes()
+    return hashlib.sha256(data).digest()
+
+
+def _cache_entry(path, kind):
+    # Returns the cache key of a key file or reference and the signature that invalidates it
+    if path.startswith(KEYSTORE_PREFIX):
+        from . import keystore
+        return keystore.reference_cache_entry(path, kind)
+    stat = os.stat(path)
+    return (kind, os.path.abspath(path)), (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+def _read_key_data(path, kind):
+    if path.startswith(KEYSTORE_PREFIX):
+        from . import keystore
+        return keystore.read_key_reference(path, kind)
+    with open(path, "rb") as key_file:
+        return key_file.read()
+
+
+class KeyCache:
+    """
+    A thread-safe LRU cache of parsed key objects.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        :param max_entries: Maximum number of parsed keys kept in memory.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, path, kind, parser):
+        """
+        Returns the parsed key stored at `path`, parsing it on a miss.
+
+        :param path: Path to the key file, or a keystore reference.
+        :param kind: Cache namespace, e.g. "private" or "public".
+        :param parser: Callable that turns the file content into a key object.
+        :return: Parsed key object.
+        """
+        cache_key, signature = _cache_entry(path, kind)
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[cache_key]
+                self.invalidations += 1
+            self.misses += 1
+
+        # Parse outside the lock so slow parses do not serialize other lookups
+        with metrics.track("key_load") as operation:
+            # Read what the cache key names: a reference's resolved key, not its prefix
+            data = _read_key_data(cache_key[1], kind)
+            key = parser(data)
+            operation.algorithm = key_algorithm(key)
+            operation.bytes = len(data)
+
+        with self._lock:
+            self._entries[cache_key] = (signature, key)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return key
+
+    def clear(self):
+        """
+        Drops all cached keys and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.invalidations = self.evictions = 0
+
+    def stats(self):
+        """
+        Returns cache statistics.
+
+        :return: Dictionary with hits, misses, invalidations, evictions and size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_default_cache = KeyCache()
+
+
+def get_key_cache():
+    """
+    Returns the process-wide key cache.
+    """
+    return _default_cache
+
+
+def load_private_key(path):
+    """
+    Loads a private key (PEM, DER or raw format) through the process-wide cache.
+
+    :param path: Path to the file containing the private key, or a keystore reference.
+    :return: Private key object.
+    """
+    return _default_cache.get(path, "private", _parse_private_key)
+
+
+def load_public_key(path):
+    """
+    Loads a public key (PEM, DER or raw format) through the process-wide cache.
+
+    :param path: Path to the file containing the public key, or a keystore reference.
+    :return: Public key object.
+    """
+    return _default_cache.get(path, "public", _parse_public_key)
+
+
+def load_public_keys(paths):
+    """
+    Loads one or several public keys through the process-wide cache.
+
+    :param paths: Path to a public key file, or a sequence of paths.
+    :return: List of public key objects, in order.
+    """
+    if isinstance(paths, (list, tuple)):
+        return [load_public_key(path) for path in paths]
+    return [load_public_key(paths)]
+
+
+def cache_stats():
+    """
+    Returns hit/miss statistics for the process-wide key cache.
+    """
+    return _default_cache.stats()
+
+
+def clear_cache():
+    """
+    Empties the process-wide key cache.
+    """
+    _default_cache.clear()
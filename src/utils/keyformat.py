@@ -0,0 +1,175 @@
+"""
+Key Format Module - Binary Key Serialization
+This module writes and reads keys in three formats:
+
+- "pem": the text armor used so far (PKCS#8 / SubjectPublicKeyInfo for RSA,
+  PEM-style armor for ML-KEM and X25519 + ML-KEM).
+- "der": the binary PKCS#8 / SubjectPublicKeyInfo encoding. There is no
+  standard DER encoding for the KEM keys here, so it is RSA only.
+- "raw": a small binary container (magic "PQCK", version, flags, algorithm
+  name, payload, SHA-256 checksum). The payload is the DER encoding for
+  RSA and the key bytes for KEM keys. KEM private keys can be stored
+  "expanded", with the decoded NTT-domain vectors and the matrix A
+  appended, so that loading skips decoding, the key checks and the
+  matrix expansion.
+
+Loading a raw RSA private key skips the RSA consistency check and loading
+an expanded KEM private key skips the FIPS 203 key checks; both are the
+costly part of a load, so raw private key files must only come from a
+trusted source (the checksum catches corruption, not tampering). Public
+keys are always fully checked, since they come from other parties; an
+expanded public key is rejected.
+"""
+
+import hashlib
+import struct
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from .constants import KEY_FORMATS as FORMATS, DEFAULT_KEY_FORMAT as DEFAULT_FORMAT
+
+# File name suffix of each format
+SUFFIXES = {"pem": ".pem", "der": ".der", "raw": ".key"}
+
+RAW_MAGIC = b"PQCK"
+RAW_VERSION = 1
+_RAW_HEADER_FORMAT = ">4sBBB"
+_RAW_HEADER_SIZE = struct.calcsize(_RAW_HEADER_FORMAT)
+_CHECKSUM_SIZE = 32
+# Flag bits of the raw container
+_FLAG_PRIVATE = 0x01
+_FLAG_EXPANDED = 0x02
+
+
+def _check_format(key_format):
+    if key_format not in FORMATS:
+        raise ValueError(f"Unknown key format: {key_format}. Choose from {', '.join(FORMATS)}.")
+
+
+def _kem_module(algorithm):
+    if algorithm.startswith("X25519-ML-KEM-"):
+        from . import xkem
+        return xkem
+    if algorithm.startswith("ML-KEM-"):
+        from . import mlkem
+        return mlkem
+    raise ValueError(f"Unknown key algorithm: {algorithm}.")
+
+
+def _kem_classes(algorithm):
+    # (private key class, public key class) of a KEM algorithm
+    module = _kem_module(algorithm)
+    if algorithm.startswith("X25519-"):
+        return module.HybridKEMPrivateKey, module.HybridKEMPublicKey
+    return module.MLKEMPrivateKey, module.MLKEMPublicKey
+
+
+def is_raw_key(data):
+    """
+    Checks whether key data is a raw container.
+
+    :param data: Key file content (bytes).
+    :return: True for data written in the "raw" format.
+    """
+    return data[:len(RAW_MAGIC)] == RAW_MAGIC
+
+
+def _pack_raw(algorithm, flags, payload):
+    name = algorithm.encode("ascii")
+    body = struct.pack(_RAW_HEADER_FORMAT, RAW_MAGIC, RAW_VERSION, flags, len(name)) + name + payload
+    return body + hashlib.sha256(body).digest()
+
+
+def _unpack_raw(data, private):
+    if len(data) < _RAW_HEADER_SIZE + _CHECKSUM_SIZE:
+        raise ValueError("Truncated raw key.")
+    magic, version, flags, name_length = struct.unpack_from(_RAW_HEADER_FORMAT, data)
+    if magic != RAW_MAGIC:
+        raise ValueError("Not a raw key.")
+    if version != RAW_VERSION:
+        raise ValueError(f"Unsupported raw key version: {version}.")
+    body, checksum = memoryview(data)[:-_CHECKSUM_SIZE], data[-_CHECKSUM_SIZE:]
+    if hashlib.sha256(body).digest() != checksum:
+        raise ValueError("Raw key checksum mismatch.")
+    if bool(flags & _FLAG_PRIVATE) != private:
+        raise ValueError(f"Not a raw {'private' if private else 'public'} key.")
+    start = _RAW_HEADER_SIZE + name_length
+    algorithm = bytes(body[_RAW_HEADER_SIZE:start]).decode("ascii")
+    return algorithm, bool(flags & _FLAG_EXPANDED), body[start:]
+
+
+def serialize_private_key(private_key, key_format=DEFAULT_FORMAT, expanded=False):
+    """
+    Serializes a private key.
+
+    :param private_key: RSA, ML-KEM or X25519 + ML-KEM private key.
+    :param key_format: "pem" (default), "der" or "raw".
+    :param expanded: For raw KEM keys, also store the pre-expanded arrays
+        (trusted key files only).
+    :return: Serialized key (bytes).
+    """
+    _check_format(key_format)
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        encoding = serialization.Encoding.PEM if key_format == "pem" else serialization.Encoding.DER
+        data = private_key.private_bytes(encoding, serialization.PrivateFormat.PKCS8,
+                                         serialization.NoEncryption())
+        return data if key_format != "raw" else _pack_raw(f"RSA-{private_key.key_size}", _FLAG_PRIVATE, data)
+
+    module = _kem_module(private_key.parameter_set)
+    if key_format == "pem":
+        return module.private_key_to_pem(private_key)
+    if key_format == "der":
+        raise ValueError(f"{private_key.parameter_set} keys have no DER encoding; use pem or raw.")
+    if expanded:
+        return _pack_raw(private_key.parameter_set, _FLAG_PRIVATE | _FLAG_EXPANDED,
+                         module.expanded_private_bytes(private_key))
+    return _pack_raw(private_key.parameter_set, _FLAG_PRIVATE, private_key.private_bytes())
+
+
+def serialize_public_key(public_key, key_format=DEFAULT_FORMAT):
+    """
+    Serializes a public key.
+
+    :param public_key: RSA, ML-KEM or X25519 + ML-KEM public key.
+    :param key_format: "pem" (default), "der" or "raw".
+    :return: Serialized key (bytes).
+    """
+    _check_format(key_format)
+    if isinstance(public_key, rsa.RSAPublicKey):
+        encoding = serialization.Encoding.PEM if key_format == "pem" else serialization.Encoding.DER
+        data = public_key.public_bytes(encoding, serialization.PublicFormat.SubjectPublicKeyInfo)
+        return data if key_format != "raw" else _pack_raw(f"RSA-{public_key.key_size}", 0, data)
+
+    module = _kem_module(public_key.parameter_set)
+    if key_format == "pem":
+        return module.public_key_to_pem(public_key)
+    if key_format == "der":
+        raise ValueError(f"{public_key.parameter_set} keys have no DER encoding; use pem or raw.")
+    return _pack_raw(public_key.parameter_set, 0, public_key.public_bytes())
+
+
+def load_raw_private_key(data):
+    """
+    :param data: Raw private key container (bytes).
+    :return: Private key object.
+    """
+    algorithm, expanded, payload = _unpack_raw(data, private=True)
+    if algorithm.startswith("RSA-"):
+        return serialization.load_der_private_key(bytes(payload), password=None, backend=default_backend(),
+                                                  unsafe_skip_rsa_key_validation=True)
+    if expanded:
+        return _kem_module(algorithm).load_expanded_private_key(algorithm, payload)
+    return _kem_classes(algorithm)[0](algorithm, bytes(payload))
+
+
+def load_raw_public_key(data):
+    """
+    :param data: Raw public key container (bytes).
+    :return: Public key object.
+    """
+    algorithm, expanded, payload = _unpack_raw(data, private=False)
+    if algorithm.startswith("RSA-"):
+        return serialization.load_der_public_key(bytes(payload), backend=default_backend())
+    if expanded:
+        raise ValueError("Expanded public keys are not supported; store the public key unexpanded.")
+    return _kem_classes(algorithm)[1](algorithm, bytes(payload))
@@ -4,77 +4,201 @@ This module contains functions to generate cryptographic key pairs
 for encryption and decryption using post-quantum cryptography methods.
 """
 
+import logging
 import os
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import serialization
+from . import keycache
+from . import keyformat
+from .keypool import KeyPool
+from . import metrics
+from .constants import ALGORITHMS, DEFAULT_ALGORITHM
 
-def generate_key():
-    """
-    Generates a RSA key pair (public and private).
-    Save the keys in PEM format for further use.
-    """
-    print("[INFO] Generating RSA key pair...")
+logger = logging.getLogger(__name__)
+
+
+def _generate_private_key(algorithm):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}. Choose from {', '.join(ALGORITHMS)}.")
+
+    if algorithm.startswith("ML-KEM-"):
+        from . import mlkem
+        return mlkem.generate_keypair(algorithm)
 
-    # Generate private key
-    private_key = rsa.generate_private_key(
+    if algorithm.startswith("X25519-ML-KEM-"):
+        from . import xkem
+        return xkem.generate_keypair(algorithm)
+
+    return rsa.generate_private_key(
         public_exponent=65537,
         key_size=2048,
     )
 
-    # Generate the public key
-    public_key = private_key.public_key()
 
-    # Serialize and save private key
-    private_pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=serialization.NoEncryption()
-    )
+def _serialize_keypair(algorithm, key_format=keyformat.DEFAULT_FORMAT, expanded=False):
+    """
+    Generates a key pair for the given algorithm and serializes it.
+    :param algorithm: One of ALGORITHMS.
+    :param key_format: One of keyformat.FORMATS (default: "pem").
+    :param expanded: Store raw KEM private keys with their pre-expanded arrays.
+    :return: Tuple of (private_key, public_key) bytes.
+    """
+    private_key = _generate_private_key(algorithm)
+    return (keyformat.serialize_private_key(private_key, key_format, expanded),
+            keyformat.serialize_public_key(private_key.public_key(), key_format))
+
+
+# Background key pools, one per algorithm (see start_key_pool)
+_key_pools = {}
+
+
+def start_key_pool(algorithm=DEFAULT_ALGORITHM, low_watermark=2, high_watermark=8):
+    """
+    Starts a background pool of pre-generated key pairs for an algorithm.
+    While it runs, generate_key takes ready pairs from the pool and only
+    generates synchronously when the pool is empty.
+    :param algorithm: Algorithm of the pooled key pairs.
+    :param low_watermark: Depth at or below which the pool is refilled.
+    :param high_watermark: Depth the pool is refilled up to.
+    :return: The KeyPool.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}. Choose from {', '.join(ALGORITHMS)}.")
+    pool = _key_pools.get(algorithm)
+    if pool is None:
+        pool = KeyPool(lambda: _serialize_keypair(algorithm), low_watermark, high_watermark)
+        _key_pools[algorithm] = pool
+    pool.start()
+    return pool
+
+
+def stop_key_pool(algorithm=DEFAULT_ALGORITHM):
+    """
+    Stops and discards the key pool for an algorithm.
+    :param algorithm: Algorithm of the pool to stop.
+    """
+    pool = _key_pools.pop(algorithm, None)
+    if pool is not None:
+        pool.stop()
 
-    # Serialize and save public key
-    public_pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo
-    )
+
+def key_pool_metrics():
+    """
+    Returns the metrics of all running key pools.
+    :return: Dictionary mapping algorithm to KeyPool.metrics().
+    """
+    return {algorithm: pool.metrics() for algorithm, pool in _key_pools.items()}
+
+
+def generate_keypair_pem(algorithm=DEFAULT_ALGORITHM):
+    """
+    Generates a key pair and returns it in PEM format without saving it.
+    If a key pool is running for the algorithm, a pre-generated pair is used.
+    :param algorithm: "RSA-2048" (default), "ML-KEM-512/768/1024" or "X25519-ML-KEM-512/768/1024".
+    :return: Tuple of (private_pem, public_pem) bytes.
+    """
+    with metrics.track("keygen", algorithm):
+        pool = _key_pools.get(algorithm)
+        if pool is not None:
+            return pool.take()
+        return _serialize_keypair(algorithm)
+
+
+def generate_key(algorithm=DEFAULT_ALGORITHM, keystore_path=None, label=None,
+                 key_format=keyformat.DEFAULT_FORMAT, expanded=False):
+    """
+    Generates a key pair (public and private).
+    Save the keys to files for further use, or add them to a keystore.
+    If a key pool is running for the algorithm, a pre-generated pair is used.
+    :param algorithm: "RSA-2048" (default), "ML-KEM-512/768/1024" or "X25519-ML-KEM-512/768/1024".
+    :param keystore_path: Keystore database to add the pair to instead of
+        writing private_key.pem and public_key.pem.
+    :param label: Label stored with the key in the keystore.
+    :param key_format: File format: "pem" (default), "der" (RSA only) or
+        "raw"; the files are named private_key.<pem|der|key>. The keystore
+        holds PEM keys only.
+    :param expanded: Store raw KEM private keys with their pre-expanded arrays.
+    :return: The key ID when a keystore is used, otherwise None.
+    """
+    if keystore_path is not None and (key_format != keyformat.DEFAULT_FORMAT or expanded):
+        raise ValueError("The keystore stores PEM keys; key_format and expanded apply to key files only.")
+    logger.info("Generating %s key pair...", algorithm)
+    if keystore_path is not None:
+        from .keystore import open_keystore
+        key_id = open_keystore(keystore_path).generate(algorithm, label)
+        logger.info("Key pair stored in '%s' with ID %s.", keystore_path, key_id)
+        return key_id
+
+    if key_format == keyformat.DEFAULT_FORMAT and not expanded:
+        private_data, public_data = generate_keypair_pem(algorithm)
+    else:
+        with metrics.track("keygen", algorithm):
+            private_data, public_data = _serialize_keypair(algorithm, key_format, expanded)
+    suffix = keyformat.SUFFIXES[key_format]
 
     # Save the private key to a file
-    with open("private_key.pem", "wb") as private_key_file:
-        private_key_file.write(private_pem)
-    print("[INFO] Private key saved as 'private_key.pem'.")
+    with open(f"private_key{suffix}", "wb") as private_key_file:
+        private_key_file.write(private_data)
+    logger.info("Private key saved as 'private_key%s'.", suffix)
 
     # Save the public key to a file
-    with open("public_key.pem", "wb") as public_key_file:
-        public_key_file.write(public_pem)
-    print("[INFO] Public key saved as 'public_key.pem'.")
+    with open(f"public_key{suffix}", "wb") as public_key_file:
+        public_key_file.write(public_data)
+    logger.info("Public key saved as 'public_key%s'.", suffix)
+
+    logger.info("Key generation complete.")
 
-    print("[INFO] Key generation complete.")
+
+def generate_keys(count, algorithm=DEFAULT_ALGORITHM, output_dir=None):
+    """
+    Generates many key pairs at once. ML-KEM key pairs are generated as
+    one batch, with sampling and the NTT run over all keys together;
+    RSA key pairs are generated one after another.
+    :param count: Number of key pairs to generate.
+    :param algorithm: "RSA-2048" (default), "ML-KEM-512/768/1024" or "X25519-ML-KEM-512/768/1024".
+    :param output_dir: Optional directory to save the pairs in, as
+        "<index>_private_key.pem" and "<index>_public_key.pem".
+    :return: List of (private_pem, public_pem) tuples.
+    """
+    with metrics.track("keygen_batch", algorithm):
+        if algorithm.startswith("ML-KEM-") and algorithm in ALGORITHMS:
+            from . import mlkem
+            keypairs = [(mlkem.private_key_to_pem(private_key),
+                         mlkem.public_key_to_pem(private_key.public_key()))
+                        for private_key in mlkem.generate_keypairs(count, algorithm)]
+        else:
+            keypairs = [_serialize_keypair(algorithm) for _ in range(count)]
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        width = len(str(max(count - 1, 0)))
+        for index, (private_pem, public_pem) in enumerate(keypairs):
+            prefix = os.path.join(output_dir, f"{index:0{width}d}")
+            with open(f"{prefix}_private_key.pem", "wb") as private_key_file:
+                private_key_file.write(private_pem)
+            with open(f"{prefix}_public_key.pem", "wb") as public_key_file:
+                public_key_file.write(public_pem)
+        logger.info("%d %s key pairs saved to '%s'.", count, algorithm, output_dir)
+
+    return keypairs
 
 
 def load_private_key(path):
     """
-    Loads a private key from a PEM file.
-    :param path: Path to the PEM file containing the private key.
+    Loads a private key (RSA, ML-KEM or X25519 + ML-KEM) from a PEM, DER or raw file.
+    Parsed keys are cached per path and re-read when the file changes.
+    :param path: Path to the file containing the private key.
     :return: Private key object.
     """
-    with open(path, "rb") as key_file:
-        private_key = serialization.load_pem_private_key(
-            key_file.read(),
-            password=None,
-        )
-    return private_key
+    return keycache.load_private_key(path)
 
 
 def load_public_key(path):
     """
-    Loads a public key from a PEM file.
-    :param path: Path to the PEM file containing the public key.
+    Loads a public key (RSA, ML-KEM or X25519 + ML-KEM) from a PEM, DER or raw file.
+    Parsed keys are cached per path and re-read when the file changes.
+    :param path: Path to the file containing the public key.
     :return: Public key object.
     """
-    with open(path, "rb") as key_file:
-        public_key = serialization.load_pem_public_key(
-            key_file.read()
-        )
-    return public_key
-
+    return keycache.load_public_key(path)
@@ -0,0 +1,173 @@
+"""
+Key Pool Module - Pre-generated Key Pairs
+This module provides a bounded pool of ready key pairs that a background
+thread keeps filled. Taking a key from the pool is instant, which takes
+the cost and variance of RSA key generation off the caller's path. The
+worker refills the pool up to the high watermark whenever it drops to the
+low watermark; callers fall back to synchronous generation when it is empty.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class KeyPool:
+    """
+    A bounded pool of pre-generated key pairs filled by a background thread.
+    """
+
+    def __init__(self, factory, low_watermark=2, high_watermark=8):
+        """
+        :param factory: Callable returning one new key pair.
+        :param low_watermark: Depth at or below which the worker starts refilling.
+        :param high_watermark: Depth the worker refills up to (pool capacity).
+        """
+        if high_watermark < 1 or not 0 <= low_watermark < high_watermark:
+            raise ValueError("Watermarks must satisfy 0 <= low_watermark < high_watermark.")
+        self.factory = factory
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self._keys = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.generated = 0
+        self.served = 0
+        self.fallbacks = 0
+        self.refill_seconds = 0.0
+        self.errors = 0
+
+    def start(self):
+        """
+        Starts the background refill thread.
+        """
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                if not self._stopping:
+                    return
+                # A second refill thread would run against the same pool
+                raise RuntimeError("The previous refill thread has not stopped yet.")
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="key-pool", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops the background refill thread. Keys already in the pool are kept.
+        If the thread is still running after `timeout`, the pool cannot be
+        started again until it has finished.
+
+        :param timeout: Seconds to wait for the thread to finish its current key.
+        """
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._condition:
+            if self._thread is thread and not (thread and thread.is_alive()):
+                self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and len(self._keys) > self.low_watermark:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+
+            # Refill to the high watermark, generating outside the lock
+            while True:
+                with self._condition:
+                    if self._stopping or len(self._keys) >= self.high_watermark:
+                        break
+                start_time = time.perf_counter()
+                try:
+                    keypair = self.factory()
+                except Exception:
+                    with self._condition:
+                        self.errors += 1
+                    time.sleep(0.1)
+                    continue
+                elapsed_time = time.perf_counter() - start_time
+                with self._condition:
+                    self._keys.append(keypair)
+                    self.generated += 1
+                    self.refill_seconds += elapsed_time
+                    self._condition.notify_all()
+
+    def get(self, timeout=0):
+        """
+        Takes a key pair from the pool.
+
+        :param timeout: Seconds to wait for a key when the pool is empty (default: do not wait).
+        :return: A key pair, or None if none is available in time.
+        """
+        with self._condition:
+            if not self._keys and timeout:
+                self._condition.wait_for(lambda: self._keys, timeout)
+            if not self._keys:
+                return None
+            keypair = self._keys.popleft()
+            self.served += 1
+            if len(self._keys) <= self.low_watermark:
+                self._condition.notify_all()
+            return keypair
+
+    def take(self):
+        """
+        Takes a key pair from the pool, or generates one synchronously
+        when the pool is empty.
+
+        :return: A key pair.
+        """
+        keypair = self.get()
+        if keypair is not None:
+            return keypair
+        with self._condition:
+            self.fallbacks += 1
+        return self.factory()
+
+    def fill(self):
+        """
+        Fills the pool to the high watermark in the calling thread.
+        """
+        while self.depth() < self.high_watermark:
+            start_time = time.perf_counter()
+            keypair = self.factory()
+            elapsed_time = time.perf_counter() - start_time
+            with self._condition:
+                self._keys.append(keypair)
+                self.generated += 1
+                self.refill_seconds += elapsed_time
+                self._condition.notify_all()
+
+    def depth(self):
+        """
+        :return: Number of ready key pairs in the pool.
+        """
+        with self._condition:
+            return len(self._keys)
+
+    def metrics(self):
+        """
+        Returns pool metrics.
+
+        :return: Dictionary with depth, watermarks, generated/served/fallback
+            counts and the refill rate (keys generated per second of generation time).
+        """
+        with self._condition:
+            return {
+                "depth": len(self._keys),
+                "low_watermark": self.low_watermark,
+                "high_watermark": self.high_watermark,
+                "generated": self.generated,
+                "served": self.served,
+                "fallbacks": self.fallbacks,
+                "errors": self.errors,
+                "refill_rate": self.generated / self.refill_seconds if self.refill_seconds else 0.0,
+                "running": self._thread is not None,
+            }
@@ -0,0 +1,382 @@
+"""
+Keystore Module - Indexed Key Storage
+This module keeps key pairs in a SQLite database instead of loose PEM
+files. Every key is addressed by its ID, the hex SHA-256 fingerprint of
+its public half (see keycache.key_fingerprint), which is the table's
+primary key, so a lookup is one index probe however many keys are
+stored. A unique ID prefix of at least MIN_PREFIX_LENGTH characters may
+be used in place of the full ID. Each key records its algorithm, an
+optional label (e.g. a tenant name), and its creation and rotation times.
+
+Keys stored here can be used anywhere a key path is accepted through a
+key reference of the form "keystore:<database path>#<key id>" (see
+key_reference); the key cache resolves references against the store.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from .keycache import KEYSTORE_PREFIX, key_algorithm, key_fingerprint, _parse_private_key, _parse_public_key
+
+MIN_PREFIX_LENGTH = 8
+PRIVATE_KEY_SUFFIX = "_private_key.pem"
+PUBLIC_KEY_SUFFIX = "_public_key.pem"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keys (
+    id TEXT PRIMARY KEY,
+    algorithm TEXT NOT NULL,
+    label TEXT,
+    created REAL NOT NULL,
+    rotated REAL,
+    public_pem BLOB NOT NULL,
+    private_pem BLOB
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS keys_label ON keys (label);
+"""
+
+_METADATA_COLUMNS = "id, algorithm, label, created, rotated, private_pem IS NOT NULL"
+
+
+def _metadata(row):
+    key_id, algorithm, label, created, rotated, has_private = row
+    return {"id": key_id, "algorithm": algorithm, "label": label, "created": created,
+            "rotated": rotated, "has_private": bool(has_private)}
+
+
+class KeyStore:
+    """
+    A SQLite-backed key store. Methods are thread-safe.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the database file (created if missing, readable
+            by the owner only since it holds private keys).
+        """
+        self.path = path
+        created = not os.path.exists(path)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if created:
+            os.chmod(path, 0o600)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def _entry(self, public_pem, private_pem, label, created):
+        public_key = _parse_public_key(public_pem)
+        fingerprint = key_fingerprint(public_key)
+        if private_pem is not None and key_fingerprint(_parse_private_key(private_pem)) != fingerprint:
+            raise ValueError("The private key does not match the public key.")
+        return (fingerprint.hex(), key_algorithm(public_key), label, created, None, public_pem, private_pem)
+
+    def import_keys(self, entries, label=None):
+        """
+        Adds many keys in one transaction. Keys already in the store are
+        left unchanged, except that a missing private half is filled in.
+
+        :param entries: Iterable of (public_pem, private_pem or None) pairs.
+        :param label: Label stored with every imported key.
+        :return: List of key IDs, in input order.
+        """
+        now = time.time()
+        rows = [self._entry(public_pem, private_pem, label, now) for public_pem, private_pem in entries]
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT INTO keys VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE "
+                    "SET private_pem = COALESCE(private_pem, excluded.private_pem)", rows)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return [row[0] for row in rows]
+
+    def add(self, public_pem, private_pem=None, label=None):
+        """
+        Adds one key (a public key, or a key pair).
+
+        :param public_pem: Public key in PEM format (bytes).
+        :param private_pem: Matching private key in PEM format (bytes), if any.
+        :param label: Optional label, e.g. a tenant name.
+        :return: The key ID.
+        """
+        return self.import_keys([(public_pem, private_pem)], label)[0]
+
+    def generate(self, algorithm=None, label=None):
+        """
+        Generates a key pair (from the key pool if one is running) and stores it.
+
+        :param algorithm: Key algorithm (default: keygen.DEFAULT_ALGORITHM).
+        :param label: Optional label, e.g. a tenant name.
+        :return: The key ID.
+        """
+        from .keygen import generate_keypair_pem, DEFAULT_ALGORITHM
+        private_pem, public_pem = generate_keypair_pem(algorithm or DEFAULT_ALGORITHM)
+        return self.add(public_pem, private_pem, label)
+
+    def import_directory(self, directory, label=None):
+        """
+        Imports the key pairs of a directory written by keygen.generate_keys
+        ("<name>_private_key.pem" and "<name>_public_key.pem").
+
+        :param directory: Directory to import from.
+        :param label: Label stored with every imported key.
+        :return: List of key IDs.
+        """
+        entries = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(PUBLIC_KEY_SUFFIX):
+                continue
+            stem = os.path.join(directory, name[:-len(PUBLIC_KEY_SUFFIX)])
+            with open(stem + PUBLIC_KEY_SUFFIX, "rb") as file:
+                public_pem = file.read()
+            private_pem = None
+            if os.path.exists(stem + PRIVATE_KEY_SUFFIX):
+                with open(stem + PRIVATE_KEY_SUFFIX, "rb") as file:
+                    private_pem = file.read()
+            entries.append((public_pem, private_pem))
+        return self.import_keys(entries, label)
+
+    def export_directory(self, directory, key_ids=None):
+        """
+        Writes keys as "<key id>_private_key.pem" / "<key id>_public_key.pem".
+
+        :param directory: Directory to write to (created if missing).
+        :param key_ids: IDs of the keys to export (default: all keys).
+        :return: Number of keys exported.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if key_ids is None:
+            with self._lock:
+                rows = self._connection.execute("SELECT id, public_pem, private_pem FROM keys").fetchall()
+        else:
+            rows = [(key_id, self.public_pem(key_id), self.private_pem(key_id, required=False))
+                    for key_id in map(self.resolve, key_ids)]
+        for key_id, public_pem, private_pem in rows:
+            with open(os.path.join(directory, key_id + PUBLIC_KEY_SUFFIX), "wb") as file:
+                file.write(public_pem)
+            if private_pem is not None:
+                path = os.path.join(directory, key_id + PRIVATE_KEY_SUFFIX)
+                with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as file:
+                    file.write(private_pem)
+        return len(rows)
+
+    def resolve(self, key_id):
+        """
+        Expands a key ID or unique ID prefix to the full key ID.
+
+        :param key_id: Full key ID, or a prefix of at least MIN_PREFIX_LENGTH characters.
+        :return: The full key ID.
+        """
+        key_id = key_id.lower()
+        with self._lock:
+            if self._connection.execute("SELECT 1 FROM keys WHERE id = ?", (key_id,)).fetchone():
+                return key_id
+            if len(key_id) < MIN_PREFIX_LENGTH:
+                raise KeyError(f"No key with ID {key_id} in {self.path}.")
+            # A range scan over the primary key index, not a table scan
+            matches = self._connection.execute(
+                "SELECT id FROM keys WHERE id >= ? AND id < ? LIMIT 2", (key_id, key_id + "g")).fetchall()
+        if not matches:
+            raise KeyError(f"No key with ID {key_id} in {self.path}.")
+        if len(matches) > 1:
+            raise KeyError(f"Key ID prefix {key_id} is ambiguous in {self.path}.")
+        return matches[0][0]
+
+    def _column(self, column, key_id):
+        key_id = self.resolve(key_id)
+        with self._lock:
+            row = self._connection.execute(f"SELECT {column} FROM keys WHERE id = ?", (key_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No key with ID {key_id} in {self.path}.")
+        return row[0]
+
+    def public_pem(self, key_id):
+        """
+        :return: The public key of `key_id` in PEM format (bytes).
+        """
+        return self._column("public_pem", key_id)
+
+    def private_pem(self, key_id, required=True):
+        """
+        :param required: Raise KeyError if only the public key is stored.
+        :return: The private key of `key_id` in PEM format (bytes), or None.
+        """
+        private_pem = self._column("private_pem", key_id)
+        if private_pem is None and required:
+            raise KeyError(f"Only the public half of key {key_id} is stored in {self.path}.")
+        return private_pem
+
+    def metadata(self, key_id):
+        """
+        :return: Dictionary with id, algorithm, label, created, rotated and has_private.
+        """
+        key_id = self.resolve(key_id)
+        with self._lock:
+            row = self._connection.execute(f"SELECT {_METADATA_COLUMNS} FROM keys WHERE id = ?",
+                                           (key_id,)).fetchone()
+        return _metadata(row)
+
+    def list_keys(self, label=None):
+        """
+        Lists key metadata, optionally only for one label.
+
+        :param label: Label to filter on (uses the label index).
+        :return: List of metadata dictionaries ordered by ID.
+        """
+        with self._lock:
+            if label is None:
+                rows = self._connection.execute(f"SELECT {_METADATA_COLUMNS} FROM keys ORDER BY id").fetchall()
+            else:
+                rows = self._connection.execute(
+                    f"SELECT {_METADATA_COLUMNS} FROM keys WHERE label = ? ORDER BY id", (label,)).fetchall()
+        return [_metadata(row) for row in rows]
+
+    def key_for_file(self, input_file):
+        """
+        Finds a stored private key that can decrypt a hybrid-encrypted file,
+        by looking up the fingerprints of the file's recipients.
+
+        :param input_file: Path to a hybrid-encrypted file.
+        :return: Key ID.
+        """
+        from .hybrid import read_header
+        with open(input_file, "rb") as file:
+            header = read_header(file)
+        with self._lock:
+            for recipient in header.recipients:
+                row = self._connection.execute("SELECT id FROM keys WHERE id = ? AND private_pem IS NOT NULL",
+                                               (recipient.fingerprint.hex(),)).fetchone()
+                if row is not None:
+                    return row[0]
+        raise KeyError(f"No private key in {self.path} can decrypt {input_file}.")
+
+    def mark_rotated(self, key_id, when=None):
+        """
+        Records that a key has been rotated out.
+
+        :param key_id: Key ID or unique prefix.
+        :param when: Rotation time as a Unix timestamp (default: now).
+        """
+        key_id = self.resolve(key_id)
+        with self._lock:
+            self._connection.execute("UPDATE keys SET rotated = ? WHERE id = ?",
+                                     (time.time() if when is None else when, key_id))
+
+    def delete(self, key_id):
+        """
+        Removes a key from the store.
+
+        :param key_id: Key ID or unique prefix.
+        """
+        key_id = self.resolve(key_id)
+        with self._lock:
+            self._connection.execute("DELETE FROM keys WHERE id = ?", (key_id,))
+
+
+# Stores opened through key references, per process: a connection must
+# not be shared with worker processes forked after it was opened
+_open_stores = {}
+_open_stores_lock = threading.Lock()
+
+
+def open_keystore(path):
+    """
+    Returns the shared KeyStore of this process for a database path.
+
+    :param path: Path to the database file.
+    :return: KeyStore.
+    """
+    cache_key = (os.getpid(), os.path.abspath(path))
+    with _open_stores_lock:
+        store = _open_stores.get(cache_key)
+        if store is None:
+            store = _open_stores[cache_key] = KeyStore(path)
+        return store
+
+
+def key_reference(path, key_id):
+    """
+    Builds a key reference usable wherever a key path is accepted.
+
+    :param path: Path to the keystore database.
+    :param key_id: Key ID or unique prefix.
+    :return: Reference string "keystore:<path>#<key id>".
+    """
+    return f"{KEYSTORE_PREFIX}{path}#{key_id}"
+
+
+def parse_key_reference(reference):
+    """
+    Splits a key reference into its database path and key ID.
+
+    :param reference: Reference string from key_reference.
+    :return: Tuple of (path, key_id).
+    """
+    path, separator, key_id = reference[len(KEYSTORE_PREFIX):].rpartition("#")
+    if not reference.startswith(KEYSTORE_PREFIX) or not separator or not path or not key_id:
+        raise ValueError(f"Invalid key reference: {reference}")
+    return path, key_id
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+def reference_cache_entry(reference, kind):
+    """
+    Returns how the key cache stores the key a reference points to: under
+    the normalized reference with the full key ID, and with the state of
+    the database and its write-ahead log as the signature, since writes
+    land in the log before they reach the database file.
+
+    :param reference: Reference string from key_reference.
+    :param kind: "private" or "public".
+    :return: Tuple of (cache key, signature).
+    """
+    path, key_id = parse_key_reference(reference)
+    path = os.path.abspath(path)
+    # Take the signature first: a change after it invalidates the entry on the next lookup
+    signature = (_file_signature(path), _file_signature(path + "-wal"))
+    key_id = open_keystore(path).resolve(key_id)
+    return (kind, key_reference(path, key_id)), signature
+
+
+def read_key_reference(reference, kind):
+    """
+    Reads the PEM data a key reference points to.
+
+    :param reference: Reference string from key_reference.
+    :param kind: "private" or "public".
+    :return: PEM data (bytes).
+    """
+    path, key_id = parse_key_reference(reference)
+    store = open_keystore(path)
+    return store.private_pem(key_id) if kind == "private" else store.public_pem(key_id)
@@ -0,0 +1,216 @@
+"""
+Metrics Module - Instrumentation Hooks
+This module is the instrumentation surface of the package. Key generation,
+encryption, decryption and key loading report every operation to the
+registered hooks with its name, algorithm, latency, byte count and
+outcome. No hooks are registered by default, and the hot path then costs a
+single check. InMemoryCollector is a built-in hook that keeps counters and
+latency histograms labeled by operation and algorithm and renders them in
+the Prometheus text exposition format.
+"""
+
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+
+class Hook:
+    """
+    Base class for instrumentation hooks. Override either method; the
+    value returned by on_start is passed back to on_end, which lets
+    tracing hooks carry a span between the two calls.
+    """
+
+    def on_start(self, operation, algorithm):
+        """
+        Called when an operation starts. The algorithm may still be None
+        when it is only known after the key has been loaded.
+        """
+        return None
+
+    def on_end(self, operation, algorithm, seconds, nbytes, error, context):
+        """
+        Called when an operation finishes.
+
+        :param operation: Operation name, e.g. "encrypt_data".
+        :param algorithm: Algorithm label, e.g. "RSA-2048" (may be None).
+        :param seconds: Wall-clock latency in seconds.
+        :param nbytes: Bytes processed (0 when not applicable).
+        :param error: The raised exception, or None on success.
+        :param context: The value returned by on_start.
+        """
+
+
+def register_hook(hook):
+    """
+    Registers an instrumentation hook.
+
+    :param hook: A Hook instance.
+    """
+    global _hooks
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+
+
+def unregister_hook(hook):
+    """
+    Removes a previously registered hook.
+
+    :param hook: A Hook instance.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(registered for registered in _hooks if registered is not hook)
+
+
+class _Operation:
+    """
+    Context manager that times one operation and reports it to the hooks.
+    Set `algorithm` and `bytes` inside the block once they are known.
+    """
+
+    __slots__ = ("operation", "algorithm", "bytes", "_hooks", "_contexts", "_start")
+
+    def __init__(self, operation, algorithm, hooks):
+        self.operation = operation
+        self.algorithm = algorithm
+        self.bytes = 0
+        self._hooks = hooks
+
+    def __enter__(self):
+        self._contexts = [hook.on_start(self.operation, self.algorithm) for hook in self._hooks]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        for hook, context in zip(self._hooks, self._contexts):
+            hook.on_end(self.operation, self.algorithm, seconds, self.bytes, exc, context)
+        return False
+
+
+class _NoOperation:
+    """
+    Shared stand-in used when no hooks are registered.
+    """
+
+    __slots__ = ("algorithm", "bytes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_OPERATION = _NoOperation()
+
+
+def track(operation, algorithm=None):
+    """
+    Returns a context manager that reports one operation to the hooks.
+
+    :param operation: Operation name, e.g. "encrypt_data".
+    :param algorithm: Algorithm label if already known.
+    :return: Context manager; its `algorithm` and `bytes` may be set inside the block.
+    """
+    hooks = _hooks
+    if not hooks:
+        return _NO_OPERATION
+    return _Operation(operation, algorithm, hooks)
+
+
+class InMemoryCollector(Hook):
+    """
+    Collects operation counts, error counts, byte counts and latency
+    histograms in memory, labeled by operation and algorithm.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds of the latency histogram buckets, in seconds.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def on_end(self, operation, algorithm, seconds, nbytes, error, context):
+        key = (operation, algorithm or "unknown")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "count": 0, "errors": 0, "bytes": 0, "sum": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                }
+            series["count"] += 1
+            series["bytes"] += nbytes
+            series["sum"] += seconds
+            if error is not None:
+                series["errors"] += 1
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][index] += 1
+                    break
+
+    def snapshot(self):
+        """
+        Returns a copy of the collected series.
+
+        :return: Dictionary mapping (operation, algorithm) to its counters.
+        """
+        with self._lock:
+            return {key: dict(series, buckets=list(series["buckets"]))
+                    for key, series in self._series.items()}
+
+    def reset(self):
+        """
+        Drops all collected series.
+        """
+        with self._lock:
+            self._series.clear()
+
+    def render_prometheus(self, prefix="pqc"):
+        """
+        Renders the collected series in the Prometheus text exposition format.
+
+        :param prefix: Metric name prefix.
+        :return: Exposition text (string).
+        """
+        series = sorted(self.snapshot().items())
+        lines = []
+
+        def labels(operation, algorithm, extra=""):
+            return f'{{operation="{operation}",algorithm="{algorithm}"{extra}}}'
+
+        for name, field, kind, description in (
+            ("operations_total", "count", "counter", "Number of operations."),
+            ("operation_errors_total", "errors", "counter", "Number of failed operations."),
+            ("operation_bytes_total", "bytes", "counter", "Bytes processed by operations."),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for (operation, algorithm), values in series:
+                lines.append(f"{prefix}_{name}{labels(operation, algorithm)} {values[field]}")
+
+        name = f"{prefix}_operation_duration_seconds"
+        lines.append(f"# HELP {name} Operation latency in seconds.")
+        lines.append(f"# TYPE {name} histogram")
+        for (operation, algorithm), values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values["buckets"]):
+                cumulative += count
+                bucket = labels(operation, algorithm, ',le="%g"' % bound)
+                lines.append(f"{name}_bucket{bucket} {cumulative}")
+            bucket = labels(operation, algorithm, ',le="+Inf"')
+            lines.append(f"{name}_bucket{bucket} {values['count']}")
+            lines.append(f"{name}_sum{labels(operation, algorithm)} {values['sum']:.9f}")
+            lines.append(f"{name}_count{labels(operation, algorithm)} {values['count']}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,732 @@
+"""
+ML-KEM Module - Module-Lattice Key Encapsulation (FIPS 203)
+This module implements ML-KEM-512, ML-KEM-768 and ML-KEM-1024 (Kyber)
+on top of NumPy. Polynomials are arrays of 256 coefficients and every
+step (NTT, inverse NTT, base-case multiplication, sampling, compression
+and byte encoding) operates on whole coefficient arrays along the last
+axis instead of looping over coefficients in Python.
+
+Batched variants (`generate_keypairs`, `encapsulate_batch`) stack many
+keys or encapsulations along a leading axis so that sampling, the NTT and
+compression run once per batch instead of once per key.
+
+Keys are stored in PEM-style armor, e.g. "ML-KEM-768 PUBLIC KEY", holding
+the FIPS 203 encapsulation key or decapsulation key bytes. The expanded
+private form (`expanded_private_bytes`) appends the decoded NTT-domain
+vectors and the matrix A, so that loading a private key skips decoding,
+the key checks and the matrix expansion. Public keys have no expanded
+form: they come from other parties, so their encoding is always checked
+and their matrix derived from the seed.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import numpy as np
+
+Q = 3329
+N = 256
+
+# Parameter sets: (k, eta1, eta2, du, dv)
+PARAMETER_SETS = {
+    "ML-KEM-512": (2, 3, 2, 10, 4),
+    "ML-KEM-768": (3, 2, 2, 10, 4),
+    "ML-KEM-1024": (4, 2, 2, 11, 5),
+}
+
+SHARED_SECRET_SIZE = 32
+SEED_SIZE = 32
+
+
+def _bit_rev7(value):
+    return int(f"{value:07b}"[::-1], 2)
+
+
+# zeta^BitRev7(i) for the NTT layers and zeta^(2*BitRev7(i)+1) for base-case multiplication
+_ZETAS = np.array([pow(17, _bit_rev7(i), Q) for i in range(128)], dtype=np.int64)
+_GAMMAS = np.array([pow(17, 2 * _bit_rev7(i) + 1, Q) for i in range(128)], dtype=np.int64)
+_N_INV = pow(128, -1, Q)
+
+
+# Hash functions (FIPS 203, section 4.1)
+
+def _h(data):
+    return hashlib.sha3_256(data).digest()
+
+
+def _j(data):
+    return hashlib.shake_256(data).digest(SHARED_SECRET_SIZE)
+
+
+def _g(data):
+    digest = hashlib.sha3_512(data).digest()
+    return digest[:32], digest[32:]
+
+
+def _prf(eta, seed, nonce):
+    return hashlib.shake_256(seed + bytes([nonce])).digest(64 * eta)
+
+
+# Number-theoretic transform
+
+def ntt(f):
+    """
+    Computes the NTT of polynomials along the last axis.
+
+    :param f: Integer array of shape (..., 256) with coefficients mod q.
+    :return: Array of the same shape in the NTT domain.
+    """
+    f = np.array(f, dtype=np.int64)
+    lead = f.shape[:-1]
+    length = 128
+    while length >= 2:
+        blocks = N // (2 * length)
+        view = f.reshape(lead + (blocks, 2, length))
+        zetas = _ZETAS[blocks:2 * blocks].reshape(blocks, 1)
+        t = (zetas * view[..., 1, :]) % Q
+        low = view[..., 0, :]
+        view[..., 1, :] = (low - t) % Q
+        view[..., 0, :] = (low + t) % Q
+        length //= 2
+    return f
+
+
+def ntt_inverse(f):
+    """
+    Computes the inverse NTT of polynomials along the last axis.
+
+    :param f: Integer array of shape (..., 256) in the NTT domain.
+    :return: Array of the same shape in the normal domain.
+    """
+    f = np.array(f, dtype=np.int64)
+    lead = f.shape[:-1]
+    length = 2
+    while length <= 128:
+        blocks = N // (2 * length)
+        view = f.reshape(lead + (blocks, 2, length))
+        zetas = _ZETAS[2 * blocks - 1:blocks - 1:-1].reshape(blocks, 1)
+        low = view[..., 0, :].copy()
+        high = view[..., 1, :]
+        view[..., 0, :] = (low + high) % Q
+        view[..., 1, :] = (zetas * (high - low)) % Q
+        length *= 2
+    return (f * _N_INV) % Q
+
+
+def multiply_ntts(a, b):
+    """
+    Multiplies polynomials in the NTT domain (base-case multiplication).
+
+    :param a: Array of shape (..., 256) in the NTT domain.
+    :param b: Array broadcastable with `a` in the NTT domain.
+    :return: The product in the NTT domain.
+    """
+    a = np.asarray(a).reshape(np.shape(a)[:-1] + (128, 2))
+    b = np.asarray(b).reshape(np.shape(b)[:-1] + (128, 2))
+    a0, a1 = a[..., 0], a[..., 1]
+    b0, b1 = b[..., 0], b[..., 1]
+    c0 = (a0 * b0 + ((a1 * b1) % Q) * _GAMMAS) % Q
+    c1 = (a0 * b1 + a1 * b0) % Q
+    return np.stack((c0, c1), axis=-1).reshape(c0.shape[:-1] + (N,))
+
+
+def _matrix_vector_ntt(matrix, vector):
+    """
+    Computes sum_j matrix[..., i, j, :] * vector[..., j, :] in the NTT domain.
+    """
+    return multiply_ntts(matrix, vector[..., np.newaxis, :, :]).sum(axis=-2) % Q
+
+
+def _dot_ntt(a, b):
+    return multiply_ntts(a, b).sum(axis=-2) % Q
+
+
+# Encoding, compression and sampling
+
+def byte_encode(f, d):
+    """
+    Encodes d-bit coefficients along the last axis into bytes (ByteEncode_d).
+
+    :param f: Integer array of shape (..., 256).
+    :param d: Bits per coefficient (1..12).
+    :return: uint8 array of shape (..., 32 * d).
+    """
+    f = np.asarray(f, dtype=np.int64)
+    bits = ((f[..., np.newaxis] >> np.arange(d)) & 1).astype(np.uint8)
+    return np.packbits(bits.reshape(f.shape[:-1] + (N * d,)), axis=-1, bitorder="little")
+
+
+def byte_decode(data, d):
+    """
+    Decodes bytes into d-bit coefficients along the last axis (ByteDecode_d).
+
+    :param data: uint8 array of shape (..., 32 * d).
+    :param d: Bits per coefficient (1..12).
+    :return: Integer array of shape (..., 256).
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    bits = np.unpackbits(data, axis=-1, bitorder="little")
+    bits = bits.reshape(data.shape[:-1] + (N, d)).astype(np.int64)
+    values = bits @ (1 << np.arange(d, dtype=np.int64))
+    return values % Q if d == 12 else values
+
+
+def compress(x, d):
+    """
+    Compresses coefficients mod q to d bits (Compress_d).
+    """
+    return ((np.asarray(x, dtype=np.int64) << d) + Q // 2) // Q & ((1 << d) - 1)
+
+
+def decompress(y, d):
+    """
+    Decompresses d-bit values to coefficients mod q (Decompress_d).
+    """
+    return (np.asarray(y, dtype=np.int64) * Q + (1 << (d - 1))) >> d
+
+
+def sample_ntt(seed):
+    """
+    Samples a uniform polynomial in the NTT domain from a 34-byte seed
+    (SampleNTT). The SHAKE128 stream is parsed with array operations and
+    extended only in the rare case where the first blocks do not yield
+    enough accepted coefficients.
+
+    :param seed: 32-byte rho followed by the two index bytes.
+    :return: Integer array of shape (256,).
+    """
+    xof = hashlib.shake_128(seed)
+    length = 168 * 3
+    while True:
+        stream = np.frombuffer(xof.digest(length), dtype=np.uint8).astype(np.int64)
+        triples = stream.reshape(-1, 3)
+        d1 = triples[:, 0] + 256 * (triples[:, 1] & 15)
+        d2 = (triples[:, 1] >> 4) + 16 * triples[:, 2]
+        candidates = np.stack((d1, d2), axis=-1).reshape(-1)
+        accepted = candidates[candidates < Q]
+        if accepted.size >= N:
+            return accepted[:N]
+        length += 168
+
+
+def sample_poly_cbd(data, eta):
+    """
+    Samples a polynomial from the centered binomial distribution
+    (SamplePolyCBD_eta).
+
+    :param data: Bytes of length 64 * eta.
+    :param eta: Distribution parameter (2 or 3).
+    :return: Integer array of shape (256,) with coefficients mod q.
+    """
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+    bits = bits.reshape(N, 2, eta).astype(np.int64).sum(axis=-1)
+    return (bits[:, 0] - bits[:, 1]) % Q
+
+
+def sample_ntt_batch(seeds):
+    """
+    Batched SampleNTT: samples one NTT-domain polynomial per seed.
+    The accepted coefficients of all rows are selected with one stable
+    argsort; the rare rows without enough candidates fall back to
+    `sample_ntt`.
+
+    :param seeds: Sequence of 34-byte seeds.
+    :return: Integer array of shape (len(seeds), 256).
+    """
+    length = 168 * 3
+    stream = np.frombuffer(b"".join(hashlib.shake_128(seed).digest(length) for seed in seeds),
+                           dtype=np.uint8).astype(np.int64).reshape(len(seeds), -1, 3)
+    d1 = stream[..., 0] + 256 * (stream[..., 1] & 15)
+    d2 = (stream[..., 1] >> 4) + 16 * stream[..., 2]
+    candidates = np.stack((d1, d2), axis=-1).reshape(len(seeds), -1)
+    accepted = candidates < Q
+    order = np.argsort(~accepted, axis=-1, kind="stable")[:, :N]
+    result = np.take_along_axis(candidates, order, axis=-1)
+    for row in np.flatnonzero(accepted.sum(axis=-1) < N):
+        result[row] = sample_ntt(seeds[row])
+    return result
+
+
+def sample_poly_cbd_batch(data, eta):
+    """
+    Batched SamplePolyCBD_eta: samples one polynomial per byte string.
+
+    :param data: Sequence of byte strings of length 64 * eta.
+    :param eta: Distribution parameter (2 or 3).
+    :return: Integer array of shape (len(data), 256) with coefficients mod q.
+    """
+    raw = np.frombuffer(b"".join(data), dtype=np.uint8).reshape(len(data), 64 * eta)
+    bits = np.unpackbits(raw, axis=-1, bitorder="little")
+    bits = bits.reshape(len(data), N, 2, eta).astype(np.int64).sum(axis=-1)
+    return (bits[..., 0] - bits[..., 1]) % Q
+
+
+def expand_matrix(rho, k):
+    """
+    Expands the public matrix A (NTT domain) from the seed rho.
+
+    :param rho: 32-byte public seed.
+    :param k: Module rank.
+    :return: Integer array of shape (k, k, 256) where [i, j] is A[i][j].
+    """
+    return np.array([[sample_ntt(rho + bytes([j, i])) for j in range(k)]
+                     for i in range(k)], dtype=np.int64)
+
+
+def _sample_vector(seed, eta, first_nonce, k):
+    return np.array([sample_poly_cbd(_prf(eta, seed, first_nonce + i), eta)
+                     for i in range(k)], dtype=np.int64)
+
+
+# K-PKE (FIPS 203, section 5)
+
+def _pke_keygen(d, params):
+    k, eta1 = params[0], params[1]
+    rho, sigma = _g(d + bytes([k]))
+    a_hat = expand_matrix(rho, k)
+    s_hat = ntt(_sample_vector(sigma, eta1, 0, k))
+    e_hat = ntt(_sample_vector(sigma, eta1, k, k))
+    t_hat = (_matrix_vector_ntt(a_hat, s_hat) + e_hat) % Q
+    ek = byte_encode(t_hat, 12).tobytes() + rho
+    dk = byte_encode(s_hat, 12).tobytes()
+    return ek, dk
+
+
+def _pke_encrypt(ek, m, r, params, a_hat=None, t_hat=None):
+    k, eta1, eta2, du, dv = params
+    if t_hat is None:
+        t_hat = byte_decode(np.frombuffer(ek[:384 * k], dtype=np.uint8).reshape(k, 384), 12)
+    if a_hat is None:
+        a_hat = expand_matrix(ek[384 * k:], k)
+    y_hat = ntt(_sample_vector(r, eta1, 0, k))
+    e1 = _sample_vector(r, eta2, k, k)
+    e2 = sample_poly_cbd(_prf(eta2, r, 2 * k), eta2)
+    u = (ntt_inverse(_matrix_vector_ntt(np.swapaxes(a_hat, -3, -2), y_hat)) + e1) % Q
+    mu = decompress(byte_decode(np.frombuffer(m, dtype=np.uint8), 1), 1)
+    v = (ntt_inverse(_dot_ntt(t_hat, y_hat)) + e2 + mu) % Q
+    return byte_encode(compress(u, du), du).tobytes() + byte_encode(compress(v, dv), dv).tobytes()
+
+
+def _pke_decrypt(dk, c, params, s_hat=None):
+    k, _, _, du, dv = params
+    split = 32 * du * k
+    u = decompress(byte_decode(np.frombuffer(c[:split], dtype=np.uint8).reshape(k, 32 * du), du), du)
+    v = decompress(byte_decode(np.frombuffer(c[split:], dtype=np.uint8), dv), dv)
+    if s_hat is None:
+        s_hat = byte_decode(np.frombuffer(dk, dtype=np.uint8).reshape(k, 384), 12)
+    w = (v - ntt_inverse(_dot_ntt(s_hat, ntt(u)))) % Q
+    return byte_encode(compress(w, 1), 1).tobytes()
+
+
+# ML-KEM (FIPS 203, section 6 and 7)
+
+def _params(parameter_set):
+    try:
+        return PARAMETER_SETS[parameter_set]
+    except KeyError:
+        raise ValueError(f"Unknown ML-KEM parameter set: {parameter_set}")
+
+
+def key_sizes(parameter_set):
+    """
+    Returns the encapsulation key, decapsulation key and ciphertext sizes.
+
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :return: Tuple of (ek_size, dk_size, ciphertext_size) in bytes.
+    """
+    k, _, _, du, dv = _params(parameter_set)
+    return 384 * k + 32, 768 * k + 96, 32 * (du * k + dv)
+
+
+def keygen_internal(parameter_set, d, z):
+    """
+    Deterministic key generation (ML-KEM.KeyGen_internal).
+
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :param d: 32-byte seed.
+    :param z: 32-byte implicit-rejection seed.
+    :return: Tuple of (encapsulation_key, decapsulation_key) as bytes.
+    """
+    ek, dk_pke = _pke_keygen(d, _params(parameter_set))
+    return ek, dk_pke + ek + _h(ek) + z
+
+
+def encaps_internal(parameter_set, ek, m):
+    """
+    Deterministic encapsulation (ML-KEM.Encaps_internal).
+
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :param ek: Encapsulation key (bytes).
+    :param m: 32-byte message seed.
+    :return: Tuple of (shared_secret, ciphertext).
+    """
+    shared_secret, r = _g(m + _h(ek))
+    return shared_secret, _pke_encrypt(ek, m, r, _params(parameter_set))
+
+
+def decaps_internal(parameter_set, dk, c):
+    """
+    Decapsulation with implicit rejection (ML-KEM.Decaps_internal).
+
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :param dk: Decapsulation key (bytes).
+    :param c: Ciphertext (bytes).
+    :return: 32-byte shared secret.
+    """
+    return MLKEMPrivateKey(parameter_set, dk).decapsulate(c)
+
+
+class MLKEMPublicKey:
+    """
+    An ML-KEM encapsulation key. The decoded vector t and the expanded
+    matrix A are computed on first use and kept with the key object, so
+    a cached key pays for them once.
+    """
+
+    def __init__(self, parameter_set, data):
+        self.parameter_set = parameter_set
+        self.params = _params(parameter_set)
+        k = self.params[0]
+        if len(data) != key_sizes(parameter_set)[0]:
+            raise ValueError(f"Invalid {parameter_set} encapsulation key length.")
+        t_hat = byte_decode(np.frombuffer(data[:384 * k], dtype=np.uint8).reshape(k, 384), 12)
+        # Modulus check (FIPS 203, section 7.2)
+        if byte_encode(t_hat, 12).tobytes() != data[:384 * k]:
+            raise ValueError(f"Invalid {parameter_set} encapsulation key encoding.")
+        self._data = bytes(data)
+        self._t_hat = t_hat
+        self._a_hat = None
+        self._hash = _h(self._data)
+
+    @classmethod
+    def _from_arrays(cls, parameter_set, data, t_hat, a_hat):
+        """
+        Builds a key from already decoded arrays, skipping the encoding checks.
+        """
+        key = cls.__new__(cls)
+        key.parameter_set = parameter_set
+        key.params = _params(parameter_set)
+        key._data = data
+        key._t_hat = t_hat
+        key._a_hat = a_hat
+        key._hash = _h(data)
+        return key
+
+    def _matrix(self):
+        if self._a_hat is None:
+            self._a_hat = expand_matrix(self._data[384 * self.params[0]:], self.params[0])
+        return self._a_hat
+
+    def public_bytes(self):
+        """
+        :return: The encapsulation key bytes.
+        """
+        return self._data
+
+    def encapsulate(self, m=None):
+        """
+        Generates a shared secret and its ciphertext for this key.
+
+        :param m: Optional 32-byte message seed (default: random).
+        :return: Tuple of (shared_secret, ciphertext).
+        """
+        if m is None:
+            m = os.urandom(SEED_SIZE)
+        shared_secret, r = _g(m + self._hash)
+        c = _pke_encrypt(self._data, m, r, self.params, self._matrix(), self._t_hat)
+        return shared_secret, c
+
+
+class MLKEMPrivateKey:
+    """
+    An ML-KEM decapsulation key.
+    """
+
+    def __init__(self, parameter_set, data):
+        self.parameter_set = parameter_set
+        self.params = _params(parameter_set)
+        k = self.params[0]
+        if len(data) != key_sizes(parameter_set)[1]:
+            raise ValueError(f"Invalid {parameter_set} decapsulation key length.")
+        # Hash check (FIPS 203, section 7.3)
+        if _h(data[384 * k:768 * k + 32]) != data[768 * k + 32:768 * k + 64]:
+            raise ValueError(f"Invalid {parameter_set} decapsulation key.")
+        self._data = bytes(data)
+        self._public_key = MLKEMPublicKey(parameter_set, data[384 * k:768 * k + 32])
+        self._s_hat = byte_decode(np.frombuffer(data[:384 * k], dtype=np.uint8).reshape(k, 384), 12)
+
+    @classmethod
+    def _from_arrays(cls, parameter_set, data, s_hat, public_key):
+        """
+        Builds a key from already decoded arrays, skipping the hash check.
+        """
+        key = cls.__new__(cls)
+        key.parameter_set = parameter_set
+        key.params = _params(parameter_set)
+        key._data = data
+        key._s_hat = s_hat
+        key._public_key = public_key
+        return key
+
+    @property
+    def ciphertext_size(self):
+        return key_sizes(self.parameter_set)[2]
+
+    def private_bytes(self):
+        """
+        :return: The decapsulation key bytes.
+        """
+        return self._data
+
+    def public_key(self):
+        """
+        :return: The matching MLKEMPublicKey.
+        """
+        return self._public_key
+
+    def decapsulate(self, c):
+        """
+        Recovers the shared secret from a ciphertext. Invalid ciphertexts
+        yield a pseudorandom secret (implicit rejection) instead of an error.
+
+        :param c: Ciphertext (bytes).
+        :return: 32-byte shared secret.
+        """
+        k = self.params[0]
+        if len(c) != key_sizes(self.parameter_set)[2]:
+            raise ValueError(f"Invalid {self.parameter_set} ciphertext length.")
+        h = self._data[768 * k + 32:768 * k + 64]
+        z = self._data[768 * k + 64:]
+        m = _pke_decrypt(None, c, self.params, self._s_hat)
+        shared_secret, r = _g(m + h)
+        rejected = _j(z + c)
+        public_key = self._public_key
+        c_check = _pke_encrypt(public_key._data, m, r, self.params,
+                               public_key._matrix(), public_key._t_hat)
+        return shared_secret if hmac.compare_digest(c, c_check) else rejected
+
+
+def generate_keypair(parameter_set="ML-KEM-768"):
+    """
+    Generates a fresh ML-KEM key pair (ML-KEM.KeyGen).
+
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :return: MLKEMPrivateKey; its public key is available via public_key().
+    """
+    _, dk = keygen_internal(parameter_set, os.urandom(SEED_SIZE), os.urandom(SEED_SIZE))
+    return MLKEMPrivateKey(parameter_set, dk)
+
+
+# Batched operations
+
+def _pke_encrypt_batch(messages, seeds, params, a_hat, t_hat):
+    """
+    K-PKE.Encrypt for a batch, with A and t stacked along a leading axis.
+    """
+    k, eta1, eta2, du, dv = params
+    count = len(messages)
+    y = sample_poly_cbd_batch([_prf(eta1, r, n) for r in seeds for n in range(k)], eta1)
+    errors = sample_poly_cbd_batch([_prf(eta2, r, n) for r in seeds for n in range(k, 2 * k + 1)], eta2)
+    y_hat = ntt(y.reshape(count, k, N))
+    errors = errors.reshape(count, k + 1, N)
+    u = (ntt_inverse(_matrix_vector_ntt(np.swapaxes(a_hat, -3, -2), y_hat)) + errors[:, :k]) % Q
+    m = np.frombuffer(b"".join(messages), dtype=np.uint8).reshape(count, 32)
+    mu = decompress(byte_decode(m, 1), 1)
+    v = (ntt_inverse(_dot_ntt(t_hat, y_hat)) + errors[:, k] + mu) % Q
+    c1 = byte_encode(compress(u, du), du).reshape(count, -1)
+    c2 = byte_encode(compress(v, dv), dv)
+    return [c1[b].tobytes() + c2[b].tobytes() for b in range(count)]
+
+
+def _expand_matrices(public_keys):
+    """
+    Expands the matrix A of every key that does not have it yet, in one batch.
+    """
+    pending = [key for key in public_keys if key._a_hat is None]
+    if not pending:
+        return
+    k = pending[0].params[0]
+    seeds = [key._data[384 * k:] + bytes([j, i]) for key in pending
+             for i in range(k) for j in range(k)]
+    matrices = sample_ntt_batch(seeds).reshape(len(pending), k, k, N)
+    for key, matrix in zip(pending, matrices):
+        key._a_hat = matrix
+
+
+def keygen_batch(parameter_set, ds, zs):
+    """
+    Deterministic batched key generation. Row b of every intermediate
+    array belongs to key b, so the results equal `keygen_internal` run
+    on each (d, z) pair.
+
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :param ds: Sequence of 32-byte seeds.
+    :param zs: Sequence of 32-byte implicit-rejection seeds.
+    :return: List of MLKEMPrivateKey.
+    """
+    params = _params(parameter_set)
+    k, eta1 = params[0], params[1]
+    count = len(ds)
+    if count == 0:
+        return []
+    seeds = [_g(d + bytes([k])) for d in ds]
+    a_hat = sample_ntt_batch([rho + bytes([j, i]) for rho, _ in seeds
+                              for i in range(k) for j in range(k)]).reshape(count, k, k, N)
+    noise = sample_poly_cbd_batch([_prf(eta1, sigma, n) for _, sigma in seeds
+                                   for n in range(2 * k)], eta1).reshape(count, 2 * k, N)
+    noise_hat = ntt(noise)
+    s_hat, e_hat = noise_hat[:, :k], noise_hat[:, k:]
+    t_hat = (_matrix_vector_ntt(a_hat, s_hat) + e_hat) % Q
+    t_bytes = byte_encode(t_hat, 12).reshape(count, -1)
+    s_bytes = byte_encode(s_hat, 12).reshape(count, -1)
+
+    keys = []
+    for b in range(count):
+        ek = t_bytes[b].tobytes() + seeds[b][0]
+        public_key = MLKEMPublicKey._from_arrays(parameter_set, ek, t_hat[b], a_hat[b])
+        dk = s_bytes[b].tobytes() + ek + public_key._hash + zs[b]
+        keys.append(MLKEMPrivateKey._from_arrays(parameter_set, dk, s_hat[b], public_key))
+    return keys
+
+
+def generate_keypairs(count, parameter_set="ML-KEM-768"):
+    """
+    Generates `count` fresh ML-KEM key pairs as one batch.
+
+    :param count: Number of key pairs.
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :return: List of MLKEMPrivateKey.
+    """
+    return keygen_batch(parameter_set,
+                        [os.urandom(SEED_SIZE) for _ in range(count)],
+                        [os.urandom(SEED_SIZE) for _ in range(count)])
+
+
+def encapsulate_batch(public_keys, messages=None):
+    """
+    Encapsulates once to each public key in `public_keys` as one batch.
+    The same key may appear many times to produce many encapsulations
+    for one recipient.
+
+    :param public_keys: Sequence of MLKEMPublicKey sharing one parameter set.
+    :param messages: Optional sequence of 32-byte message seeds (default: random).
+    :return: List of (shared_secret, ciphertext) tuples in input order.
+    """
+    public_keys = list(public_keys)
+    if not public_keys:
+        return []
+    parameter_set = public_keys[0].parameter_set
+    if any(key.parameter_set != parameter_set for key in public_keys):
+        raise ValueError("All keys in a batch must use the same parameter set.")
+    if messages is None:
+        messages = [os.urandom(SEED_SIZE) for _ in public_keys]
+    elif len(messages) != len(public_keys):
+        raise ValueError("Expected one message seed per public key.")
+
+    _expand_matrices(public_keys)
+    derived = [_g(m + key._hash) for m, key in zip(messages, public_keys)]
+    a_hat = np.stack([key._a_hat for key in public_keys])
+    t_hat = np.stack([key._t_hat for key in public_keys])
+    ciphertexts = _pke_encrypt_batch(messages, [r for _, r in derived],
+                                     _params(parameter_set), a_hat, t_hat)
+    return [(shared_secret, c) for (shared_secret, _), c in zip(derived, ciphertexts)]
+
+
+# Expanded serialization: key bytes followed by the NTT-domain arrays as
+# little-endian 16-bit coefficients (all below Q)
+
+def _pack_arrays(*arrays):
+    return b"".join(np.asarray(array, dtype="<u2").tobytes() for array in arrays)
+
+
+def _unpack_arrays(data, offset, shapes):
+    arrays = []
+    for shape in shapes:
+        count = int(np.prod(shape))
+        arrays.append(np.frombuffer(data, dtype="<u2", count=count, offset=offset)
+                      .astype(np.int64).reshape(shape))
+        offset += 2 * count
+    if offset != len(data):
+        raise ValueError("Invalid expanded ML-KEM key length.")
+    return arrays
+
+
+def expanded_private_bytes(private_key):
+    """
+    :param private_key: MLKEMPrivateKey.
+    :return: Decapsulation key bytes followed by s, t and the matrix A (NTT domain).
+    """
+    public_key = private_key._public_key
+    return private_key._data + _pack_arrays(private_key._s_hat, public_key._t_hat, public_key._matrix())
+
+
+def load_expanded_private_key(parameter_set, data):
+    """
+    Loads a key written by expanded_private_bytes without re-deriving its
+    arrays; the data must come from a trusted source.
+
+    :return: MLKEMPrivateKey.
+    """
+    k = _params(parameter_set)[0]
+    dk_size = key_sizes(parameter_set)[1]
+    s_hat, t_hat, a_hat = _unpack_arrays(data, dk_size, [(k, N), (k, N), (k, k, N)])
+    dk = bytes(data[:dk_size])
+    public_key = MLKEMPublicKey._from_arrays(parameter_set, dk[384 * k:768 * k + 32], t_hat, a_hat)
+    return MLKEMPrivateKey._from_arrays(parameter_set, dk, s_hat, public_key)
+
+
+# PEM-style serialization
+
+def _armor(label, data):
+    body = base64.encodebytes(data).decode().replace("\n", "")
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    return ("-----BEGIN " + label + "-----\n" + "\n".join(lines)
+            + "\n-----END " + label + "-----\n").encode()
+
+
+def _unarmor(data, kind):
+    text = data.decode("ascii").strip()
+    lines = text.splitlines()
+    begin, end = lines[0], lines[-1]
+    if not begin.startswith("-----BEGIN ") or not begin.endswith(" " + kind + " KEY-----"):
+        raise ValueError(f"Not an ML-KEM {kind.lower()} key.")
+    parameter_set = begin[len("-----BEGIN "):-len(" " + kind + " KEY-----")]
+    _params(parameter_set)
+    if end != "-----END " + parameter_set + " " + kind + " KEY-----":
+        raise ValueError("Malformed ML-KEM key armor.")
+    return parameter_set, base64.b64decode("".join(lines[1:-1]))
+
+
+def private_key_to_pem(private_key):
+    """
+    :param private_key: MLKEMPrivateKey.
+    :return: PEM-style armored decapsulation key (bytes).
+    """
+    return _armor(private_key.parameter_set + " PRIVATE KEY", private_key.private_bytes())
+
+
+def public_key_to_pem(public_key):
+    """
+    :param public_key: MLKEMPublicKey.
+    :return: PEM-style armored encapsulation key (bytes).
+    """
+    return _armor(public_key.parameter_set + " PUBLIC KEY", public_key.public_bytes())
+
+
+def load_pem_private_key(data):
+    """
+    :param data: PEM-style armored decapsulation key (bytes).
+    :return: MLKEMPrivateKey.
+    """
+    parameter_set, raw = _unarmor(data, "PRIVATE")
+    return MLKEMPrivateKey(parameter_set, raw)
+
+
+def load_pem_public_key(data):
+    """
+    :param data: PEM-style armored encapsulation key (bytes).
+    :return: MLKEMPublicKey.
+    """
+    parameter_set, raw = _unarmor(data, "PUBLIC")
+    return MLKEMPublicKey(parameter_set, raw)
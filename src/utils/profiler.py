@@ -4,14 +4,29 @@ Profiler Module - Performance Analysis
 This module provides functions for profiling the performance of encryption,
 decryption, and other cryptographic operations. It can be used to measure
 execution time, memory usage, and analyze the overall performance of the system.
+
+`profile_operation` runs an operation once and records wall and CPU time,
+the tracemalloc peak and top allocation sites, and optionally cProfile
+statistics and sampled call stacks in the collapsed format read by
+flamegraph tools.
 """
 
 import time
 import psutil
 import os
+import sys
+import io
+import cProfile
+import pstats
+import threading
+import tracemalloc
+import multiprocessing
+import tempfile
+from collections import Counter
 from memory_profiler import memory_usage
-from utils.encrypt import encrypt_data, encrypt_string
-from utils.decrypt import decrypt_data, decrypt_string
+from .encrypt import encrypt_data, encrypt_string
+from .decrypt import decrypt_data, decrypt_string
+from . import mlkem
 
 
 def measure_time(func, *args, **kwargs):
@@ -48,6 +63,159 @@ def profile_memory(func, *args, **kwargs):
     return max_mem_usage
 
 
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the call stack of one thread at a fixed interval, keeping only
+    the frames below `root_code` (the profiler's own frame).
+    """
+
+    def __init__(self, thread_id, root_code, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root_code = root_code
+        self.interval = interval
+        self.stacks = Counter()
+        self.sampling = True
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and frame.f_code is not self.root_code:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            # Drop samples that may have been taken after the operation returned
+            if labels and frame is not None and self.sampling:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        self.sampling = False
+        self._stop_event.set()
+        self.join()
+
+
+def _traced_snapshot():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+
+def profile_operation(func, *args, trace_memory=True, cprofile=False, sample_stacks=False,
+                      sample_interval=0.005, top=10, **kwargs):
+    """
+    Runs an operation once and profiles that single run: wall and CPU time,
+    peak traced memory and the allocation sites still holding memory when
+    it returns, and optionally cProfile statistics and sampled call stacks.
+    Every enabled collector adds some overhead to the measured times; CPU
+    time covers this process only, not worker processes. If the caller is
+    already tracing allocations, its trace is left running and its peak is
+    not reset: a run that stays below that earlier peak reports the memory
+    it still holds instead, and allocation sites are reported as growth.
+
+    :param func: The function to be profiled.
+    :param args: Arguments to be passed to the function.
+    :param trace_memory: Trace allocations with tracemalloc (default: True).
+    :param cprofile: Collect cProfile statistics (default: False).
+    :param sample_stacks: Sample the call stack every `sample_interval` seconds.
+    :param sample_interval: Stack sampling interval in seconds.
+    :param top: Number of allocation sites and cProfile functions to report.
+    :param kwargs: Keyword arguments to be passed to the function.
+    :return: Dictionary with "wall_ns", "cpu_ns", "peak_bytes", "allocations"
+        (list of (site, bytes, count)), "stats" (pstats.Stats or None),
+        "stacks" (Counter of collapsed stacks) and "result".
+    """
+
+    profiler = cProfile.Profile() if cprofile else None
+    sampler = None
+    if sample_stacks:
+        sampler = _StackSampler(threading.get_ident(), sys._getframe().f_code, sample_interval)
+        sampler.start()
+    # A caller that is already tracing keeps its trace and its peak
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        baseline = None if started_tracing else _traced_snapshot()
+        traced_before, peak_before = tracemalloc.get_traced_memory()
+    if profiler:
+        profiler.enable()
+    wall_start, cpu_start = time.perf_counter_ns(), time.process_time_ns()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        wall_ns, cpu_ns = time.perf_counter_ns() - wall_start, time.process_time_ns() - cpu_start
+        if sampler:
+            sampler.stop()
+        if profiler:
+            profiler.disable()
+        peak_bytes, allocations = 0, []
+        if trace_memory:
+            traced, peak = tracemalloc.get_traced_memory()
+            # Below the caller's earlier peak the run's own peak is not visible
+            peak_bytes = peak - traced_before if peak > peak_before else max(0, traced - traced_before)
+            snapshot = _traced_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+                allocations = [(str(stat.traceback), stat.size, stat.count)
+                               for stat in snapshot.statistics("lineno")[:top]]
+            else:
+                allocations = [(str(stat.traceback), stat.size_diff, stat.count_diff)
+                               for stat in snapshot.compare_to(baseline, "lineno")[:top]]
+
+    stats = pstats.Stats(profiler, stream=io.StringIO()) if profiler else None
+    return {
+        "wall_ns": wall_ns,
+        "cpu_ns": cpu_ns,
+        "peak_bytes": peak_bytes,
+        "allocations": allocations,
+        "stats": stats,
+        "stacks": sampler.stacks if sampler else Counter(),
+        "result": result,
+    }
+
+
+def write_collapsed_stacks(stacks, path):
+    """
+    Writes sampled stacks in the collapsed format ("frame;frame;frame count"
+    per line) read by flamegraph.pl, speedscope and similar tools.
+
+    :param stacks: Counter mapping collapsed stacks to sample counts.
+    :param path: Output file path.
+    """
+    with open(path, "w") as file:
+        for stack, count in sorted(stacks.items()):
+            file.write(f"{stack} {count}\n")
+
+
+def print_profile_report(report, top=10):
+    """
+    Prints the summary of a profile_operation report.
+
+    :param report: Dictionary returned by profile_operation.
+    :param top: Number of cProfile functions to print.
+    """
+    wall_s, cpu_s = report["wall_ns"] / 1e9, report["cpu_ns"] / 1e9
+    print(f"[INFO] Wall time: {wall_s:.4f} s, CPU time: {cpu_s:.4f} s "
+          f"({cpu_s / wall_s if wall_s else 0.0:.0%} of wall).")
+    if report["allocations"]:
+        print(f"[INFO] Peak traced memory: {report['peak_bytes'] / 1024 ** 2:.2f} MB. Top allocation sites:")
+        for site, size, count in report["allocations"]:
+            print(f"[INFO]   {size / 1024:10.1f} KiB in {count:6d} blocks  {site}")
+    if report["stats"] is not None:
+        output = io.StringIO()
+        report["stats"].stream = output
+        report["stats"].sort_stats("cumulative").print_stats(top)
+        print(output.getvalue().rstrip())
+    if report["stacks"]:
+        print(f"[INFO] {sum(report['stacks'].values())} stack samples collected.")
+
+
 def test_encryption_performance(input_file, output_file, public_key_path):
     """
     Profiles the encryption operation's time and memory usage on a file.
@@ -134,6 +302,137 @@ def test_string_decryption_performance(encrypted_data, private_key_path):
     assert mem_usage < 30, f"Memory usage is too high: {mem_usage:.2f} MB"
 
 
+def benchmark_kem(parameter_set="ML-KEM-768", iterations=200):
+    """
+    Measures ML-KEM key generation, encapsulation and decapsulation throughput.
+    
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :param iterations: Number of operations timed for each step.
+    :return: Dictionary of operations per second for keygen, encaps and decaps.
+    """
+    
+    private_key = mlkem.generate_keypair(parameter_set)
+    public_key = private_key.public_key()
+    _, ciphertext = public_key.encapsulate()
+    
+    operations = {
+        "keygen": lambda: mlkem.generate_keypair(parameter_set),
+        "encaps": public_key.encapsulate,
+        "decaps": lambda: private_key.decapsulate(ciphertext),
+    }
+    
+    results = {}
+    for name, operation in operations.items():
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        elapsed_time = time.perf_counter() - start_time
+        results[name] = iterations / elapsed_time
+        print(f"[INFO] {parameter_set} {name}: {results[name]:.1f} ops/s")
+    
+    return results
+
+
+def benchmark_kem_batch(parameter_set="ML-KEM-768", count=1000):
+    """
+    Compares batched ML-KEM key generation and encapsulation with the
+    one-at-a-time path.
+    
+    :param parameter_set: "ML-KEM-512", "ML-KEM-768" or "ML-KEM-1024".
+    :param count: Number of keys / encapsulations per measurement.
+    :return: Dictionary of keys (or encapsulations) per second for each path.
+    """
+    
+    public_key = mlkem.generate_keypair(parameter_set).public_key()
+    
+    operations = {
+        "keygen_single": lambda: [mlkem.generate_keypair(parameter_set) for _ in range(count)],
+        "keygen_batch": lambda: mlkem.generate_keypairs(count, parameter_set),
+        "encaps_single": lambda: [public_key.encapsulate() for _ in range(count)],
+        "encaps_batch": lambda: mlkem.encapsulate_batch([public_key] * count),
+    }
+    
+    results = {}
+    for name, operation in operations.items():
+        start_time = time.perf_counter()
+        operation()
+        elapsed_time = time.perf_counter() - start_time
+        results[name] = count / elapsed_time
+        print(f"[INFO] {parameter_set} {name}: {results[name]:.1f} per second")
+    
+    return results
+
+
+def _peak_rss_child(func, args, queue):
+    """
+    Runs `func` in a child process and reports the growth of its peak RSS (MB).
+    """
+    baseline = psutil.Process().memory_info().rss
+    func(*args)
+    import resource  # Unix only, so imported where it is needed
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    queue.put(max(0, peak - baseline) / (1024 ** 2))
+
+
+def _measure_peak_rss(func, *args):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_peak_rss_child, args=(func, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def profile_memory_scaling(public_key_path, private_key_path, sizes_mb=(16, 64, 256)):
+    """
+    Measures how peak memory of file encryption and decryption changes with
+    the input size. Each operation runs in a fresh child process and the
+    growth of its peak RSS over the starting RSS is reported, so the results
+    show whether memory use depends on the file size. Unix only.
+    
+    :param public_key_path: Path to the public key (PEM format).
+    :param private_key_path: Path to the private key (PEM format).
+    :param sizes_mb: Input sizes to measure, in megabytes.
+    :return: Dictionary mapping size (MB) to peak RSS growth (MB) for encrypt and decrypt.
+    """
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        input_file = os.path.join(directory, "input.bin")
+        encrypted_file = os.path.join(directory, "input.enc")
+        decrypted_file = os.path.join(directory, "output.bin")
+        for size_mb in sizes_mb:
+            with open(input_file, "wb") as file:
+                for _ in range(size_mb):
+                    file.write(os.urandom(1024 ** 2))
+            
+            encrypt_mb = _measure_peak_rss(encrypt_data, input_file, encrypted_file, public_key_path)
+            decrypt_mb = _measure_peak_rss(decrypt_data, encrypted_file, decrypted_file, private_key_path)
+            results[size_mb] = {"encrypt": encrypt_mb, "decrypt": decrypt_mb}
+            print(f"[INFO] {size_mb} MB file: peak RSS growth {encrypt_mb:.1f} MB (encrypt), "
+                  f"{decrypt_mb:.1f} MB (decrypt)")
+    
+    return results
+
+
+def profile_performance(input_file, public_key_path, private_key_path):
+    """
+    Profiles a full file round trip: system information, then the time and
+    memory usage of encrypting and decrypting the input file.
+    
+    :param input_file: Path to the input file to be encrypted.
+    :param public_key_path: Path to the public key (PEM format).
+    :param private_key_path: Path to the private key (PEM format).
+    """
+    
+    encrypted_file = input_file + ".enc"
+    decrypted_file = input_file + ".dec"
+    get_system_info()
+    test_encryption_performance(input_file, encrypted_file, public_key_path)
+    test_decryption_performance(encrypted_file, decrypted_file, private_key_path)
+
+
 def get_system_info():
     """
     Get system information such as CPU and memory usage.
@@ -161,3 +460,7 @@ if __name__ == "__main__":
     # Example usage for string encryption performance
     test_string_encryption_performance("This is a test message.", "public_key.pem")
     test_string_decryption_performance(b"encrypted_test_data", "private_key.pem")
+    # Example usage for ML-KEM throughput
+    for parameter_set in mlkem.PARAMETER_SETS:
+        benchmark_kem(parameter_set)
+        benchmark_kem_batch(parameter_set)
@@ -0,0 +1,105 @@
+"""
+Protocol Module - Daemon Wire Format
+This module defines the length-prefixed binary protocol spoken between the
+crypto daemon and its clients over a Unix domain socket. Every message is
+one frame:
+
+    length (4 bytes) | request id (4) | code (1) | field count (2) | fields
+
+where each field is a 4-byte length followed by its bytes, and all integers
+are big-endian. In requests the code is an opcode; in responses it is a
+status. Responses carry the id of their request, so a client may pipeline
+many requests on one connection and match the responses as they arrive,
+in any order.
+"""
+
+import struct
+
+# Request opcodes
+OP_PING = 0
+OP_ENCRYPT = 1        # key path, plaintext -> ciphertext
+OP_DECRYPT = 2        # key path, ciphertext -> plaintext
+OP_KEYGEN = 3         # algorithm -> private PEM, public PEM
+OP_ENCRYPT_FILE = 4   # input path, output path, key path -> (nothing)
+OP_DECRYPT_FILE = 5   # input path, output path, key path -> (nothing)
+
+# Response statuses
+STATUS_OK = 0
+STATUS_ERROR = 1      # fields: error message
+
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+DEFAULT_SOCKET_PATH = "pqc.sock"
+
+_LENGTH = struct.Struct(">I")
+_HEADER = struct.Struct(">IBH")
+
+
+class ProtocolError(Exception):
+    """
+    Raised when a peer sends a malformed or oversized frame.
+    """
+
+
+class DaemonError(Exception):
+    """
+    Raised by the client when the daemon reports that a request failed.
+    """
+
+
+def encode_frame(request_id, code, fields=()):
+    """
+    Encodes one frame.
+
+    :param request_id: Request id (0 to 2**32 - 1).
+    :param code: Opcode (requests) or status (responses).
+    :param fields: Sequence of bytes-like fields.
+    :return: The encoded frame (bytes).
+    """
+    parts = [b"", _HEADER.pack(request_id, code, len(fields))]
+    size = _HEADER.size
+    for field in fields:
+        parts.append(_LENGTH.pack(len(field)))
+        parts.append(field)
+        size += _LENGTH.size + len(field)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit.")
+    parts[0] = _LENGTH.pack(size)
+    return b"".join(parts)
+
+
+def decode_length(prefix):
+    """
+    Decodes and checks the 4-byte length prefix of a frame.
+
+    :param prefix: The first 4 bytes of a frame.
+    :return: Length of the rest of the frame.
+    """
+    (size,) = _LENGTH.unpack(prefix)
+    if size < _HEADER.size or size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Invalid frame length: {size}.")
+    return size
+
+
+def decode_body(body):
+    """
+    Decodes a frame without its length prefix.
+
+    :param body: Frame contents after the length prefix (bytes).
+    :return: Tuple of (request id, code, list of fields as bytes).
+    """
+    request_id, code, count = _HEADER.unpack_from(body)
+    view = memoryview(body)
+    offset = _HEADER.size
+    fields = []
+    for _ in range(count):
+        if offset + _LENGTH.size > len(body):
+            raise ProtocolError("Truncated field length.")
+        (size,) = _LENGTH.unpack_from(body, offset)
+        offset += _LENGTH.size
+        if offset + size > len(body):
+            raise ProtocolError("Truncated field.")
+        fields.append(bytes(view[offset:offset + size]))
+        offset += size
+    if offset != len(body):
+        raise ProtocolError("Trailing bytes after the last field.")
+    return request_id, code, fields
@@ -0,0 +1,184 @@
+"""
+Rotate Module - Key Rotation by Re-Wrapping Data Keys
+This module moves hybrid-encrypted files from an old key pair to a new
+one without touching their payload. For each file, only the wrapped data
+key is unwrapped with the old private key and wrapped again for the new
+public key; the recipient entry of the old key is replaced in the header
+and every other recipient is kept. Chunk nonces and the index do not
+depend on the header, so the ciphertext stays valid as it is.
+
+When the new header has the size of the old one (a new key of the same
+algorithm and size) it is rewritten in place, with a redo journal
+(JOURNAL_SUFFIX) that the next rotation of the file applies if the
+rewrite was interrupted. Otherwise the payload has to move: the file is
+copied to a temporary file with the new header (ciphertext copied as is,
+nothing is decrypted) that atomically replaces it.
+
+A file whose header already lists the new key and not the old one is
+left alone, so rotating a tree again after an interruption only redoes
+the missing files; rotate_tree additionally records finished files in a
+manifest and skips them without opening them.
+"""
+
+import functools
+import os
+from .bulk import collect_inputs, process_files, report_progress
+from .constants import (ROTATE_MANIFEST_NAME as MANIFEST_NAME, ROTATE_JOURNAL_SUFFIX as JOURNAL_SUFFIX,
+                        ROTATE_PARTIAL_SUFFIX as PARTIAL_SUFFIX)
+from .fileio import fsync_directory, read_journal, write_journal
+from .hybrid import (find_recipient, is_hybrid_file, pack_header, read_header, unwrap_header_key,
+                     wrap_for_recipients)
+from .incremental import recover_file
+from .keycache import key_algorithm, key_fingerprint, load_private_key, load_public_key
+from . import metrics
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _recover(path):
+    # Finish an interrupted in-place rewrite, or drop an unfinished copy
+    if os.path.exists(path + PARTIAL_SUFFIX):
+        os.remove(path + PARTIAL_SUFFIX)
+    journal_path = path + JOURNAL_SUFFIX
+    if not os.path.exists(journal_path):
+        return
+    journal = read_journal(journal_path)
+    if journal is not None and journal[1] == os.path.getsize(path):
+        with open(path, "r+b") as file:
+            for offset, data in journal[2]:
+                file.seek(offset)
+                file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+    os.remove(journal_path)
+    fsync_directory(journal_path)
+
+
+def rotate_file(path, old_private_key, new_public_key):
+    """
+    Re-wraps the data key of a hybrid-encrypted file for a new key,
+    replacing the old key's recipient entry.
+
+    :param path: Path to the encrypted file.
+    :param old_private_key: Private key the file is currently encrypted for.
+    :param new_public_key: Public key to encrypt the file for instead.
+    :return: "rotated" if the header was rewritten in place, "copied" if
+        the file had to be rewritten, or "unchanged" if it was already
+        encrypted for the new key only.
+    """
+    new_fingerprint = key_fingerprint(new_public_key)
+    if new_fingerprint == key_fingerprint(old_private_key):
+        raise ValueError("The new key is the old key.")
+    _recover(path)
+    # Roll back an interrupted incremental update first: its journal holds payload offsets
+    recover_file(path, old_private_key)
+    with open(path, "rb") as file:
+        header = read_header(file)
+    if find_recipient(header, new_public_key) is not None and find_recipient(header, old_private_key) is None:
+        return "unchanged"
+
+    data_key = unwrap_header_key(header, old_private_key)
+    replacement = wrap_for_recipients(new_public_key, data_key)[0]
+    old_fingerprint = key_fingerprint(old_private_key)
+    recipients = [replacement if recipient.fingerprint == old_fingerprint else recipient
+                  for recipient in header.recipients if recipient.fingerprint != new_fingerprint]
+    new_header = pack_header(header.chunk_size, recipients, header.nonce_prefix)
+
+    if len(new_header) == header.size:
+        # Same size: rewrite the header in place behind a redo journal
+        journal_path = path + JOURNAL_SUFFIX
+        write_journal(journal_path, 0, os.path.getsize(path), [(0, new_header)])
+        with open(path, "r+b") as file:
+            file.write(new_header)
+            file.flush()
+            os.fsync(file.fileno())
+        os.remove(journal_path)
+        fsync_directory(journal_path)
+        return "rotated"
+
+    # The payload moves: copy the ciphertext after the new header, then swap the files
+    partial = path + PARTIAL_SUFFIX
+    with open(path, "rb") as source, open(partial, "wb") as target:
+        target.write(new_header)
+        source.seek(header.size)
+        while True:
+            data = source.read(COPY_BUFFER_SIZE)
+            if not data:
+                break
+            target.write(data)
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(partial, path)
+    fsync_directory(path)
+    return "copied"
+
+
+def rotate_data(input_file, old_private_key_path, new_public_key_path):
+    """
+    Rotates one hybrid-encrypted file to a new key; see rotate_file.
+
+    :param input_file: Path to the encrypted file (rewritten in place).
+    :param old_private_key_path: Path to the private key the file is encrypted for.
+    :param new_public_key_path: Path to the new public key.
+    :return: "rotated", "copied" or "unchanged".
+    """
+
+    with metrics.track("rotate_data") as operation:
+        old_private_key = load_private_key(old_private_key_path)
+        new_public_key = load_public_key(new_public_key_path)
+        operation.algorithm = key_algorithm(new_public_key)
+        return rotate_file(input_file, old_private_key, new_public_key)
+
+
+def _init_worker(old_private_key_path, new_public_key_path):
+    # Parse the keys once; every file in this worker then hits the key cache
+    load_private_key(old_private_key_path)
+    load_public_key(new_public_key_path)
+
+
+def _rotate_one(root, relative_path, old_private_key_path, new_public_key_path):
+    path = os.path.join(root, relative_path)
+    entry = {"path": relative_path}
+    try:
+        if not is_hybrid_file(path):
+            entry.update(status="skipped", result="not encrypted")
+        else:
+            result = rotate_data(path, old_private_key_path, new_public_key_path)
+            entry.update(status="done" if result != "unchanged" else "skipped", result=result)
+    except Exception as e:
+        entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+    stat = os.stat(path) if os.path.exists(path) else None
+    entry.update(size=stat.st_size if stat else 0, mtime_ns=stat.st_mtime_ns if stat else None)
+    return entry
+
+
+def rotate_tree(input_path, old_private_key_path, new_public_key_path, workers=None, manifest_path=None,
+                progress=report_progress):
+    """
+    Rotates every hybrid-encrypted file selected by a path, directory or
+    glob pattern from an old key to a new one, in a process pool. Files
+    that are not hybrid-encrypted are skipped. Each worker parses the keys
+    once; per file, only the header is read and rewritten (see rotate_file).
+    Every finished file is appended to a manifest, and a run started again
+    with the same manifest skips the files that were already completed
+    (see bulk.process_files).
+
+    :param input_path: Encrypted file, directory (traversed recursively) or glob pattern.
+    :param old_private_key_path: Path to the private key the files are encrypted for.
+    :param new_public_key_path: Path to the new public key.
+    :param workers: Number of worker processes (default: CPU count).
+    :param manifest_path: Manifest file (default: MANIFEST_NAME in the input directory).
+    :param progress: Callable(summary, elapsed_seconds), called at most once
+        per PROGRESS_INTERVAL and once at the end (None to disable).
+    :return: Summary dictionary with the file counts, bytes and elapsed time;
+        "bytes" counts the encrypted data covered by the rotated files.
+    """
+    if os.path.isfile(input_path):
+        root, relative_paths = os.path.dirname(input_path) or ".", [os.path.basename(input_path)]
+    else:
+        root, relative_paths = collect_inputs(input_path)
+    manifest_path = manifest_path or os.path.join(root, MANIFEST_NAME)
+    rotate_one = functools.partial(_rotate_one, old_private_key_path=old_private_key_path,
+                                   new_public_key_path=new_public_key_path)
+    return process_files(root, relative_paths, rotate_one, manifest_path, workers, _init_worker,
+                         (old_private_key_path, new_public_key_path), progress, completed=("done", "skipped"))
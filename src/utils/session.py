@@ -0,0 +1,261 @@
+"""
+Session Module - Session-Based Message Encryption
+This module encrypts streams of small messages between two parties with
+one public-key operation per session instead of one per message. The
+initiator wraps a random session secret for the responder's public key
+(RSA-OAEP, or encapsulation for ML-KEM and X25519 + ML-KEM keys, as in
+the hybrid file format); both sides derive one AES-256-GCM key per
+direction from it with HKDF-SHA256. Messages
+then carry an epoch and a sequence number, which together form the
+AEAD nonce, so no nonce is ever reused and replayed or reordered
+messages are rejected.
+
+Keys are rotated automatically once a message, byte or time budget is
+spent: the sender moves to the next epoch by deriving its new key from
+the current one, and the receiver follows when it sees the new epoch.
+Old keys are discarded, so a later key compromise does not expose
+earlier epochs.
+
+Session setup message:
+    magic (4) | version (1) | algorithm id (1) | key fingerprint (32)
+    | session id (16) | wrapped secret length (2) | wrapped secret
+
+Session message:
+    epoch (4) | sequence number (8) | ciphertext and tag
+"""
+
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from .hybrid import wrap_data_key, unwrap_data_key, algorithm_id, ALGORITHM_NAMES, TAG_SIZE
+from .keycache import load_public_key, load_private_key, key_algorithm, key_fingerprint
+from . import metrics
+
+MAGIC = b"PQCS"
+VERSION = 1
+SECRET_SIZE = 32
+SESSION_ID_SIZE = 16
+# Epochs a receiver will skip forward in one step when messages were lost
+MAX_EPOCH_SKIP = 16
+
+_SETUP_FORMAT = ">4sBB32s16sH"
+_SETUP_SIZE = struct.calcsize(_SETUP_FORMAT)
+_MESSAGE_HEADER = struct.Struct(">IQ")
+_MAX_SEQUENCE = 2 ** 64 - 1
+_MAX_EPOCH = 2 ** 32 - 1
+
+_INITIATOR_INFO = b"pqc-session initiator"
+_RESPONDER_INFO = b"pqc-session responder"
+_REKEY_INFO = b"pqc-session rekey"
+
+
+class RekeyPolicy(namedtuple("RekeyPolicy", ["max_messages", "max_bytes", "max_seconds"],
+                             defaults=(2 ** 24, 2 ** 34, 3600.0))):
+    """
+    Budget after which a sending key is replaced. A limit of None disables
+    that check.
+    """
+
+    __slots__ = ()
+
+
+DEFAULT_POLICY = RekeyPolicy()
+
+
+def _derive(key_material, info, salt=None):
+    return HKDF(algorithm=hashes.SHA256(), length=SECRET_SIZE, salt=salt, info=info).derive(key_material)
+
+
+def _next_key(key, epoch):
+    return _derive(key, _REKEY_INFO + struct.pack(">I", epoch))
+
+
+class _SendState:
+    """
+    Key, epoch and counters of the sending direction.
+    """
+
+    def __init__(self, key, policy):
+        self.policy = policy
+        self._set_key(key, 0)
+
+    def _set_key(self, key, epoch):
+        self.key = key
+        self.aead = AESGCM(key)
+        self.epoch = epoch
+        self.sequence = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def due(self, size):
+        policy = self.policy
+        return ((policy.max_messages is not None and self.sequence >= policy.max_messages)
+                or (policy.max_bytes is not None and self.bytes + size > policy.max_bytes and self.sequence)
+                or (policy.max_seconds is not None and time.monotonic() - self.started >= policy.max_seconds)
+                or self.sequence == _MAX_SEQUENCE)
+
+    def rekey(self):
+        if self.epoch == _MAX_EPOCH:
+            raise ValueError("Session key epochs exhausted; start a new session.")
+        self._set_key(_next_key(self.key, self.epoch + 1), self.epoch + 1)
+
+
+class _ReceiveState:
+    """
+    Key, epoch and last accepted sequence number of the receiving direction.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.aead = AESGCM(key)
+        self.epoch = 0
+        self.last_sequence = -1
+
+
+class Session:
+    """
+    An established session. Each side encrypts with its own sending key
+    and decrypts with the peer's, so one Session object handles both
+    directions. Methods are thread-safe.
+    """
+
+    def __init__(self, session_id, secret, initiator, policy=None):
+        """
+        :param session_id: Session id from the setup message (bytes).
+        :param secret: Shared session secret (bytes).
+        :param initiator: True on the side that created the setup message.
+        :param policy: RekeyPolicy for the sending direction (default: DEFAULT_POLICY).
+        """
+        initiator_key = _derive(secret, _INITIATOR_INFO, session_id)
+        responder_key = _derive(secret, _RESPONDER_INFO, session_id)
+        send_key, receive_key = (initiator_key, responder_key) if initiator else (responder_key, initiator_key)
+        self.session_id = session_id
+        self._send = _SendState(send_key, policy or DEFAULT_POLICY)
+        self._receive = _ReceiveState(receive_key)
+        self._send_lock = threading.Lock()
+        self._receive_lock = threading.Lock()
+
+    @property
+    def send_epoch(self):
+        return self._send.epoch
+
+    @property
+    def receive_epoch(self):
+        return self._receive.epoch
+
+    def rekey(self):
+        """
+        Moves the sending direction to the next key now, regardless of the policy.
+        """
+        with self._send_lock:
+            self._send.rekey()
+
+    def encrypt(self, message):
+        """
+        Encrypts one message.
+
+        :param message: Plaintext (string or bytes).
+        :return: Session message (bytes).
+        """
+        if isinstance(message, str):
+            message = message.encode()
+        with self._send_lock:
+            state = self._send
+            if state.due(len(message)):
+                state.rekey()
+            header = _MESSAGE_HEADER.pack(state.epoch, state.sequence)
+            state.sequence += 1
+            state.bytes += len(message)
+            aead = state.aead
+        # The nonce is unique per key, so the AEAD call itself needs no lock
+        return header + aead.encrypt(header, message, self.session_id)
+
+    def decrypt(self, message):
+        """
+        Decrypts one message from the peer. Messages must arrive in the order
+        they were sent; gaps are allowed, replays and reordering are not.
+
+        :param message: Session message (bytes).
+        :return: Plaintext (bytes).
+        """
+        if len(message) < _MESSAGE_HEADER.size + TAG_SIZE:
+            raise ValueError("Truncated session message.")
+        header = bytes(message[:_MESSAGE_HEADER.size])
+        epoch, sequence = _MESSAGE_HEADER.unpack(header)
+        with self._receive_lock:
+            state = self._receive
+            if epoch < state.epoch or (epoch == state.epoch and sequence <= state.last_sequence):
+                raise ValueError("Replayed or out-of-order session message.")
+            if epoch - state.epoch > MAX_EPOCH_SKIP:
+                raise ValueError("Session message is too many epochs ahead.")
+            key, aead = state.key, state.aead
+            for next_epoch in range(state.epoch + 1, epoch + 1):
+                key = _next_key(key, next_epoch)
+            if epoch != state.epoch:
+                aead = AESGCM(key)
+            try:
+                plaintext = aead.decrypt(header, message[_MESSAGE_HEADER.size:], self.session_id)
+            except InvalidTag:
+                raise ValueError("Session message authentication failed.") from None
+            # Only move forward once the message has been authenticated
+            if epoch != state.epoch:
+                state.key, state.aead, state.epoch = key, aead, epoch
+            state.last_sequence = sequence
+        return plaintext
+
+
+def initiate_session(public_key_path, policy=None):
+    """
+    Starts a session with the holder of a private key. This is the only
+    public-key operation on the initiator's side.
+
+    :param public_key_path: Path to the peer's public key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+    :param policy: RekeyPolicy for messages sent by the initiator.
+    :return: Tuple of (Session, setup message bytes to send to the peer).
+    """
+    with metrics.track("session_initiate") as operation:
+        public_key = load_public_key(public_key_path)
+        operation.algorithm = key_algorithm(public_key)
+        secret = os.urandom(SECRET_SIZE)
+        session_id = os.urandom(SESSION_ID_SIZE)
+        wrapped_secret = wrap_data_key(public_key, secret)
+        setup = struct.pack(_SETUP_FORMAT, MAGIC, VERSION, algorithm_id(public_key),
+                            key_fingerprint(public_key), session_id, len(wrapped_secret)) + wrapped_secret
+    return Session(session_id, secret, True, policy), setup
+
+
+def accept_session(setup, private_key_path, policy=None):
+    """
+    Accepts a session from its setup message. This is the only
+    private-key operation on the responder's side.
+
+    :param setup: Setup message from initiate_session (bytes).
+    :param private_key_path: Path to the private key (RSA, ML-KEM or X25519 + ML-KEM;
+        PEM, DER or raw format) or a keystore reference.
+    :param policy: RekeyPolicy for messages sent by the responder.
+    :return: Session.
+    """
+    if len(setup) < _SETUP_SIZE:
+        raise ValueError("Truncated session setup message.")
+    magic, version, algorithm, fingerprint, session_id, wrapped_len = struct.unpack_from(_SETUP_FORMAT, setup)
+    if magic != MAGIC:
+        raise ValueError("Not a session setup message.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported session version: {version}")
+    if algorithm not in ALGORITHM_NAMES or len(setup) != _SETUP_SIZE + wrapped_len:
+        raise ValueError("Malformed session setup message.")
+
+    with metrics.track("session_accept") as operation:
+        private_key = load_private_key(private_key_path)
+        operation.algorithm = key_algorithm(private_key)
+        if key_fingerprint(private_key) != fingerprint:
+            raise ValueError("The session was not set up for this key.")
+        secret = unwrap_data_key(private_key, setup[_SETUP_SIZE:])
+    return Session(session_id, secret, False, policy)
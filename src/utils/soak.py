@@ -0,0 +1,225 @@
+"""
+Soak Module - Sustained-Load Testing
+This module drives encryption or decryption from many concurrent client
+threads for a fixed duration, either as fast as possible or at a target
+rate. Latencies are collected per time window and reported as
+percentiles next to the process RSS, CPU usage and the longest garbage
+collection pause of the window, so slow drifts (memory growth, falling
+throughput, GC or lock contention) show up over the run. In rate mode
+each request is timed from its scheduled start, so a stalled server is
+not hidden by clients that stop sending (coordinated omission).
+"""
+
+import gc
+import json
+import os
+import threading
+import time
+import psutil
+from .benchmark import percentile
+from .hybrid import encrypt_bytes, decrypt_bytes
+from .keycache import load_public_key, load_private_key
+
+DEFAULT_DURATION = 60.0
+DEFAULT_WINDOW = 5.0
+DEFAULT_CONCURRENCY = 4
+DEFAULT_PAYLOAD_SIZE = 1024
+# Failure thresholds: RSS growth between the first and last third of the
+# run, and relative throughput drop over the same span
+DEFAULT_MAX_RSS_GROWTH_MB = 50.0
+DEFAULT_MAX_THROUGHPUT_DROP = 0.20
+
+
+class _GCPauses:
+    """
+    Tracks the longest garbage collection pause through gc.callbacks.
+    """
+
+    def __init__(self):
+        self.longest_ns = 0
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter_ns()
+        elif self._start is not None:
+            self.longest_ns = max(self.longest_ns, time.perf_counter_ns() - self._start)
+            self._start = None
+
+    def take(self):
+        longest, self.longest_ns = self.longest_ns, 0
+        return longest
+
+
+def _make_operation(target, key_path, payload_size):
+    payload = os.urandom(payload_size)
+    if target == "encrypt":
+        load_public_key(key_path)
+        return lambda: encrypt_bytes(payload, load_public_key(key_path))
+    if target == "decrypt":
+        ciphertext = encrypt_bytes(payload, load_private_key(key_path).public_key())
+        return lambda: decrypt_bytes(ciphertext, load_private_key(key_path))
+    raise ValueError(f"Unknown soak target: {target}.")
+
+
+def _summarize_window(index, latencies, errors, seconds, process, gc_pause_ns):
+    return {
+        "window": index,
+        "operations": len(latencies),
+        "errors": errors,
+        "ops_per_s": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 0.50) / 1e6 if latencies else 0.0,
+        "p95_ms": percentile(latencies, 0.95) / 1e6 if latencies else 0.0,
+        "p99_ms": percentile(latencies, 0.99) / 1e6 if latencies else 0.0,
+        "max_ms": max(latencies) / 1e6 if latencies else 0.0,
+        "rss_mb": process.memory_info().rss / 1024 ** 2,
+        "cpu_percent": process.cpu_percent(),
+        "gc_pause_ms": gc_pause_ns / 1e6,
+    }
+
+
+def check_soak(windows, max_rss_growth_mb=DEFAULT_MAX_RSS_GROWTH_MB,
+               max_throughput_drop=DEFAULT_MAX_THROUGHPUT_DROP):
+    """
+    Checks soak windows for errors, memory growth and throughput degradation,
+    comparing the first and last third of the run.
+
+    :param windows: List of window dictionaries from run_soak.
+    :param max_rss_growth_mb: Allowed growth of the median RSS, in MB.
+    :param max_throughput_drop: Allowed relative drop of the mean throughput.
+    :return: List of failure messages (empty if the run passed).
+    """
+    failures = []
+    errors = sum(window["errors"] for window in windows)
+    if errors:
+        failures.append(f"{errors} operations failed.")
+    if len(windows) < 3:
+        return failures
+
+    third = len(windows) // 3
+    first, last = windows[:third], windows[-third:]
+    rss_growth = (percentile([w["rss_mb"] for w in last], 0.5)
+                  - percentile([w["rss_mb"] for w in first], 0.5))
+    if rss_growth > max_rss_growth_mb:
+        failures.append(f"RSS grew by {rss_growth:.1f} MB (limit {max_rss_growth_mb:.1f} MB).")
+    first_rate = sum(w["ops_per_s"] for w in first) / third
+    last_rate = sum(w["ops_per_s"] for w in last) / third
+    if first_rate and last_rate < first_rate * (1 - max_throughput_drop):
+        failures.append(f"Throughput fell from {first_rate:.1f} to {last_rate:.1f} ops/s "
+                        f"(limit {max_throughput_drop:.0%}).")
+    return failures
+
+
+def _report_window(window):
+    print(f"[INFO] window {window['window']}: {window['ops_per_s']:.1f} ops/s, "
+          f"p50 {window['p50_ms']:.2f} ms, p99 {window['p99_ms']:.2f} ms, "
+          f"RSS {window['rss_mb']:.1f} MB, CPU {window['cpu_percent']:.0f}%, "
+          f"GC pause {window['gc_pause_ms']:.1f} ms, {window['errors']} errors")
+
+
+def run_soak(target, key_path, duration=DEFAULT_DURATION, rate=None, concurrency=DEFAULT_CONCURRENCY,
+             window=DEFAULT_WINDOW, payload_size=DEFAULT_PAYLOAD_SIZE,
+             max_rss_growth_mb=DEFAULT_MAX_RSS_GROWTH_MB, max_throughput_drop=DEFAULT_MAX_THROUGHPUT_DROP,
+             progress=_report_window):
+    """
+    Runs a soak test: `concurrency` client threads repeat the target
+    operation for `duration` seconds.
+
+    :param target: "encrypt" (key_path is a public key) or "decrypt" (private key).
+    :param key_path: Path to the key used by every operation.
+    :param duration: Length of the run in seconds.
+    :param rate: Target operations per second over all clients (default: as fast as possible).
+    :param concurrency: Number of client threads.
+    :param window: Length of a reporting window in seconds.
+    :param payload_size: Plaintext size of each operation in bytes.
+    :param max_rss_growth_mb: See check_soak.
+    :param max_throughput_drop: See check_soak.
+    :param progress: Callable receiving each finished window (None to disable).
+    :return: Dictionary with the run parameters, the list of "windows" and
+        the list of "failures".
+    """
+    operation = _make_operation(target, key_path, payload_size)
+    process = psutil.Process()
+    process.cpu_percent()
+    gc_pauses = _GCPauses()
+    lock = threading.Lock()
+    latencies, errors = [], 0
+    windows = []
+    sequence = 0
+    # Split the run into equal windows so no short trailing window skews the rates
+    count = max(1, round(duration / window))
+    window = duration / count
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def client():
+        nonlocal errors, sequence
+        while True:
+            if rate:
+                with lock:
+                    scheduled = start + sequence / rate
+                    sequence += 1
+                if scheduled >= deadline:
+                    return
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                began = int(scheduled * 1e9)
+            else:
+                began = time.perf_counter_ns()
+                if began / 1e9 >= deadline:
+                    return
+            try:
+                operation()
+                failed = False
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter_ns() - began
+            with lock:
+                if failed:
+                    errors += 1
+                else:
+                    latencies.append(elapsed)
+
+    gc.callbacks.append(gc_pauses)
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    try:
+        for thread in threads:
+            thread.start()
+        window_start = start
+        for index in range(count):
+            last = index == count - 1
+            time.sleep(max(0.0, start + (index + 1) * window - time.perf_counter()))
+            if last:
+                # Operations still in flight at the deadline land in the last window
+                for thread in threads:
+                    thread.join()
+            now = time.perf_counter()
+            with lock:
+                finished, latencies = latencies, []
+                window_errors, errors = errors, 0
+            windows.append(_summarize_window(index, finished, window_errors, now - window_start,
+                                             process, gc_pauses.take()))
+            if progress:
+                progress(windows[-1])
+            window_start = now
+    finally:
+        gc.callbacks.remove(gc_pauses)
+
+    return {
+        "target": target,
+        "duration": duration,
+        "rate": rate,
+        "concurrency": concurrency,
+        "payload_size": payload_size,
+        "windows": windows,
+        "failures": check_soak(windows, max_rss_growth_mb, max_throughput_drop),
+    }
+
+
+def save_soak(result, path):
+    """
+    Writes a soak result as JSON.
+    """
+    with open(path, "w") as file:
+        json.dump(result, file, indent=2)
@@ -9,15 +9,86 @@ and potential vulnerabilities.
 import time
 import os
 import random
+import socket
+import subprocess
+import sys
+import tracemalloc
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
-from utils.encrypt import encrypt_data, encrypt_string
-from utils.decrypt import decrypt_data, decrypt_string
+from cryptography.exceptions import InvalidTag
+from .encrypt import encrypt_data, encrypt_string, encrypt_many, update_data
+from .decrypt import decrypt_data, decrypt_string, decrypt_many, decrypt_range
+from . import mlkem
+from . import xkem
+from . import keyformat
+from .hybrid import (encrypt_bytes, decrypt_bytes, encrypt_file, decrypt_file, encrypt_file_parallel,
+                     decrypt_file_parallel, read_header)
+from .incremental import JOURNAL_SUFFIX, recover_file, update_file
+from .rotate import rotate_file, rotate_tree
+from . import rotate
+from .keycache import KeyCache, _parse_private_key, _parse_public_key, key_fingerprint, load_private_key
+from .keystore import KeyStore, key_reference
+from .keygen import _serialize_keypair, generate_key
+from . import bulk
+from .aio import AsyncCrypto
+from .keypool import KeyPool
+from .batch import BatchResult
+from .client import CryptoClient
+from .daemon import CryptoDaemon
+from . import protocol
+from . import session
+from . import metrics
+from .profiler import profile_operation
+import asyncio
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import pytest
 
 
+# ML-KEM known-answer vectors for the seeds used in test_mlkem_known_answers:
+# SHA3-256 of the encapsulation key, decapsulation key and ciphertext, and the
+# shared secret. Cross-checked against independent FIPS 203 implementations.
+MLKEM_KNOWN_ANSWERS = {
+    "ML-KEM-512": (
+        "82f101ff648063b376e2bb6c5b7455f655a50c2feadade150efa0e0e6f365aea",
+        "0bd3f5df01098ac9c29d687c7f1bd0588a5573feeef8f1e3b4573fa7f6ab57c8",
+        "e3fdddb90255869185c07cdf1c1880b2efe08b6f04da4997b693c0dea61503bd",
+        "14cace3e48771b316676afad2cfcfe8488daaa4fad954e57236caa3f24a42cf7",
+    ),
+    "ML-KEM-768": (
+        "a24e16d8f8f9383a95b77050f4d9fd2f5733eec1d63ef3c23ebf9918173669a7",
+        "1149f17c3c4ac6ab1e3e2d9d8bd0171355ac0fa31bb8855c48ceade874c0864b",
+        "b4cfbd24cef67afd3764276c6980e0f88f8e9ca57f59b7f12fe1a9c1e72f4710",
+        "9cddd089ffe70e3996e76f7c8d06746df34d07e8657bc0fcf2bb0e1c3084aea1",
+    ),
+    "ML-KEM-1024": (
+        "61349e5c131a7e116a0463861d7d18663c5627c38c7147ddaadfd48acd7a4535",
+        "f0db5d938027fcd9bad87847d52c14cf0c4abcf0703b749793f212111ffb303b",
+        "c1579fa02c614f3762b2a799b51e41cebb8f820f34fa736af02c56de2460ce3c",
+        "0ad8d1ea1b8dd788979b4379581218df9321bdce5567eca42ae6be7d395f1a54",
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def rsa_key_paths(tmp_path_factory):
+    """
+    Writes one RSA-2048 key pair shared by the tests of this module.
+
+    :return: Tuple of (private key path, public key path).
+    """
+    directory = tmp_path_factory.mktemp("keys")
+    private_pem, public_pem = _serialize_keypair("RSA-2048")
+    (directory / "private_key.pem").write_bytes(private_pem)
+    (directory / "public_key.pem").write_bytes(public_pem)
+    return str(directory / "private_key.pem"), str(directory / "public_key.pem")
+
+
 # Performance Test for File Encryption
 def test_encryption_performance(input_file, output_file, public_key_path):
     """
@@ -143,6 +214,937 @@ def test_key_generation_randomness():
     assert key1.private_numbers() != key2.private_numbers(), "Security test failed! Keys are not unique."
 
 
-# Run all tests with pytest
+# Known-Answer Test for ML-KEM
+def test_mlkem_known_answers():
+    """
+    Tests the ML-KEM implementation against known-answer vectors for all
+    three parameter sets, and checks that decapsulation recovers the
+    shared secret while a tampered ciphertext is implicitly rejected.
+    """
+    
+    d, z, m = bytes(range(32)), bytes(range(32, 64)), bytes(range(64, 96))
+    for parameter_set, expected in MLKEM_KNOWN_ANSWERS.items():
+        ek, dk = mlkem.keygen_internal(parameter_set, d, z)
+        shared_secret, ciphertext = mlkem.encaps_internal(parameter_set, ek, m)
+        actual = (
+            hashlib.sha3_256(ek).hexdigest(),
+            hashlib.sha3_256(dk).hexdigest(),
+            hashlib.sha3_256(ciphertext).hexdigest(),
+            shared_secret.hex(),
+        )
+        assert actual == expected, f"Known-answer test failed for {parameter_set}!"
+        
+        assert mlkem.decaps_internal(parameter_set, dk, ciphertext) == shared_secret, \
+            f"Decapsulation failed for {parameter_set}!"
+        tampered = bytes([ciphertext[0] ^ 1]) + ciphertext[1:]
+        assert mlkem.decaps_internal(parameter_set, dk, tampered) != shared_secret, \
+            f"Tampered ciphertext was accepted for {parameter_set}!"
+    print("[INFO] ML-KEM known-answer tests passed.")
+
+
+# Round-Trip Test for X25519 + ML-KEM
+def test_xkem_round_trip():
+    """
+    Tests that X25519 + ML-KEM decapsulation recovers the shared secret,
+    that tampering with either half of the ciphertext changes it, and
+    that keys survive PEM serialization.
+    """
+    
+    for parameter_set in xkem.PARAMETER_SETS:
+        private_key = xkem.generate_keypair(parameter_set)
+        shared_secret, ciphertext = private_key.public_key().encapsulate()
+        assert len(ciphertext) == xkem.key_sizes(parameter_set)[2], \
+            f"Unexpected ciphertext size for {parameter_set}!"
+        assert private_key.decapsulate(ciphertext) == shared_secret, \
+            f"Decapsulation failed for {parameter_set}!"
+        
+        tampered = bytes([ciphertext[0] ^ 1]) + ciphertext[1:]
+        assert private_key.decapsulate(tampered) != shared_secret, \
+            f"Tampered ML-KEM ciphertext was accepted for {parameter_set}!"
+        tampered = ciphertext[:-1] + bytes([ciphertext[-1] ^ 1])
+        try:
+            assert private_key.decapsulate(tampered) != shared_secret, \
+                f"Tampered X25519 ciphertext was accepted for {parameter_set}!"
+        except ValueError:
+            pass  # the tampered X25519 point may be rejected outright
+        
+        restored = xkem.load_pem_private_key(xkem.private_key_to_pem(private_key))
+        assert restored.decapsulate(ciphertext) == shared_secret, \
+            f"PEM round trip failed for {parameter_set}!"
+    print("[INFO] X25519 + ML-KEM round-trip tests passed.")
+
+
+# Round-Trip Test for Key Formats
+def test_key_format_round_trip():
+    """
+    Tests that keys of every algorithm survive each key format, including
+    pre-expanded raw KEM private keys, and that corrupted raw keys and
+    expanded public keys are rejected.
+    """
+    
+    private_keys = [rsa.generate_private_key(public_exponent=65537, key_size=2048),
+                    mlkem.generate_keypair("ML-KEM-768"), xkem.generate_keypair("X25519-ML-KEM-768")]
+    for private_key in private_keys:
+        public_key = private_key.public_key()
+        is_rsa = isinstance(private_key, rsa.RSAPrivateKey)
+        for key_format, expanded in [("pem", False), ("der", False), ("raw", False), ("raw", True)]:
+            if key_format == "der" and not is_rsa:
+                continue
+            restored = _parse_private_key(keyformat.serialize_private_key(private_key, key_format, expanded))
+            restored_public = _parse_public_key(keyformat.serialize_public_key(public_key, key_format))
+            assert key_fingerprint(restored) == key_fingerprint(restored_public) == key_fingerprint(private_key), \
+                f"{key_format} round trip changed the key!"
+            if not is_rsa:
+                shared_secret, ciphertext = restored_public.encapsulate()
+                assert restored.decapsulate(ciphertext) == shared_secret, \
+                    f"{key_format} round trip broke {private_key.parameter_set}!"
+    
+    corrupted = bytearray(keyformat.serialize_private_key(private_keys[1], "raw", True))
+    corrupted[-40] ^= 1
+    with pytest.raises(ValueError):
+        _parse_private_key(bytes(corrupted))
+    public_key = private_keys[1].public_key()
+    expanded_public = keyformat._pack_raw(public_key.parameter_set, keyformat._FLAG_EXPANDED,
+                                          public_key.public_bytes() + bytes(2 * 256 * 12))
+    with pytest.raises(ValueError):
+        _parse_public_key(expanded_public)
+    with pytest.raises(ValueError):
+        generate_key("ML-KEM-768", "unused.db", key_format="raw")
+    print("[INFO] Key format round-trip tests passed.")
+
+
+@pytest.mark.parametrize("algorithm", ["ML-KEM-768", "X25519-ML-KEM-768"])
+def test_string_round_trip_with_kem_keys(tmp_path, algorithm):
+    """
+    Tests that the string and batch APIs work with KEM key files, which
+    cannot use RSA-OAEP.
+    """
+    
+    private_pem, public_pem = _serialize_keypair(algorithm)
+    private_key_path, public_key_path = tmp_path / "private_key.pem", tmp_path / "public_key.pem"
+    private_key_path.write_bytes(private_pem)
+    public_key_path.write_bytes(public_pem)
+    encrypted = encrypt_string("hi", str(public_key_path))
+    assert decrypt_string(encrypted, str(private_key_path)) == "hi", "KEM string round trip failed!"
+    messages = ["one", "two", ""]
+    encrypted = [result.value for result in encrypt_many(messages, str(public_key_path))]
+    decrypted = [result.value for result in decrypt_many(encrypted, str(private_key_path))]
+    assert decrypted == messages, "KEM batch round trip failed!"
+    print(f"[INFO] {algorithm} string round-trip tests passed.")
+
+
+# Round-Trip Test for Compressed Hybrid Encryption
+def test_compressed_round_trip():
+    """
+    Tests that compressed hybrid encryption round-trips, shrinks
+    compressible data and leaves incompressible data uncompressed.
+    """
+    
+    private_key = mlkem.generate_keypair("ML-KEM-768")
+    text = b"".join(b"2026-10-16T12:00:%02d.000Z INFO request=%d status=200\n" % (i % 60, i)
+                    for i in range(20000))
+    noise = os.urandom(len(text))
+    for data in (b"", text, noise, text + noise):
+        ciphertext = encrypt_bytes(data, private_key.public_key(), chunk_size=4096, compression="zlib")
+        assert decrypt_bytes(ciphertext, private_key) == data, "Compressed round trip failed!"
+        if data is text:
+            assert len(ciphertext) < len(text) // 2, "Compressible data was not compressed!"
+        if data is noise:
+            assert len(ciphertext) < len(noise) * 1.01 + 4096, "Incompressible data grew!"
+    print("[INFO] Compressed round-trip tests passed.")
+
+
+def test_incremental_update(tmp_path):
+    """
+    Tests that an incremental update rewrites only the changed chunks and
+    that the updated file decrypts to the new plaintext, also when the
+    file grows or shrinks.
+    """
+    
+    private_key = mlkem.generate_keypair("ML-KEM-768")
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    data = bytearray(os.urandom(4096 * 20 + 100))
+    plain.write_bytes(data)
+    encrypt_file(str(plain), str(encrypted), private_key.public_key(), chunk_size=4096, incremental=True)
+    data[4096 * 3] ^= 1
+    data[4096 * 11 + 7] ^= 1
+    for version in (data, data + os.urandom(9000), data[:30000], b""):
+        plain.write_bytes(version)
+        summary = update_file(str(plain), str(encrypted), private_key)
+        decrypt_file(str(encrypted), str(decrypted), private_key)
+        assert decrypted.read_bytes() == version, "Incremental update round trip failed!"
+        if version is data:
+            assert summary["changed"] == 2, "Unchanged chunks were rewritten!"
+    print("[INFO] Incremental update tests passed.")
+
+
+def _crash_before_journal_removal(monkeypatch, journal_suffix):
+    # Makes the next removal of a journal fail, as if the process died right after its last fsync
+    class Crash(Exception):
+        pass
+
+    remove = os.remove
+
+    def crashing_remove(path):
+        if str(path).endswith(journal_suffix):
+            raise Crash()
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", crashing_remove)
+    return Crash
+
+
+def test_incremental_update_recovery(tmp_path, monkeypatch):
+    """
+    Tests that an update interrupted after its last write is rolled back to
+    the previous plaintext, by recover_file or by the next update, when the
+    file shrinks, grows or changes in place, and that later updates work.
+    """
+    
+    private_key = mlkem.generate_keypair("ML-KEM-768")
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    old = os.urandom(4096 * 4 + 100)
+    changed = bytearray(old)
+    changed[4096 + 5] ^= 1
+    for new in (old[:4096 + 10], old + os.urandom(4096 * 2), bytes(changed)):
+        for recover in (True, False):
+            plain.write_bytes(old)
+            encrypt_file(str(plain), str(encrypted), private_key.public_key(), chunk_size=4096, incremental=True)
+            plain.write_bytes(new)
+            with monkeypatch.context() as patch:
+                crash = _crash_before_journal_removal(patch, JOURNAL_SUFFIX)
+                with pytest.raises(crash):
+                    update_file(str(plain), str(encrypted), private_key)
+            assert os.path.exists(str(encrypted) + JOURNAL_SUFFIX)
+            if recover:
+                assert recover_file(str(encrypted), private_key), "Interrupted update was not found!"
+                decrypt_file(str(encrypted), str(decrypted), private_key)
+                assert decrypted.read_bytes() == old, "Rollback did not restore the old plaintext!"
+            update_file(str(plain), str(encrypted), private_key)
+            assert not os.path.exists(str(encrypted) + JOURNAL_SUFFIX)
+            decrypt_file(str(encrypted), str(decrypted), private_key)
+            assert decrypted.read_bytes() == new, "Update after the rollback failed!"
+    print("[INFO] Incremental update recovery tests passed.")
+
+
+def test_key_rotation(tmp_path):
+    """
+    Tests that rotating a file re-wraps its data key for the new key only,
+    keeps the other recipients and leaves the payload decryptable, both in
+    place and when the header size changes.
+    """
+    
+    old_key, new_key, other_key = (mlkem.generate_keypair("ML-KEM-768") for _ in range(3))
+    larger_key = mlkem.generate_keypair("ML-KEM-1024")
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    data = os.urandom(50000)
+    plain.write_bytes(data)
+    encrypt_file(str(plain), str(encrypted), [old_key.public_key(), other_key.public_key()], chunk_size=4096)
+    payload = encrypted.read_bytes()[-40000:]
+    assert rotate_file(str(encrypted), old_key, new_key.public_key()) == "rotated"
+    assert encrypted.read_bytes()[-40000:] == payload, "Rotation touched the payload!"
+    assert rotate_file(str(encrypted), old_key, new_key.public_key()) == "unchanged"
+    for private_key in (new_key, other_key):
+        decrypt_file(str(encrypted), str(decrypted), private_key)
+        assert decrypted.read_bytes() == data, "Rotated file does not decrypt!"
+    with pytest.raises(ValueError):
+        decrypt_file(str(encrypted), str(decrypted), old_key)
+    assert rotate_file(str(encrypted), new_key, larger_key.public_key()) == "copied"
+    decrypt_file(str(encrypted), str(decrypted), larger_key)
+    assert decrypted.read_bytes() == data, "Rotated file does not decrypt!"
+    print("[INFO] Key rotation tests passed.")
+
+
+def test_key_rotation_recovery(tmp_path, monkeypatch):
+    """
+    Tests that the next rotation of a file finishes an in-place rewrite
+    interrupted before its header landed, using the leftover journal, and
+    removes a stale partial copy.
+    """
+    
+    old_key, new_key, other_key = (mlkem.generate_keypair("ML-KEM-768") for _ in range(3))
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    data = os.urandom(50000)
+    plain.write_bytes(data)
+    encrypt_file(str(plain), str(encrypted), old_key.public_key(), chunk_size=4096)
+    old_file = encrypted.read_bytes()
+
+    # The journal is on disk but the header write was lost
+    with monkeypatch.context() as patch:
+        crash = _crash_before_journal_removal(patch, rotate.JOURNAL_SUFFIX)
+        with pytest.raises(crash):
+            rotate_file(str(encrypted), old_key, new_key.public_key())
+    encrypted.write_bytes(old_file)
+    assert rotate_file(str(encrypted), old_key, new_key.public_key()) == "unchanged", "Journal was not applied!"
+    assert not os.path.exists(str(encrypted) + rotate.JOURNAL_SUFFIX)
+    decrypt_file(str(encrypted), str(decrypted), new_key)
+    assert decrypted.read_bytes() == data, "Recovered file does not decrypt!"
+
+    # An interrupted copy leaves a partial file that an in-place rotation does not write
+    partial = tmp_path / ("encrypted" + rotate.PARTIAL_SUFFIX)
+    partial.write_bytes(b"stale copy")
+    assert rotate_file(str(encrypted), new_key, other_key.public_key()) == "rotated"
+    assert not partial.exists(), "Stale partial copy was left behind!"
+    decrypt_file(str(encrypted), str(decrypted), other_key)
+    assert decrypted.read_bytes() == data, "Rotated file does not decrypt!"
+    print("[INFO] Key rotation recovery tests passed.")
+
+
+def test_bulk_directory_round_trip(tmp_path, rsa_key_paths):
+    """
+    Tests that a tree encrypted into a directory decrypts back from that
+    directory, without the manifest of the first run being taken as input.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    source, encrypted, decrypted = tmp_path / "source", tmp_path / "encrypted", tmp_path / "decrypted"
+    files = {"a.txt": b"alpha", "nested/b.bin": os.urandom(70000), "nested/deeper/empty": b""}
+    for name, data in files.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(data)
+    summary = bulk.encrypt_tree(str(source), str(encrypted), public_key_path, workers=1, progress=None)
+    assert summary["done"] == len(files) and summary["failed"] == 0
+    assert (encrypted / bulk.MANIFEST_NAME).exists()
+    summary = bulk.decrypt_tree(str(encrypted), str(decrypted), private_key_path, workers=1, progress=None)
+    assert summary["done"] == len(files) and summary["failed"] == 0, "Bookkeeping files were processed!"
+    for name, data in files.items():
+        assert (decrypted / name).read_bytes() == data, "Directory round trip failed!"
+    print("[INFO] Bulk directory round-trip tests passed.")
+
+
+def test_keystore(tmp_path):
+    """
+    Tests adding, looking up (by full ID and by prefix) and deleting keys,
+    and that key references stop resolving from the key cache once their
+    key is deleted.
+    """
+    
+    database = str(tmp_path / "keys.db")
+    with KeyStore(database) as store:
+        private_pem, public_pem = _serialize_keypair("ML-KEM-768")
+        key_id = store.add(public_pem, private_pem, label="tenant-a")
+        assert key_id == key_fingerprint(_parse_public_key(public_pem)).hex(), "Key ID is not the fingerprint!"
+        public_id = store.add(_serialize_keypair("RSA-2048")[1], label="tenant-b")
+        assert store.resolve(key_id[:8]) == key_id and store.public_pem(key_id[:12]) == public_pem
+        assert store.private_pem(public_id, required=False) is None
+        with pytest.raises(KeyError):
+            store.private_pem(public_id)
+        with pytest.raises(KeyError):
+            store.resolve(key_id[:4])
+        assert [entry["id"] for entry in store.list_keys("tenant-a")] == [key_id]
+
+        reference = key_reference(database, key_id[:8])
+        private_key = load_private_key(reference)
+        assert key_fingerprint(private_key).hex() == key_id, "Reference resolved to the wrong key!"
+        assert load_private_key(reference) is private_key, "Reference was not cached!"
+        store.delete(key_id[:8])
+        assert len(store) == 1 and store.list_keys("tenant-a") == []
+        with pytest.raises(KeyError):
+            load_private_key(reference)
+    print("[INFO] Keystore tests passed.")
+
+
+def test_async_api(tmp_path):
+    """
+    Tests that the async API round-trips files and KEM strings through the
+    synchronous functions, and that a cancelled file operation stops and
+    removes its partial output.
+    """
+    
+    private_pem, public_pem = _serialize_keypair("ML-KEM-768")
+    private_key_path, public_key_path = tmp_path / "private_key.pem", tmp_path / "public_key.pem"
+    private_key_path.write_bytes(private_pem)
+    public_key_path.write_bytes(public_pem)
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    data = os.urandom(300000)
+    plain.write_bytes(data)
+
+    async def scenario():
+        crypto = AsyncCrypto(max_workers=1)
+        try:
+            await crypto.encrypt_data(str(plain), str(encrypted), str(public_key_path), chunk_size=4096,
+                                      compression="zlib")
+            await crypto.decrypt_data(str(encrypted), str(decrypted), str(private_key_path))
+            assert decrypted.read_bytes() == data, "Async file round trip failed!"
+            encrypted_string = await crypto.encrypt_string("hi", str(public_key_path))
+            assert await crypto.decrypt_string(encrypted_string, str(private_key_path)) == "hi"
+
+            # Hold the only executor thread so the cancellation lands before the first chunk
+            gate = threading.Event()
+            blocker = asyncio.ensure_future(crypto.run(gate.wait))
+            task = asyncio.ensure_future(crypto.decrypt_data(str(encrypted), str(decrypted),
+                                                             str(private_key_path)))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.sleep(0.05)
+            gate.set()
+            await blocker
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert not decrypted.exists(), "Cancelled operation left its partial output!"
+        finally:
+            crypto.shutdown()
+
+    asyncio.run(scenario())
+    print("[INFO] Async API tests passed.")
+
+
+def test_rotate_tree(tmp_path, rsa_key_paths):
+    """
+    Tests that a rotated tree decrypts with the new key, that rotating it
+    again skips every file, and that the rotation manifest is not taken as
+    input by a later bulk run.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    new_private_pem, new_public_pem = _serialize_keypair("ML-KEM-768")
+    new_private_key_path, new_public_key_path = tmp_path / "new_private_key.pem", tmp_path / "new_public_key.pem"
+    new_private_key_path.write_bytes(new_private_pem)
+    new_public_key_path.write_bytes(new_public_pem)
+    source, encrypted, decrypted = tmp_path / "source", tmp_path / "encrypted", tmp_path / "decrypted"
+    files = {f"part{i}/file{i}": os.urandom(i * 1000) for i in range(40)}
+    for name, data in files.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(data)
+    bulk.encrypt_tree(str(source), str(encrypted), public_key_path, workers=2, progress=None)
+    for expected_done in (len(files), 0):
+        summary = rotate_tree(str(encrypted), private_key_path, str(new_public_key_path), workers=2,
+                              progress=None)
+        assert summary["done"] == expected_done and summary["failed"] == 0, f"Unexpected rotation: {summary}!"
+    summary = bulk.decrypt_tree(str(encrypted), str(decrypted), str(new_private_key_path), progress=None)
+    assert summary["total"] == summary["done"] == len(files), "Bookkeeping files were processed!"
+    for name, data in files.items():
+        assert (decrypted / name).read_bytes() == data, "Rotated tree does not decrypt!"
+    print("[INFO] Tree rotation tests passed.")
+
+
+def test_streaming_round_trip(tmp_path, rsa_key_paths):
+    """
+    Tests that hybrid files round-trip for sizes around the chunk
+    boundaries, including empty input, and that a tampered or truncated
+    file is rejected.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    for size in (0, 1, 4095, 4096, 4097, 4096 * 5):
+        data = os.urandom(size)
+        plain.write_bytes(data)
+        encrypt_data(str(plain), str(encrypted), public_key_path, chunk_size=4096)
+        decrypt_data(str(encrypted), str(decrypted), private_key_path)
+        assert decrypted.read_bytes() == data, f"Round trip of {size} bytes failed!"
+        with open(encrypted, "rb") as file:
+            assert decrypt_bytes(file.read(), load_private_key(private_key_path)) == data, \
+                "Stream and file decryption differ!"
+
+    ciphertext = bytearray(encrypted.read_bytes())
+    tampered = tmp_path / "tampered"
+    ciphertext[-4096 * 3] ^= 1
+    tampered.write_bytes(ciphertext)
+    with pytest.raises(InvalidTag):
+        decrypt_data(str(tampered), str(decrypted), private_key_path)
+    tampered.write_bytes(encrypted.read_bytes()[:-5000])
+    with pytest.raises((ValueError, InvalidTag)):
+        decrypt_data(str(tampered), str(decrypted), private_key_path)
+    print("[INFO] Streaming round-trip tests passed.")
+
+
+def test_key_cache(tmp_path):
+    """
+    Tests that the key cache returns the parsed key on a hit, reparses a
+    key file that was rewritten or replaced (even with the same size and
+    mtime), and evicts the least recently used key when it is full.
+    """
+    
+    cache = KeyCache(max_entries=2)
+    paths = [tmp_path / f"private_key{i}.pem" for i in range(3)]
+    for path in paths:
+        path.write_bytes(_serialize_keypair("ML-KEM-768")[0])
+    first = cache.get(str(paths[0]), "private", _parse_private_key)
+    assert cache.get(str(paths[0]), "private", _parse_private_key) is first, "Cache hit reparsed the key!"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # Replace the file by another key of the same size and mtime: only the inode changes
+    stat = os.stat(paths[0])
+    replacement = tmp_path / "replacement.pem"
+    replacement.write_bytes(_serialize_keypair("ML-KEM-768")[0])
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, paths[0])
+    second = cache.get(str(paths[0]), "private", _parse_private_key)
+    assert key_fingerprint(second) != key_fingerprint(first), "Replaced key file was not reloaded!"
+    paths[0].write_bytes(_serialize_keypair("ML-KEM-768")[0])
+    os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    third = cache.get(str(paths[0]), "private", _parse_private_key)
+    assert key_fingerprint(third) != key_fingerprint(second), "Rewritten key file was not reloaded!"
+    assert cache.stats()["invalidations"] == 2
+
+    cache.get(str(paths[1]), "private", _parse_private_key)
+    cache.get(str(paths[0]), "private", _parse_private_key)
+    cache.get(str(paths[2]), "private", _parse_private_key)
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    misses = stats["misses"]
+    cache.get(str(paths[0]), "private", _parse_private_key)
+    assert cache.stats()["misses"] == misses, "The most recently used key was evicted!"
+    cache.get(str(paths[1]), "private", _parse_private_key)
+    assert cache.stats()["misses"] == misses + 1, "The least recently used key was kept!"
+    print("[INFO] Key cache tests passed.")
+
+
+def test_batch_api(rsa_key_paths):
+    """
+    Tests that encrypt_many and decrypt_many return one result per item in
+    input order, for any number of workers and on a caller's executor, and
+    that a failing item reports its error without failing the batch.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    messages = [f"message {i}" for i in range(50)]
+    messages[7] = "x" * 1000  # Too long for RSA-OAEP
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for options in ({"workers": 1}, {"workers": 4}, {"executor": executor}):
+            encrypted = encrypt_many(messages, public_key_path, **options)
+            assert len(encrypted) == len(messages), "Batch lost items!"
+            assert not encrypted[7].ok and isinstance(encrypted[7].error, ValueError), "Error not reported!"
+            assert all(result.ok for i, result in enumerate(encrypted) if i != 7)
+            ciphertexts = [result.value or b"" for result in encrypted]
+            ciphertexts[3] = ciphertexts[3][:-1] + bytes([ciphertexts[3][-1] ^ 1])
+            decrypted = decrypt_many(ciphertexts, private_key_path, **options)
+            assert [result.ok for result in decrypted] == [i not in (3, 7) for i in range(len(messages))]
+            assert all(result.value == messages[i] for i, result in enumerate(decrypted) if result.ok), \
+                "Batch results are out of order!"
+    assert encrypt_many([], public_key_path) == [] and decrypt_many([], private_key_path) == []
+    print("[INFO] Batch API tests passed.")
+
+
+def test_parallel_round_trip(tmp_path):
+    """
+    Tests that parallel encryption writes the same chunk frames as the
+    sequential encryptor for the same data key and nonce prefix, and that
+    any number of decryption workers restores the identical plaintext,
+    also with compression.
+    """
+    
+    private_key = mlkem.generate_keypair("ML-KEM-768")
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    data = os.urandom(4096 * 40 + 123) + b"log line\n" * 20000
+    plain.write_bytes(data)
+    data_key, nonce_prefix = os.urandom(32), os.urandom(8)
+    for compression in (None, "zlib"):
+        encrypt_file(str(plain), str(encrypted), private_key.public_key(), chunk_size=4096, data_key=data_key,
+                     nonce_prefix=nonce_prefix, compression=compression)
+        with open(encrypted, "rb") as file:
+            header_length = read_header(file).size
+        expected = encrypted.read_bytes()[header_length:]
+        for workers in (1, 2, 3):
+            encrypt_file_parallel(str(plain), str(encrypted), private_key.public_key(), chunk_size=4096,
+                                  workers=workers, data_key=data_key, nonce_prefix=nonce_prefix,
+                                  compression=compression)
+            assert encrypted.read_bytes()[header_length:] == expected, f"{workers} workers changed the frames!"
+            for decrypt_workers in (1, 2, 3):
+                decrypt_file_parallel(str(encrypted), str(decrypted), private_key, workers=decrypt_workers)
+                assert decrypted.read_bytes() == data, f"{decrypt_workers} workers changed the plaintext!"
+    print("[INFO] Parallel round-trip tests passed.")
+
+
+def test_mlkem_batch():
+    """
+    Tests that batched key generation and encapsulation give the same keys,
+    ciphertexts and shared secrets as the per-key functions, and that each
+    batched ciphertext decapsulates with its key.
+    """
+    
+    for parameter_set in ("ML-KEM-512", "ML-KEM-768", "ML-KEM-1024"):
+        ds, zs, messages = ([os.urandom(32) for _ in range(5)] for _ in range(3))
+        private_keys = mlkem.keygen_batch(parameter_set, ds, zs)
+        public_keys = [key.public_key() for key in private_keys]
+        for private_key, d, z in zip(private_keys, ds, zs):
+            ek, dk = mlkem.keygen_internal(parameter_set, d, z)
+            assert private_key.public_key().public_bytes() == ek and private_key.private_bytes() == dk, \
+                f"{parameter_set} batched key generation differs!"
+        # The same key twice in one batch, with different messages
+        results = mlkem.encapsulate_batch(public_keys + public_keys[:1], messages + [os.urandom(32)])
+        for (shared_secret, ciphertext), private_key, m in zip(results, private_keys, messages):
+            expected = mlkem.encaps_internal(parameter_set, private_key.public_key().public_bytes(), m)
+            assert (shared_secret, ciphertext) == expected, f"{parameter_set} batched encapsulation differs!"
+            assert private_key.decapsulate(ciphertext) == shared_secret, \
+                f"{parameter_set} batched ciphertext does not decapsulate!"
+        assert private_keys[0].decapsulate(results[-1][1]) == results[-1][0]
+    with pytest.raises(ValueError):
+        mlkem.encapsulate_batch([mlkem.generate_keypair("ML-KEM-512").public_key(),
+                                 mlkem.generate_keypair("ML-KEM-768").public_key()])
+    print("[INFO] ML-KEM batch tests passed.")
+
+
+def _wait_for(condition, timeout=5):
+    # Polls `condition` until it holds or `timeout` seconds have passed
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_key_pool():
+    """
+    Tests that the key pool refills to its high watermark once it drops to
+    the low one, serves every key once, stops refilling after shutdown and
+    falls back to synchronous generation when empty.
+    """
+    
+    counter = itertools.count()
+    pool = KeyPool(lambda: next(counter), low_watermark=2, high_watermark=5)
+    pool.start()
+    try:
+        assert _wait_for(lambda: pool.depth() == 5), "Pool was not filled!"
+        served = [pool.get() for _ in range(2)]
+        time.sleep(0.05)
+        assert pool.depth() == 3, "Pool refilled above the low watermark!"
+        served.append(pool.get())
+        assert _wait_for(lambda: pool.depth() == 5), "Pool was not refilled!"
+    finally:
+        pool.stop(timeout=5)
+    assert not pool.metrics()["running"]
+    served += [pool.take() for _ in range(7)]
+    assert pool.depth() == 0 and pool.get() is None, "Stopped pool was refilled!"
+    metrics = pool.metrics()
+    assert metrics["served"] == 8 and metrics["fallbacks"] == 2 and metrics["generated"] == 8
+    assert sorted(served) == list(range(10)), "A key was served twice!"
+    with pytest.raises(ValueError):
+        KeyPool(lambda: None, low_watermark=3, high_watermark=3)
+
+    # A stop that times out mid-key must not let a second refill thread start
+    generating, release = threading.Event(), threading.Event()
+    pool = KeyPool(lambda: generating.set() or release.wait(5), low_watermark=0, high_watermark=1)
+    pool.start()
+    assert generating.wait(5)
+    pool.stop(timeout=0.05)
+    assert pool.metrics()["running"], "Running refill thread was forgotten!"
+    with pytest.raises(RuntimeError):
+        pool.start()
+    release.set()
+    pool.stop(timeout=5)
+    assert not pool.metrics()["running"]
+    pool.start()
+    assert _wait_for(lambda: pool.depth() == 1), "Restarted pool was not filled!"
+    pool.stop(timeout=5)
+    print("[INFO] Key pool tests passed.")
+
+
+def test_metrics(rsa_key_paths):
+    """
+    Tests that operations cost nothing but a shared no-op without hooks,
+    and that a registered collector counts operations, errors and bytes,
+    passes on_start's context to on_end and renders the series in the
+    Prometheus text format.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    assert metrics.track("encrypt_data") is metrics.track("decrypt_data"), "No-op tracking allocated!"
+
+    class SpanHook(metrics.Hook):
+        def __init__(self):
+            self.spans = []
+
+        def on_start(self, operation, algorithm):
+            return operation
+
+        def on_end(self, operation, algorithm, seconds, nbytes, error, context):
+            self.spans.append((context, algorithm, error is not None))
+
+    collector, spans = metrics.InMemoryCollector(buckets=(0.5, 60.0)), SpanHook()
+    metrics.register_hook(collector)
+    metrics.register_hook(spans)
+    try:
+        ciphertext = encrypt_string("hi", public_key_path)
+        decrypt_string(ciphertext, private_key_path)
+        with pytest.raises(Exception):
+            decrypt_string(b"not a ciphertext", private_key_path)
+    finally:
+        metrics.unregister_hook(collector)
+        metrics.unregister_hook(spans)
+    assert metrics.track("encrypt_data") is metrics.track("decrypt_data"), "Hooks were not unregistered!"
+
+    series = collector.snapshot()
+    encrypted, decrypted = series[("encrypt_string", "RSA-2048")], series[("decrypt_string", "RSA-2048")]
+    assert encrypted["count"] == 1 and encrypted["bytes"] == 2 and encrypted["errors"] == 0
+    assert decrypted["count"] == 2 and decrypted["errors"] == 1
+    assert ("encrypt_string", "RSA-2048", False) in spans.spans, "on_start context was not passed on!"
+    assert ("decrypt_string", "RSA-2048", True) in spans.spans, "Error was not reported!"
+    text = collector.render_prometheus()
+    labels = 'operation="decrypt_string",algorithm="RSA-2048"'
+    for line in ("# TYPE pqc_operations_total counter",
+                 f"pqc_operations_total{{{labels}}} 2",
+                 f"pqc_operation_errors_total{{{labels}}} 1",
+                 "# TYPE pqc_operation_duration_seconds histogram",
+                 f'pqc_operation_duration_seconds_bucket{{{labels},le="60"}} 2',
+                 f'pqc_operation_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+                 f"pqc_operation_duration_seconds_count{{{labels}}} 2"):
+        assert line in text.splitlines(), f"Missing exposition line: {line}!"
+    print("[INFO] Metrics tests passed.")
+
+
+def test_bulk_manifest_resume(tmp_path, rsa_key_paths):
+    """
+    Tests that a bulk run started again with the manifest of an interrupted
+    run only processes the files that were not completed, or that changed
+    since, and ignores a truncated last manifest line.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    source, encrypted, decrypted = tmp_path / "source", tmp_path / "encrypted", tmp_path / "decrypted"
+    files = {f"dir{i % 3}/file{i}": os.urandom(i * 100) for i in range(12)}
+    for name, data in files.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(data)
+    summary = bulk.encrypt_tree(str(source), str(encrypted), public_key_path, workers=2, progress=None)
+    assert summary["done"] == len(files)
+
+    # Keep five finished entries and half of the sixth, as if the run had been killed
+    manifest = encrypted / bulk.MANIFEST_NAME
+    lines = manifest.read_text().splitlines(keepends=True)
+    manifest.write_text("".join(lines[:5]) + lines[5][:len(lines[5]) // 2])
+    kept = [json.loads(line)["path"] for line in lines[:5]]
+    changed = next(name for name in files if name not in kept)
+    files[changed] = os.urandom(50)
+    (source / changed).write_bytes(files[changed])
+    touched = kept[0]
+    (source / touched).write_bytes(os.urandom(len(files[touched]) + 1))
+    files[touched] = (source / touched).read_bytes()
+
+    summary = bulk.encrypt_tree(str(source), str(encrypted), public_key_path, workers=2, progress=None)
+    assert summary["skipped"] == 4 and summary["done"] == len(files) - 4, f"Unexpected resume: {summary}!"
+    summary = bulk.encrypt_tree(str(source), str(encrypted), public_key_path, workers=2, progress=None)
+    assert summary["skipped"] == len(files) and summary["done"] == 0, "Completed files were redone!"
+    bulk.decrypt_tree(str(encrypted), str(decrypted), private_key_path, workers=2, progress=None)
+    for name, data in files.items():
+        assert (decrypted / name).read_bytes() == data, "Resumed tree does not decrypt!"
+    print("[INFO] Bulk manifest resume tests passed.")
+
+
+def test_protocol_framing(monkeypatch):
+    """
+    Tests that frames round-trip through the codec and that malformed,
+    truncated and oversized frames are rejected.
+    """
+    
+    for fields in ([], [b""], [b"key", os.urandom(1000), b""]):
+        frame = protocol.encode_frame(0xFFFFFFFF, protocol.OP_ENCRYPT, fields)
+        assert protocol.decode_length(frame[:4]) == len(frame) - 4
+        assert protocol.decode_body(frame[4:]) == (0xFFFFFFFF, protocol.OP_ENCRYPT, fields), \
+            "Frame round trip failed!"
+    body = protocol.encode_frame(1, protocol.OP_PING, [b"abc"])[4:]
+    for malformed in (body[:-1], body + b"\0", body[:-4]):
+        with pytest.raises(protocol.ProtocolError):
+            protocol.decode_body(malformed)
+    for size in (0, protocol.MAX_FRAME_SIZE + 1):
+        with pytest.raises(protocol.ProtocolError):
+            protocol.decode_length(size.to_bytes(4, "big"))
+    monkeypatch.setattr(protocol, "MAX_FRAME_SIZE", 100)
+    with pytest.raises(protocol.ProtocolError):
+        protocol.encode_frame(1, protocol.OP_ENCRYPT, [b"key", bytes(100)])
+    print("[INFO] Protocol framing tests passed.")
+
+
+def test_daemon(tmp_path, rsa_key_paths):
+    """
+    Tests that the daemon answers single and pipelined requests, reports a
+    failed request without dropping the connection, and keeps serving
+    other clients after dropping one that sent a malformed frame.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    socket_path = str(tmp_path / "pqc.sock")
+    loop = asyncio.new_event_loop()
+    daemon = CryptoDaemon(socket_path, max_workers=2, max_pipeline=4)
+    loop.run_until_complete(daemon.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600, "Socket is reachable by other users!"
+        with CryptoClient(socket_path, timeout=30) as client:
+            client.ping()
+            assert client.decrypt(client.encrypt("hi", public_key_path), private_key_path) == b"hi"
+            messages = [os.urandom(i * 100) for i in range(20)]
+            encrypted = client.encrypt_many(messages, public_key_path, window=8)
+            encrypted[5] = BatchResult(b"not a ciphertext", None)
+            decrypted = client.decrypt_many([result.value for result in encrypted], private_key_path)
+            assert [result.ok for result in decrypted] == [i != 5 for i in range(20)], "Pipeline errors misplaced!"
+            assert isinstance(decrypted[5].error, protocol.DaemonError)
+            assert all(result.value == messages[i] for i, result in enumerate(decrypted) if result.ok), \
+                "Pipelined responses are out of order!"
+            for opcode, fields in ((99, ()), (protocol.OP_ENCRYPT, (b"only one field",))):
+                with pytest.raises(protocol.DaemonError):
+                    client.call(opcode, *fields)
+            with pytest.raises(protocol.DaemonError):
+                client.decrypt(b"data", str(tmp_path / "missing.pem"))
+            client.ping()
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+            raw.settimeout(30)
+            raw.connect(socket_path)
+            raw.sendall(b"\0\0\0\1x")
+            assert raw.recv(1) == b"", "Malformed frame did not drop the connection!"
+        with CryptoClient(socket_path, timeout=30) as client:
+            plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+            plain.write_bytes(os.urandom(10000))
+            client.encrypt_file(str(plain), str(encrypted), public_key_path)
+            client.decrypt_file(str(encrypted), str(decrypted), private_key_path)
+            assert decrypted.read_bytes() == plain.read_bytes(), "Daemon file round trip failed!"
+    finally:
+        asyncio.run_coroutine_threadsafe(daemon.close(), loop).result(30)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(30)
+        loop.close()
+    assert not os.path.exists(socket_path), "Socket was not removed!"
+    print("[INFO] Daemon tests passed.")
+
+
+def test_decrypt_range(tmp_path, rsa_key_paths):
+    """
+    Tests that range decryption returns the requested bytes for ranges on,
+    across and past the chunk boundaries, for plain, compressed and
+    incrementally updated files.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    plain, encrypted = tmp_path / "plain", tmp_path / "encrypted"
+    data = bytearray(os.urandom(4096 * 3 + 100) + b"compressible " * 1000)
+    ranges = [(0, 0), (0, 1), (0, 4096), (4095, 2), (4096, 4096), (4000, 9000), (len(data) - 1, 1),
+              (len(data) - 10, 100), (len(data), 10), (len(data) + 5000, 10), (0, len(data) * 2)]
+    for options in ({}, {"compression": "zlib"}, {"incremental": True}):
+        plain.write_bytes(data)
+        encrypt_data(str(plain), str(encrypted), public_key_path, chunk_size=4096, **options)
+        expected = bytes(data)
+        if options.get("incremental"):
+            data[5000] ^= 1
+            plain.write_bytes(data)
+            update_data(str(plain), str(encrypted), private_key_path)
+            expected = bytes(data)
+        for offset, length in ranges:
+            assert decrypt_range(str(encrypted), offset, length, private_key_path) == \
+                expected[offset:offset + length], f"Range ({offset}, {length}) with {options} is wrong!"
+        with pytest.raises(ValueError):
+            decrypt_range(str(encrypted), -1, 10, private_key_path)
+    print("[INFO] Range decryption tests passed.")
+
+
+def test_multi_recipient(tmp_path, rsa_key_paths):
+    """
+    Tests that a file encrypted for several recipients of different
+    algorithms decrypts with each of their private keys, sequentially and
+    in parallel, and that any other key is rejected.
+    """
+    
+    key_paths = [rsa_key_paths]
+    for algorithm in ("ML-KEM-768", "X25519-ML-KEM-768", "ML-KEM-1024"):
+        private_pem, public_pem = _serialize_keypair(algorithm)
+        private_key_path, public_key_path = tmp_path / f"{algorithm}.pem", tmp_path / f"{algorithm}.pub.pem"
+        private_key_path.write_bytes(private_pem)
+        public_key_path.write_bytes(public_pem)
+        key_paths.append((str(private_key_path), str(public_key_path)))
+    recipients, outsider = key_paths[:-1], key_paths[-1]
+    plain, encrypted, decrypted = tmp_path / "plain", tmp_path / "encrypted", tmp_path / "decrypted"
+    data = os.urandom(100000)
+    plain.write_bytes(data)
+    for workers in (1, 2):
+        encrypt_data(str(plain), str(encrypted), [public_key_path for _, public_key_path in recipients],
+                     chunk_size=4096, workers=workers)
+        for private_key_path, _ in recipients:
+            decrypt_data(str(encrypted), str(decrypted), private_key_path, workers=workers)
+            assert decrypted.read_bytes() == data, f"Recipient {private_key_path} cannot decrypt!"
+        with pytest.raises(ValueError, match="not encrypted for this key"):
+            decrypt_data(str(encrypted), str(decrypted), outsider[0], workers=workers)
+    print("[INFO] Multi-recipient tests passed.")
+
+
+def test_session(tmp_path, rsa_key_paths):
+    """
+    Tests that session messages round-trip in both directions across
+    rekeys, that gaps are accepted but replayed, reordered, tampered and
+    too-far-ahead messages are rejected, and that only the intended key
+    accepts the setup message.
+    """
+    
+    private_key_path, public_key_path = rsa_key_paths
+    initiator, setup = session.initiate_session(public_key_path, session.RekeyPolicy(max_messages=3))
+    responder = session.accept_session(setup, private_key_path)
+    messages = [initiator.encrypt(f"message {i}") for i in range(10)]
+    assert initiator.send_epoch == 3, "Message budget did not rotate the key!"
+    for i in (0, 1, 3, 4, 8):
+        assert responder.decrypt(messages[i]) == f"message {i}".encode(), "Session round trip failed!"
+    assert responder.receive_epoch == 2
+    for stale in (messages[8], messages[7], messages[2]):
+        with pytest.raises(ValueError, match="Replayed or out-of-order"):
+            responder.decrypt(stale)
+    tampered = bytearray(messages[9])
+    tampered[-1] ^= 1
+    with pytest.raises(ValueError, match="authentication failed"):
+        responder.decrypt(bytes(tampered))
+    assert responder.decrypt(messages[9]) == b"message 9", "A rejected message advanced the session!"
+
+    reply = responder.encrypt("reply")
+    assert initiator.decrypt(reply) == b"reply", "Responder direction failed!"
+    for _ in range(session.MAX_EPOCH_SKIP + 1):
+        responder.rekey()
+    with pytest.raises(ValueError, match="too many epochs"):
+        initiator.decrypt(responder.encrypt("far ahead"))
+
+    other_private_pem = _serialize_keypair("ML-KEM-768")[0]
+    other_private_key_path = tmp_path / "other_private_key.pem"
+    other_private_key_path.write_bytes(other_private_pem)
+    with pytest.raises(ValueError, match="not set up for this key"):
+        session.accept_session(setup, str(other_private_key_path))
+    print("[INFO] Session tests passed.")
+
+
+def test_profile_operation_tracing():
+    """
+    Tests that profiling measures the peak memory of the run and leaves a
+    caller's allocation trace running with its peak intact.
+    """
+    
+    result = profile_operation(lambda: bytearray(10 ** 6))
+    assert result["peak_bytes"] >= 10 ** 6 and not tracemalloc.is_tracing(), "Profiler left tracing on!"
+    tracemalloc.start()
+    try:
+        data = bytearray(4 * 10 ** 6)
+        del data
+        caller_peak = tracemalloc.get_traced_memory()[1]
+        result = profile_operation(lambda: bytearray(10 ** 6))
+        assert tracemalloc.is_tracing(), "Profiler stopped the caller's trace!"
+        assert tracemalloc.get_traced_memory()[1] >= caller_peak, "Profiler reset the caller's peak!"
+        assert 10 ** 6 <= result["peak_bytes"] < 2 * 10 ** 6, "Nested peak includes the caller's memory!"
+    finally:
+        tracemalloc.stop()
+    print("[INFO] Profiler tracing tests passed.")
+
+
+def test_cli_import_is_light():
+    """
+    Tests that importing the command line does not load cryptography: the
+    argument choices come from the dependency-free constants module.
+    """
+    
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, src.main; print(sorted(name for name in sys.modules "
+                               "if name.split('.')[0] == 'cryptography'))"],
+        cwd=project_root, capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == "[]", f"Importing src.main loaded {loaded}!"
+    print("[INFO] CLI import tests passed.")
+
+
+# Run all tests in this module with pytest
+def run_tests(*args):
+    """
+    Runs the tests in this module with pytest.
+    
+    :param args: Extra command-line arguments passed to pytest.
+    :return: The pytest exit code (0 when all tests pass).
+    """
+    
+    return pytest.main([__file__, *args])
+
+
 if __name__ == "__main__":
-    pytest.main()
+    run_tests()
@@ -0,0 +1,249 @@
+"""
+X25519 + ML-KEM Module - Hybrid Key Encapsulation
+This module combines a classical X25519 key exchange with ML-KEM, so a
+shared secret stays safe as long as either of the two holds. The public
+key is the ML-KEM encapsulation key followed by the X25519 public key; a
+ciphertext is the ML-KEM ciphertext followed by an ephemeral X25519
+public key. Both shared secrets are fed through SHA3-256 together with
+the X25519 ciphertext and public key and a domain label, following the
+X-Wing combiner.
+
+The keys expose the same interface as the ML-KEM keys (`parameter_set`,
+`public_bytes`, `encapsulate`, `decapsulate`, ...), so they can be used
+wherever an ML-KEM key is accepted. Keys are stored in PEM-style armor,
+e.g. "X25519-ML-KEM-768 PUBLIC KEY".
+"""
+
+import base64
+import hashlib
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import x25519
+from . import mlkem
+
+# Hybrid parameter set -> ML-KEM parameter set
+PARAMETER_SETS = {
+    "X25519-ML-KEM-512": "ML-KEM-512",
+    "X25519-ML-KEM-768": "ML-KEM-768",
+    "X25519-ML-KEM-1024": "ML-KEM-1024",
+}
+
+X25519_KEY_SIZE = 32
+SHARED_SECRET_SIZE = 32
+
+# Domain separation label of the X-Wing combiner
+_LABEL = b"\\.//^\\"
+
+
+def _mlkem_parameter_set(parameter_set):
+    try:
+        return PARAMETER_SETS[parameter_set]
+    except KeyError:
+        raise ValueError(f"Unknown X25519 + ML-KEM parameter set: {parameter_set}")
+
+
+def key_sizes(parameter_set):
+    """
+    Returns the public key, private key and ciphertext sizes.
+
+    :param parameter_set: "X25519-ML-KEM-512", "X25519-ML-KEM-768" or "X25519-ML-KEM-1024".
+    :return: Tuple of (public_key_size, private_key_size, ciphertext_size) in bytes.
+    """
+    ek_size, dk_size, ciphertext_size = mlkem.key_sizes(_mlkem_parameter_set(parameter_set))
+    return ek_size + X25519_KEY_SIZE, dk_size + X25519_KEY_SIZE, ciphertext_size + X25519_KEY_SIZE
+
+
+def _raw_public(x25519_public_key):
+    return x25519_public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+def _combine(mlkem_secret, x25519_secret, x25519_ciphertext, x25519_public):
+    return hashlib.sha3_256(mlkem_secret + x25519_secret + x25519_ciphertext + x25519_public
+                            + _LABEL).digest()
+
+
+class HybridKEMPublicKey:
+    """
+    An X25519 + ML-KEM public key.
+    """
+
+    def __init__(self, parameter_set, data):
+        mlkem_parameter_set = _mlkem_parameter_set(parameter_set)
+        if len(data) != key_sizes(parameter_set)[0]:
+            raise ValueError(f"Invalid {parameter_set} public key length.")
+        self.parameter_set = parameter_set
+        self.ciphertext_size = key_sizes(parameter_set)[2]
+        self._data = bytes(data)
+        self._mlkem = mlkem.MLKEMPublicKey(mlkem_parameter_set, data[:-X25519_KEY_SIZE])
+        self._x25519_bytes = self._data[-X25519_KEY_SIZE:]
+        self._x25519 = x25519.X25519PublicKey.from_public_bytes(self._x25519_bytes)
+
+    def public_bytes(self):
+        """
+        :return: The ML-KEM encapsulation key followed by the X25519 public key.
+        """
+        return self._data
+
+    @classmethod
+    def _from_parts(cls, parameter_set, mlkem_key, x25519_bytes):
+        # Builds a key around an already parsed ML-KEM key
+        key = cls.__new__(cls)
+        key.parameter_set = parameter_set
+        key.ciphertext_size = key_sizes(parameter_set)[2]
+        key._data = mlkem_key.public_bytes() + x25519_bytes
+        key._mlkem = mlkem_key
+        key._x25519_bytes = bytes(x25519_bytes)
+        key._x25519 = x25519.X25519PublicKey.from_public_bytes(key._x25519_bytes)
+        return key
+
+    def encapsulate(self):
+        """
+        Generates a shared secret and its ciphertext for this key.
+
+        :return: Tuple of (shared_secret, ciphertext).
+        """
+        mlkem_secret, mlkem_ciphertext = self._mlkem.encapsulate()
+        ephemeral = x25519.X25519PrivateKey.generate()
+        x25519_ciphertext = _raw_public(ephemeral.public_key())
+        x25519_secret = ephemeral.exchange(self._x25519)
+        shared_secret = _combine(mlkem_secret, x25519_secret, x25519_ciphertext, self._x25519_bytes)
+        return shared_secret, mlkem_ciphertext + x25519_ciphertext
+
+
+class HybridKEMPrivateKey:
+    """
+    An X25519 + ML-KEM private key: the ML-KEM decapsulation key followed
+    by the X25519 private key.
+    """
+
+    def __init__(self, parameter_set, data):
+        mlkem_parameter_set = _mlkem_parameter_set(parameter_set)
+        if len(data) != key_sizes(parameter_set)[1]:
+            raise ValueError(f"Invalid {parameter_set} private key length.")
+        self.parameter_set = parameter_set
+        self.ciphertext_size = key_sizes(parameter_set)[2]
+        self._data = bytes(data)
+        self._mlkem = mlkem.MLKEMPrivateKey(mlkem_parameter_set, data[:-X25519_KEY_SIZE])
+        self._x25519 = x25519.X25519PrivateKey.from_private_bytes(self._data[-X25519_KEY_SIZE:])
+        self._public_key = HybridKEMPublicKey._from_parts(
+            parameter_set, self._mlkem.public_key(), _raw_public(self._x25519.public_key()))
+
+    @classmethod
+    def _from_parts(cls, parameter_set, mlkem_key, x25519_bytes):
+        # Builds a key around an already parsed ML-KEM key
+        key = cls.__new__(cls)
+        key.parameter_set = parameter_set
+        key.ciphertext_size = key_sizes(parameter_set)[2]
+        key._data = mlkem_key.private_bytes() + x25519_bytes
+        key._mlkem = mlkem_key
+        key._x25519 = x25519.X25519PrivateKey.from_private_bytes(bytes(x25519_bytes))
+        key._public_key = HybridKEMPublicKey._from_parts(
+            parameter_set, mlkem_key.public_key(), _raw_public(key._x25519.public_key()))
+        return key
+
+    def private_bytes(self):
+        """
+        :return: The ML-KEM decapsulation key followed by the X25519 private key.
+        """
+        return self._data
+
+    def public_key(self):
+        """
+        :return: The matching HybridKEMPublicKey.
+        """
+        return self._public_key
+
+    def decapsulate(self, c):
+        """
+        Recovers the shared secret from a ciphertext.
+
+        :param c: Ciphertext (bytes).
+        :return: 32-byte shared secret.
+        """
+        if len(c) != self.ciphertext_size:
+            raise ValueError(f"Invalid {self.parameter_set} ciphertext length.")
+        mlkem_secret = self._mlkem.decapsulate(c[:-X25519_KEY_SIZE])
+        x25519_ciphertext = c[-X25519_KEY_SIZE:]
+        x25519_secret = self._x25519.exchange(x25519.X25519PublicKey.from_public_bytes(x25519_ciphertext))
+        return _combine(mlkem_secret, x25519_secret, x25519_ciphertext, self._public_key._x25519_bytes)
+
+
+def generate_keypair(parameter_set="X25519-ML-KEM-768"):
+    """
+    Generates a fresh X25519 + ML-KEM key pair.
+
+    :param parameter_set: "X25519-ML-KEM-512", "X25519-ML-KEM-768" or "X25519-ML-KEM-1024".
+    :return: HybridKEMPrivateKey; its public key is available via public_key().
+    """
+    mlkem_key = mlkem.generate_keypair(_mlkem_parameter_set(parameter_set))
+    x25519_key = x25519.X25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption())
+    return HybridKEMPrivateKey(parameter_set, mlkem_key.private_bytes() + x25519_key)
+
+
+# Expanded serialization: the X25519 key followed by the expanded ML-KEM key
+
+def expanded_private_bytes(private_key):
+    """
+    :param private_key: HybridKEMPrivateKey.
+    :return: X25519 private key followed by the expanded ML-KEM private key.
+    """
+    return private_key._data[-X25519_KEY_SIZE:] + mlkem.expanded_private_bytes(private_key._mlkem)
+
+
+def load_expanded_private_key(parameter_set, data):
+    """
+    Loads a key written by expanded_private_bytes; the data must come from a trusted source.
+
+    :return: HybridKEMPrivateKey.
+    """
+    mlkem_key = mlkem.load_expanded_private_key(_mlkem_parameter_set(parameter_set), data[X25519_KEY_SIZE:])
+    return HybridKEMPrivateKey._from_parts(parameter_set, mlkem_key, bytes(data[:X25519_KEY_SIZE]))
+
+
+# PEM-style serialization
+
+def _unarmor(data, kind):
+    text = data.decode("ascii").strip()
+    lines = text.splitlines()
+    begin, end = lines[0], lines[-1]
+    if not begin.startswith("-----BEGIN X25519-") or not begin.endswith(" " + kind + " KEY-----"):
+        raise ValueError(f"Not an X25519 + ML-KEM {kind.lower()} key.")
+    parameter_set = begin[len("-----BEGIN "):-len(" " + kind + " KEY-----")]
+    _mlkem_parameter_set(parameter_set)
+    if end != "-----END " + parameter_set + " " + kind + " KEY-----":
+        raise ValueError("Malformed X25519 + ML-KEM key armor.")
+    return parameter_set, base64.b64decode("".join(lines[1:-1]))
+
+
+def private_key_to_pem(private_key):
+    """
+    :param private_key: HybridKEMPrivateKey.
+    :return: PEM-style armored private key (bytes).
+    """
+    return mlkem._armor(private_key.parameter_set + " PRIVATE KEY", private_key.private_bytes())
+
+
+def public_key_to_pem(public_key):
+    """
+    :param public_key: HybridKEMPublicKey.
+    :return: PEM-style armored public key (bytes).
+    """
+    return mlkem._armor(public_key.parameter_set + " PUBLIC KEY", public_key.public_bytes())
+
+
+def load_pem_private_key(data):
+    """
+    :param data: PEM-style armored private key (bytes).
+    :return: HybridKEMPrivateKey.
+    """
+    parameter_set, raw = _unarmor(data, "PRIVATE")
+    return HybridKEMPrivateKey(parameter_set, raw)
+
+
+def load_pem_public_key(data):
+    """
+    :param data: PEM-style armored public key (bytes).
+    :return: HybridKEMPublicKey.
+    """
+    parameter_set, raw = _unarmor(data, "PUBLIC")
+    return HybridKEMPublicKey(parameter_set, raw)